@@ -0,0 +1,245 @@
+"""
+Benchmark of the sync pipeline on synthetic currency sets.
+
+Seeds `bases` x `targets` rates for `days` days through a stubbed provider and
+times each stage separately. Meant for a throwaway test site: it writes and purges
+Currency Exchange rows, so it refuses to run unless "allow_tests" is set in site config,
+and only touches rows it created itself (it refuses to run over existing rates).
+
+    bench --site test_site execute exchange_rate_sync.benchmark.run \
+        --kwargs "{'bases': 10, 'targets': 40, 'days': 30, 'output': '/tmp/bench.json'}"
+
+Prints (and optionally writes) JSON so results can be compared across commits.
+"""
+
+import json
+import math
+import os
+import random
+import subprocess
+import time
+from contextlib import contextmanager
+from functools import partial
+
+import frappe
+from frappe.utils import add_days, now, today
+
+from exchange_rate_sync.providers import RateProvider
+from exchange_rate_sync.tasks import cache, daily, fetch, metrics, schedule
+from exchange_rate_sync.tasks.asof import invalidate_history
+from exchange_rate_sync.tasks.cross import cross_rate_rows, rebase_rates
+from exchange_rate_sync.tasks.daily import _sync_rates, cross_pair_with_usd, fetch_all
+from exchange_rate_sync.tasks.instrumentation import SYNC_RUN, SyncRunLog
+from exchange_rate_sync.tasks.monthly import DEFAULT_PURGE_BATCH_SIZE, purge_currency_exchange
+from exchange_rate_sync.tasks.writer import CURRENCY_EXCHANGE, RateWriter
+
+BENCHMARK_KEY_PREFIX = "exchange_rate_sync:benchmark"
+# Redis keys the sync run reads or writes; the benchmark's run gets its own copies
+ISOLATED_KEYS = (
+    (schedule, "SYNC_PROGRESS_KEY"),
+    (daily, "PROVIDER_STATE_KEY"),   # else the next real sync could skip as unchanged
+    (fetch, "HTTP_CACHE_KEY"),
+    (cache, "CACHE_PREFIX"),
+    (metrics, "METRICS_KEY"),
+)
+
+
+class SyntheticProvider(RateProvider):
+    """Deterministic random-walk USD rates for the given currencies, with optional simulated latency."""
+
+    name = "Synthetic"
+    requires_api_key = False
+
+    def __init__(self, currencies: list, latency_sec: float = 0, seed: int = 0):
+        super().__init__({"base": True, "symbols": True, "time-series": True})
+        self.currencies = currencies
+        self.latency_sec = latency_sec
+        self.seed = seed
+        rng = random.Random(seed)
+        self.usd = {c: math.exp(rng.uniform(-3, 6)) for c in currencies if c != "USD"}
+
+    def usd_rates(self, date_str: str | None = None) -> dict:
+        rng = random.Random(f"{self.seed}:{date_str}")
+        return {"USD": 1.0, **{c: r * (1 + rng.uniform(-0.01, 0.01)) for c, r in self.usd.items()}}
+
+    def _answer(self, date_str, base, symbols, stats):
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+        if stats is not None:
+            stats.update(attempts=1, latency=self.latency_sec)
+        rates = rebase_rates(self.usd_rates(date_str), base, symbols or self.currencies)
+        return {"base": base, "timestamp": int(time.time()), "rates": rates}, 200
+
+    def latest(self, base="USD", symbols=None, stats=None, **http):
+        return self._answer(today(), base, symbols, stats)
+
+    def historical(self, date, base="USD", symbols=None, stats=None, **http):
+        return self._answer(str(date), base, symbols, stats)
+
+    def usage(self, **http):
+        return {"status": "active", "plan": {"name": self.name, "quota": "Unlimited",
+                                             "features": self.capabilities()}, "usage": {}}, 200
+
+
+def run(bases: int = 5, targets: int = 20, days: int = 30, bulk: int = 1, latency_ms: float = 0,
+        max_workers: int = 4, batch_size: int = 5000, seed: int = 0, output: str | None = None) -> dict:
+    """
+    Time fetch, upsert (insert / update / unchanged), cross matrix, an end-to-end
+    sync run and purge. Returns the results dict (also printed as JSON).
+    """
+    if not frappe.conf.get("allow_tests"):
+        frappe.throw("The benchmark writes and purges Currency Exchange rows. Run it on a test site with allow_tests set.")
+
+    currencies = _currencies(bases + targets)
+    base_currencies, target_currencies = currencies[:bases], currencies[bases:]
+    provider = SyntheticProvider(currencies, latency_sec=latency_ms / 1000, seed=seed)
+    dates = [str(add_days(today(), -i)) for i in range(days, 0, -1)]
+    results = {}
+
+    seeded = _seeded_filters(currencies, dates[0])
+    existing = frappe.db.count(CURRENCY_EXCHANGE, filters=seeded)
+    if existing:
+        frappe.throw(
+            f"The benchmark would overwrite {existing} existing Currency Exchange rows between its currencies "
+            f"since {dates[0]}. Run it on a site without them."
+        )
+    seeded.append(["creation", ">=", now()])   # what the benchmark inserts; used by the purge and the cleanup
+
+    try:
+        with _timed(results, "fetch", len(base_currencies)):
+            fetch_all(
+                {b: partial(provider.latest, b, target_currencies) for b in base_currencies},
+                max_workers=max_workers,
+                requests_per_sec=1000,
+            )
+
+        for stage, drift in (("upsert_insert", 0), ("upsert_update", 0.05), ("upsert_unchanged", 0.05)):
+            writer = RateWriter(bulk=bool(bulk))
+            for date_str in dates:
+                usd = provider.usd_rates(date_str)
+                for base in base_currencies:
+                    for to_currency, rate in rebase_rates(usd, base, target_currencies).items():
+                        writer.add_pair(date_str, base, to_currency, rate * (1 + drift))
+            with _timed(results, stage, len(writer)) as result:
+                result["stats"] = writer.flush()
+                frappe.db.commit()
+
+        usd_by_date = {d: provider.usd_rates(d) for d in dates}
+        with _timed(results, "cross_matrix", days * len(target_currencies) ** 2):
+            for usd in usd_by_date.values():
+                cross_rate_rows(target_currencies, usd)
+
+        writer = RateWriter(bulk=bool(bulk))
+        with _timed(results, "cross_pairwise", days * len(target_currencies) ** 2):
+            for date_str, usd in usd_by_date.items():
+                for i, a in enumerate(target_currencies):
+                    for b in target_currencies[i + 1:]:
+                        cross_pair_with_usd(date_str, a, b, usd, writer=writer)
+
+        with _timed(results, "cross_write", len(writer)) as result:
+            result["stats"] = writer.flush()
+            frappe.db.commit()
+
+        cfg = frappe._dict(
+            bulk_upsert=bulk, cross_rate_conversion=1, fetch_strategy="Per Base",
+            max_parallel_requests=max_workers, requests_per_second=1000,
+        )
+        with _isolated_sync_state(), _timed(results, "sync", len(base_currencies)) as result:
+            run_log = SyncRunLog.start(fetch_strategy=cfg.fetch_strategy)
+            try:
+                result["message"] = _sync_rates(cfg, provider, base_currencies, target_currencies, run=run_log)
+            finally:
+                if run_log.name:
+                    frappe.delete_doc(SYNC_RUN, run_log.name, ignore_permissions=True, force=True)
+                    frappe.db.commit()
+
+        with _timed(results, "purge") as result:
+            # only the seeded rows: dated before today, between the benchmark's currencies
+            result["stats"] = purge_currency_exchange(retention_days=0, batch_size=batch_size, filters=seeded)
+            result["rows"] = result["stats"]["purged"]
+    finally:
+        _cleanup(seeded)
+
+    report = {
+        "params": {"bases": bases, "targets": targets, "days": days, "bulk": bulk, "latency_ms": latency_ms,
+                   "max_workers": max_workers, "batch_size": batch_size, "seed": seed},
+        "commit": _git_commit(),
+        "db_type": frappe.db.db_type,
+        "timestamp": now(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=1, default=str)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    return report
+
+
+@contextmanager
+def _timed(results: dict, stage: str, rows: int | None = None):
+    result = {"rows": rows}
+    started = time.perf_counter()
+    yield result
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    if result.get("rows") and result["seconds"]:
+        result["rows_per_sec"] = round(result["rows"] / result["seconds"], 1)
+    results[stage] = result
+
+
+@contextmanager
+def _isolated_sync_state():
+    """
+    Point the sync's Redis keys (progress, provider state, HTTP cache, rate cache,
+    metrics) at benchmark-only copies, and drop those afterwards, so the site's
+    own syncs and metrics never see the benchmark run.
+    """
+    metrics.flush()   # the site's buffered metrics still go to the real key
+    originals = {(module, attr): getattr(module, attr) for module, attr in ISOLATED_KEYS}
+    for (module, attr), key in originals.items():
+        setattr(module, attr, f"{BENCHMARK_KEY_PREFIX}:{key}")
+    try:
+        yield
+    finally:
+        metrics.flush()
+        for (module, attr), key in originals.items():
+            setattr(module, attr, key)
+        frappe.cache().delete_keys(BENCHMARK_KEY_PREFIX)
+
+
+def _currencies(count: int) -> list:
+    currencies = frappe.get_all("Currency", pluck="name", order_by="name asc")
+    if "USD" in currencies:
+        # USD first: it is the bridge for cross rates and the Free-plan base
+        currencies.remove("USD")
+        currencies.insert(0, "USD")
+    if len(currencies) < count:
+        frappe.throw(f"The benchmark needs {count} Currency records, the site has {len(currencies)}.")
+    return currencies[:count]
+
+
+def _seeded_filters(currencies: list, from_date: str) -> list:
+    """Currency Exchange rows the benchmark may write: its currencies, from `from_date` on."""
+    return [
+        ["date", ">=", from_date],
+        ["from_currency", "in", currencies],
+        ["to_currency", "in", currencies],
+    ]
+
+
+def _cleanup(seeded: list):
+    """Delete the rows the benchmark created; workers reload the pair histories that included them."""
+    names = frappe.get_all(CURRENCY_EXCHANGE, filters=seeded, pluck="name")
+    for start in range(0, len(names), DEFAULT_PURGE_BATCH_SIZE):
+        frappe.db.delete(CURRENCY_EXCHANGE, filters={"name": ("in", names[start:start + DEFAULT_PURGE_BATCH_SIZE])})
+    frappe.db.commit()
+    invalidate_history()
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(__file__), text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return None
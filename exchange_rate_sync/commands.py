@@ -0,0 +1,47 @@
+import click
+import frappe
+from frappe.commands import pass_context
+from frappe.exceptions import SiteNotSpecifiedError
+
+
+@click.command("sync-exchange-rates")
+@pass_context
+def sync_exchange_rates(context):
+    """
+    Queue an exchange rate sync on each site (use --site all for the whole bench).
+
+    With "exchange_rate_sync_shared_fetch_sec" set in common_site_config, the latest
+    rates are fetched up front, once per provider account, so the sites' sync jobs,
+    running in parallel on the workers, only write rates.
+    """
+    from exchange_rate_sync.providers import get_provider, warm_shared_rates
+    from exchange_rate_sync.tasks.schedule import enqueue_sync
+
+    if not context.sites:
+        raise SiteNotSpecifiedError
+
+    warmed = set()      # shared keys already fetched
+    for site in context.sites:
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            cfg = frappe.get_doc("Exchange Rate Config", "Exchange Rate Config")
+            if not cfg.enabled:
+                click.echo(f"{site}: exchange rate sync is disabled, skipped")
+                continue
+
+            provider = get_provider(cfg)
+            key = getattr(provider, "key", None)
+            if key and key not in warmed:
+                _, status = warm_shared_rates(provider)
+                if status == 200:
+                    warmed.add(key)
+
+            result = enqueue_sync(deadline_sec=cfg.get("run_deadline_sec"))
+            frappe.db.commit()
+            click.echo(f"{site}: {'sync queued' if result['enqueued'] else 'a sync is already queued or running'}")
+        finally:
+            frappe.destroy()
+
+
+commands = [sync_exchange_rates]
@@ -5,6 +5,17 @@ frappe.ui.form.on('Exchange Rate Config', {
 
   onload: function(frm) {
     persist_ui_fields(frm);
+
+    // Saving verifies a new API key in the background; reload once the check is done
+    frappe.realtime.off('exchange_rate_connection_checked');
+    frappe.realtime.on('exchange_rate_connection_checked', (res) => {
+      frappe.show_alert({
+        message: res.success ? __('API key verified. Plan fields have been updated.')
+                             : __('Connection failed: {0}', [res.message || res.error_code]),
+        indicator: res.success ? 'green' : 'red'
+      });
+      frm.reload_doc();
+    });
     apply_cross_rate_conversion_gate(frm);
     if (!frm.doc.api_provider){
       frm.set_value("api_provider", "https://openexchangerates.org/");
@@ -19,6 +30,10 @@ frappe.ui.form.on('Exchange Rate Config', {
     frm.add_custom_button(__('Test Connection'), async () => {
       await test_connection_button_action(frm);
     });
+
+    if (cint(frm.doc.enabled) === 1 && cint(frm.doc.connection_success) === 1) {
+      frm.add_custom_button(__('Backfill Rates'), () => backfill_dialog(frm));
+    }
   },
 
   // Enable/disable section when 'enabled' changes
@@ -75,6 +90,11 @@ frappe.ui.form.on('Exchange Rate Config', {
     }
   },
 
+  // Single USD Fetch derives every base from USD, so bases become editable on any plan
+  fetch_strategy: function(frm) {
+    persist_ui_fields(frm);
+  },
+
   // 🔒 Gate the checkbox at the point-of-change
   cross_rate_conversion: function(frm) {
     if (frm.doc.cross_rate_conversion && !is_free_plan(frm)) {
@@ -98,7 +118,12 @@ function toggle_fields_visibility(frm) {
     'from_currency_option',
     'from_currency_table',
     'to_currency_table',
-    'cross_rate_conversion'
+    'cross_rate_conversion',
+    'sync_settings_section',
+    'fallback_provider_section',
+    'schedule_section',
+    'backfill_section',
+    'retention_section'
   ].forEach(f => frm.set_df_property(f, "hidden", isEnabled ? 0 : 1));
 
   frm.set_df_property("api_key", "read_only", isEnabled ? 0 : 1);
@@ -115,7 +140,10 @@ function persist_ui_fields(frm) {
   frm.set_df_property("to_currency_table", "read_only", ok ? 0 : 1);
   frm.set_df_property("update_exchange_rates", "hidden", ok ? 0 : 1);
 
-  if (ok && frm.doc.from_currency_option === "All Currencies") {
+  const any_base = frm.doc.from_currency_option === "All Currencies"
+    || (frm.doc.from_currency_option === "USD Only" && frm.doc.fetch_strategy === "Single USD Fetch");
+
+  if (ok && any_base) {
     // Editable only in this case
     frm.set_df_property("from_currency_table", "read_only", 0);
   } else {
@@ -130,15 +158,72 @@ function persist_ui_fields(frm) {
 function call_update_exchange_rates(frm) {
   frappe.call({
     method: "exchange_rate_sync.tasks.api.get_currency_exchange_ui",
-    freeze: true,
-    freeze_message: __("Updating exchange rates..."),
     callback: function(r) {
       if (r.message) {
-        frappe.msgprint(r.message);
+        frappe.show_alert({ message: r.message.message, indicator: "blue" });
+        poll_sync_status(frm);
+      }
+    }
+  });
+}
+
+// Poll the background sync and show per-base progress until it finishes
+function poll_sync_status(frm) {
+  frappe.call({
+    method: "exchange_rate_sync.tasks.api.get_sync_status_ui",
+    callback: function(r) {
+      const s = r.message || {};
+      if (s.status === "finished" || s.status === "failed") {
+        frappe.hide_progress();
+        frappe.msgprint(s.message || __("Exchange rate sync finished."));
         frm.reload_doc();
+        return;
+      }
+      // The job ended without reporting (timeout, killed worker) or is gone
+      if (!s.job_status || ["finished", "failed", "stopped", "canceled"].includes(s.job_status)) {
+        frappe.hide_progress();
+        frappe.msgprint(__("Exchange rate sync job {0} (check Error Log).", [s.job_status || __("not found")]));
+        frm.reload_doc();
+        return;
+      }
+
+      if (s.total) {
+        const stage = s.stage === "writing" ? __("Writing rates...") : __("Fetching rates...");
+        frappe.show_progress(__("Updating exchange rates"), s.done || 0, s.total, stage);
       }
+      setTimeout(() => poll_sync_status(frm), 2000);
+    }
+  });
+}
+
+function backfill_dialog(frm) {
+  const d = new frappe.ui.Dialog({
+    title: __('Backfill Historical Rates'),
+    fields: [
+      { fieldname: 'from_date', fieldtype: 'Date', label: __('From Date'), reqd: 1,
+        default: frm.doc.backfill_from_date },
+      { fieldname: 'to_date', fieldtype: 'Date', label: __('To Date'), reqd: 1,
+        default: frm.doc.backfill_to_date || frappe.datetime.get_today() },
+      { fieldtype: 'HTML',
+        options: `<p class="text-muted small">${__('Dates that already have rates are skipped. Running the same range again resumes an interrupted backfill.')}</p>` },
+    ],
+    primary_action_label: __('Start Backfill'),
+    primary_action(values) {
+      frappe.call({
+        method: 'exchange_rate_sync.tasks.api.enqueue_backfill_ui',
+        args: values,
+        freeze: true,
+        callback: (r) => {
+          d.hide();
+          if (r.message) {
+            frappe.show_alert({ message: r.message.message, indicator: 'green' });
+            frm.reload_doc();
+          }
+        }
+      });
     }
   });
+  d.show();
 }
 
 async function test_connection_button_action(frm) {
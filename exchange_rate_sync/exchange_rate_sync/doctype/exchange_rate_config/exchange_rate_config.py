@@ -1,10 +1,19 @@
 # For license information, please see license.txt
 
+import hashlib
+import json
+import time
+
 import frappe
 from frappe.model.document import Document
-import requests
+from frappe.utils.background_jobs import is_job_enqueued
 
+from exchange_rate_sync.providers import get_provider
 
+CONNECTION_CACHE_KEY = "exchange_rate_sync:connection"
+CONNECTION_TTL_SEC = 6 * 60 * 60   # a successful check is reused this long
+CONNECTION_JOB_ID = "exchange_rate_sync:check_connection"
+CONNECTION_EVENT = "exchange_rate_connection_checked"
 
 ERROR_EXPLANATIONS = {
     "invalid_app_id": "Invalid App ID provided. Please check your API Key.",
@@ -19,9 +28,9 @@ ERROR_EXPLANATIONS = {
 class ExchangeRateConfig(Document):
 
     def validate(self):
-        # Validate API key and auto-set from_currency_option based on plan
-        if self.api_key:
-            test_connection(self)
+        # Set plan fields from a recent check, or verify the API key in the background
+        if self.api_key and self.enabled and not self.flags.connection_checked:
+            check_connection(self)
 
         # Collect current values
         from_vals = [r.from_currency for r in self.from_currency_table]
@@ -30,9 +39,12 @@ class ExchangeRateConfig(Document):
         # Decide final from-currency list based on option
         option = (self.from_currency_option or "").strip()
 
-        if option == "USD Only":
+        # A single USD fetch derives every base locally, so any base works on any plan
+        triangulate = (self.fetch_strategy or "") == "Single USD Fetch"
+
+        if option == "USD Only" and not triangulate:
             final_from = ["USD"]                       # exactly one row, USD
-        elif option == "All Currencies":
+        elif option in ("USD Only", "All Currencies"):
             final_from = normalize_list(from_vals)     # keep values, remove duplicates, uppercase
         else:
             final_from = []                            # empty in all other cases
@@ -47,8 +59,6 @@ class ExchangeRateConfig(Document):
         write_child_table(self, "from_currency_table", final_from, "from_currency")
         write_child_table(self, "to_currency_table", final_to, "to_currency")
 
-        frappe.db.commit()
-
 
 def normalize_list(lst):
     """
@@ -84,40 +94,110 @@ def write_child_table(doc: Document, table_attr: str, values: list[str], currenc
         doc.append(table_attr, {currency_field: v})
 
 
-def test_connection(doc):
-    if doc.enabled == 0:
-        return
-
-    url = f"https://openexchangerates.org/api/usage.json?app_id={doc.api_key}"
-    response = requests.get(url)
-
-    if response.status_code == 200:
-        data = response.json().get("data", {})
+def apply_usage(doc, provider=None) -> tuple:
+    """
+    Query the provider's usage endpoint and set connection, plan and currency-option
+    fields on `doc` (not saved). A successful answer is cached for CONNECTION_TTL_SEC.
+    Returns (success, error_code, explanation).
+    """
+    provider = provider or get_provider(doc)
+    data, status = provider.usage()
+    if status == 200:
+        frappe.cache().set_value(
+            CONNECTION_CACHE_KEY,
+            {"key": connection_key(doc), "data": data, "checked_at": time.time()},
+            expires_in_sec=CONNECTION_TTL_SEC,
+        )
+    return set_connection_fields(doc, data, status)
+
+
+def set_connection_fields(doc, data, status) -> tuple:
+    """Set connection and plan fields on `doc` from a usage answer. Returns (success, error_code, explanation)."""
+    if status == 200:
+        plan = data.get("plan") or {}
+        features = plan.get("features") or {}
 
         doc.connection_success = 1
-        doc.quota = data["plan"].get("quota", "N/A")
-        doc.plan = data["plan"].get("name", "N/A")
+        doc.quota = plan.get("quota", "N/A")
+        doc.plan = plan.get("name", "N/A")
         doc.api_status = data.get("status", "active")
+        doc.plan_features = json.dumps(features)
 
         # Set currency option from plan features
-        if data["plan"]["features"].get("base", False):
+        if features.get("base", False):
             doc.from_currency_option = "All Currencies"
         else:
             doc.from_currency_option = "USD Only"
+        return True, None, None
+
+    error_code = (data or {}).get("message", "Unknown Error")
+    explanation = ERROR_EXPLANATIONS.get(error_code, "Unknown error. Please try again or contact support.")
+
+    doc.connection_success = 0
+    doc.quota = "N/A"
+    doc.plan = "N/A"
+    doc.api_status = f"{explanation}"
+    doc.from_currency_option = "N/A"
+    doc.plan_features = None
+    return False, error_code, explanation
+
 
-        frappe.db.commit()
-        frappe.msgprint("Connection successful. Fields have been updated.")
+def connection_key(doc) -> str:
+    """Identifies what a connection check verified: the API key, or the offline snapshot path."""
+    source = f"{frappe.conf.get('exchange_rate_sync_snapshot_path') or ''}:{(doc.api_key or '').strip()}"
+    return hashlib.sha1(source.encode()).hexdigest()
 
 
-    else:
-        error_json = response.json()
-        error_code = error_json.get("message", "Unknown Error")
-        explanation = ERROR_EXPLANATIONS.get(error_code, "Unknown error. Please try again or contact support.")
+def cached_usage(doc):
+    """The usage answer of a successful check of `doc`'s API key within CONNECTION_TTL_SEC, or None."""
+    cached = frappe.cache().get_value(CONNECTION_CACHE_KEY, expires=True)
+    if cached and cached.get("key") == connection_key(doc) and time.time() - cached["checked_at"] < CONNECTION_TTL_SEC:
+        return cached["data"]
+    return None
+
+
+def check_connection(doc):
+    """
+    Called on save, never blocks on the network: applies a recent successful check of
+    the same API key, otherwise enqueues verify_connection and keeps the current plan
+    fields until it finishes.
+    """
+    usage = cached_usage(doc)
+    if usage is not None:
+        set_connection_fields(doc, usage, 200)
+        return
+
+    if not is_job_enqueued(CONNECTION_JOB_ID):
+        frappe.enqueue(
+            "exchange_rate_sync.exchange_rate_sync.doctype.exchange_rate_config.exchange_rate_config.verify_connection",
+            queue="short",
+            timeout=60,
+            job_id=CONNECTION_JOB_ID,
+            deduplicate=True,
+            enqueue_after_commit=True,
+            user=frappe.session.user,
+        )
+    frappe.msgprint("Verifying the API key in the background. Plan fields update when it finishes.", alert=True)
+
+
+def verify_connection(user: str | None = None):
+    """
+    Background job: query the usage endpoint (timed out by the provider), save the
+    resulting plan fields and notify `user` so an open form reloads.
+    """
+    doc = frappe.get_doc("Exchange Rate Config", "Exchange Rate Config")
+    if not doc.enabled or not doc.api_key:
+        return
 
-        doc.connection_success = 0
-        doc.quota = "N/A"
-        doc.plan = "N/A"
-        doc.api_status = f"{explanation}"
-        doc.from_currency_option = "N/A"
-        frappe.db.commit()
-        frappe.msgprint(f"Connection failed: {error_code} — {explanation}")
+    success, error_code, explanation = apply_usage(doc)
+    doc.flags.connection_checked = True
+    doc.flags.ignore_permissions = True
+    doc.save()
+    frappe.db.commit()
+
+    if user:
+        frappe.publish_realtime(
+            CONNECTION_EVENT,
+            {"success": success, "error_code": error_code, "message": explanation},
+            user=user,
+        )
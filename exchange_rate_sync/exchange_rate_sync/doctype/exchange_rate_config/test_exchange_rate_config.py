@@ -1,9 +1,130 @@
 # Copyright (c) 2025, DeliveryDevs  and Contributors
 # See license.txt
 
-# import frappe
+import json
+import os
+import shutil
+import tempfile
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
 
+from exchange_rate_sync.exchange_rate_sync.doctype.exchange_rate_config.exchange_rate_config import (
+	apply_usage,
+	cached_usage,
+	check_connection,
+	normalize_list,
+)
+from exchange_rate_sync.providers import FileProvider, RateProvider
+
+USD_SNAPSHOT = {"timestamp": 1735689600, "base": "USD", "rates": {"EUR": 0.5, "GBP": 0.25, "PKR": 250.0}}
+
+
+def write_json(path, data):
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path, "w") as f:
+		json.dump(data, f)
+
+
+class FailingProvider(RateProvider):
+	def usage(self, **http):
+		return {"message": "invalid_app_id"}, 401
+
+
+class TestFileProvider(FrappeTestCase):
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.path)
+		write_json(os.path.join(self.path, "latest.json"), USD_SNAPSHOT)
+		write_json(
+			os.path.join(self.path, "historical", "2025-01-01.json"),
+			{**USD_SNAPSHOT, "rates": {"EUR": 0.4, "GBP": 0.2}},
+		)
+		self.provider = FileProvider(self.path)
+
+	def test_latest_usd(self):
+		data, status = self.provider.latest("USD", ["EUR", "GBP"])
+		self.assertEqual(status, 200)
+		self.assertEqual(data["rates"], {"EUR": 0.5, "GBP": 0.25})
+		self.assertEqual(data["timestamp"], USD_SNAPSHOT["timestamp"])
+
+	def test_latest_derives_other_base(self):
+		data, status = self.provider.latest("EUR", ["USD", "GBP"])
+		self.assertEqual(status, 200)
+		self.assertEqual(data["base"], "EUR")
+		self.assertAlmostEqual(data["rates"]["USD"], 2.0)
+		self.assertAlmostEqual(data["rates"]["GBP"], 0.5)
+
+	def test_latest_unknown_base(self):
+		self.assertEqual(self.provider.latest("XYZ", ["USD"]), (None, 400))
+
+	def test_historical(self):
+		data, status = self.provider.historical("2025-01-01", "USD", ["EUR"])
+		self.assertEqual(status, 200)
+		self.assertEqual(data["rates"], {"EUR": 0.4})
+		self.assertEqual(self.provider.historical("2025-01-02", "USD", ["EUR"]), (None, 404))
+
+	def test_time_series_skips_missing_dates(self):
+		data, status = self.provider.time_series("2024-12-31", "2025-01-02", "USD", ["GBP"])
+		self.assertEqual(status, 200)
+		self.assertEqual(data["rates"], {"2025-01-01": {"GBP": 0.2}})
+
+	def test_single_file_serves_every_date(self):
+		provider = FileProvider(os.path.join(self.path, "latest.json"))
+		data, status = provider.historical("2020-06-30", "USD", ["PKR"])
+		self.assertEqual(status, 200)
+		self.assertEqual(data["rates"], {"PKR": 250.0})
+
+	def test_stats_are_filled(self):
+		stats = {}
+		self.provider.latest("USD", ["EUR"], stats=stats, session=None)
+		self.assertEqual(stats["attempts"], 1)
+		self.assertGreaterEqual(stats["latency"], 0)
+
+	def test_usage_and_capabilities(self):
+		data, status = self.provider.usage()
+		self.assertEqual(status, 200)
+		self.assertTrue(data["plan"]["features"]["base"])
+		self.assertTrue(self.provider.capabilities()["time-series"])
+		self.assertFalse(self.provider.requires_api_key)
+
+
+class TestApplyUsage(FrappeTestCase):
+	def test_successful_connection_sets_plan(self):
+		path = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, path)
+		doc = frappe._dict()
+		success, error_code, _ = apply_usage(doc, FileProvider(path))
+		self.assertTrue(success)
+		self.assertIsNone(error_code)
+		self.assertEqual(doc.connection_success, 1)
+		self.assertEqual(doc.from_currency_option, "All Currencies")
+		self.assertTrue(json.loads(doc.plan_features)["time-series"])
+
+	def test_failed_connection_clears_plan(self):
+		doc = frappe._dict(plan_features='{"base": true}')
+		success, error_code, explanation = apply_usage(doc, FailingProvider())
+		self.assertFalse(success)
+		self.assertEqual(error_code, "invalid_app_id")
+		self.assertIn("Invalid App ID", explanation)
+		self.assertEqual(doc.connection_success, 0)
+		self.assertEqual(doc.from_currency_option, "N/A")
+		self.assertIsNone(doc.plan_features)
+
+	def test_successful_check_is_reused_for_the_same_key(self):
+		path = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, path)
+		apply_usage(frappe._dict(api_key="key-1"), FileProvider(path))
+
+		doc = frappe._dict(api_key="key-1")
+		check_connection(doc)
+		self.assertEqual(doc.connection_success, 1)
+		self.assertIsNone(cached_usage(frappe._dict(api_key="key-2")))
+
+
+class TestNormalizeList(FrappeTestCase):
+	def test_dedupes_case_insensitively_in_order(self):
+		self.assertEqual(normalize_list([" usd", "EUR", "Usd", "", None, "eur", "pkr"]), ["USD", "EUR", "PKR"])
 
-class TestExchangeRateConfig(FrappeTestCase):
-	pass
+	def test_empty(self):
+		self.assertEqual(normalize_list(None), [])
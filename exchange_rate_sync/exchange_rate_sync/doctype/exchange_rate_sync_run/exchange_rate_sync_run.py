@@ -0,0 +1,18 @@
+# Copyright (c) 2026, DeliveryDevs  and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder import Interval
+from frappe.query_builder.functions import Now
+
+
+class ExchangeRateSyncRun(Document):
+	@staticmethod
+	def clear_old_logs(days=30):
+		"""Called by Log Settings; drops runs (and their request rows) older than `days`."""
+		run = frappe.qb.DocType("Exchange Rate Sync Run")
+		request = frappe.qb.DocType("Exchange Rate Sync Run Request")
+		old_runs = frappe.qb.from_(run).select(run.name).where(run.creation < (Now() - Interval(days=days)))
+		frappe.db.delete(request, filters=(request.parent.isin(old_runs)))
+		frappe.db.delete(run, filters=(run.creation < (Now() - Interval(days=days))))
@@ -83,7 +83,8 @@ app_license = "mit"
 # # ------------
 
 # # before_install = "exchange_rate_sync.install.before_install"
-# # after_install = "exchange_rate_sync.install.after_install"
+after_install = "exchange_rate_sync.install.after_install"
+after_migrate = "exchange_rate_sync.install.after_migrate"
 
 # # Uninstallation
 # # ------------
@@ -145,6 +146,14 @@ app_license = "mit"
 # # 	}
 # # }
 
+# Rates edited or deleted by hand must not be served from the rate caches (see tasks/asof.py)
+doc_events = {
+	"Currency Exchange": {
+		"on_update": "exchange_rate_sync.tasks.asof.on_currency_exchange_change",
+		"on_trash": "exchange_rate_sync.tasks.asof.on_currency_exchange_change"
+	}
+}
+
 # # Scheduled Tasks
 # # ---------------
 
@@ -157,11 +166,17 @@ app_license = "mit"
 
 
 scheduler_events = {
+	# Ticks every 5 minutes; run_scheduled_sync only syncs when due per "Sync Frequency"
+	"cron": {
+		"*/5 * * * *": [
+			"exchange_rate_sync.tasks.daily.run_scheduled_sync"
+		],
+	},
 # # 	# "all": [
 # # 	# 	"exchange_rate_sync.tasks.all"
 # # 	# ],
 	"daily": [
-		"exchange_rate_sync.tasks.daily.get_currency_exchange"
+		"exchange_rate_sync.tasks.monthly.delete_currency_exchange_daily"
 	],
 # # 	# "hourly": [
 # # 	# 	"exchange_rate_sync.tasks.hourly"
@@ -185,6 +200,12 @@ scheduler_events = {
 # # override_whitelisted_methods = {
 # # 	"frappe.desk.doctype.event.event.get_events": "exchange_rate_sync.event.get_events"
 # # }
+
+# As-of-date lookup from the synced rates; falls back to ERPNext's own (see tasks/asof.py)
+override_whitelisted_methods = {
+	"erpnext.setup.utils.get_exchange_rate": "exchange_rate_sync.tasks.asof.get_exchange_rate"
+}
+
 # #
 # # each overriding function accepts a `data` argument;
 # # generated from the base implementation of the doctype dashboard,
@@ -250,3 +271,7 @@ scheduler_events = {
 # # 	"Logging DocType Name": 30  # days to retain logs
 # # }
 
+default_log_clearing_doctypes = {
+	"Exchange Rate Sync Run": 30,
+}
+
@@ -0,0 +1,64 @@
+import frappe
+from frappe.query_builder.functions import Count
+
+CURRENCY_EXCHANGE_INDEX_FIELDS = ["date", "from_currency", "to_currency"]
+# ERPNext keeps separate Buying and Selling rates per date and pair, so uniqueness includes them
+CURRENCY_EXCHANGE_UNIQUE_FIELDS = [*CURRENCY_EXCHANGE_INDEX_FIELDS, "for_buying", "for_selling"]
+INDEX_NAME = "exchange_rate_sync_date_pair_index"
+UNIQUE_INDEX_NAME = "exchange_rate_sync_date_pair_side_unique"
+
+
+def after_install():
+    ensure_currency_exchange_index()
+
+
+def after_migrate():
+    ensure_currency_exchange_index()
+
+
+def find_duplicate_pairs(limit: int = 20) -> list:
+    """(date, from_currency, to_currency, for_buying, for_selling, count) groups that occur more than once."""
+    ce = frappe.qb.DocType("Currency Exchange")
+    return (
+        frappe.qb.from_(ce)
+        .select(ce.date, ce.from_currency, ce.to_currency, ce.for_buying, ce.for_selling, Count("*").as_("count"))
+        .groupby(ce.date, ce.from_currency, ce.to_currency, ce.for_buying, ce.for_selling)
+        .having(Count("*") > 1)
+        .limit(limit)
+    ).run(as_dict=True)
+
+
+def ensure_currency_exchange_index():
+    """
+    Make sure Currency Exchange has a composite index on (date, from_currency, to_currency),
+    which every sync lookup and the retention purge filter on. Safe to run on every migrate.
+
+    With exchange_rate_sync_unique_index set in site config, a UNIQUE index on
+    (date, from_currency, to_currency, for_buying, for_selling) is added as well,
+    unless duplicate rows block it; those are reported.
+    """
+    table = "tabCurrency Exchange"
+    if not frappe.db.has_index(table, INDEX_NAME):
+        frappe.db.add_index("Currency Exchange", CURRENCY_EXCHANGE_INDEX_FIELDS, index_name=INDEX_NAME)
+        frappe.logger().info(f"Exchange Rate Sync: added index {INDEX_NAME} on {table}")
+
+    if not frappe.conf.get("exchange_rate_sync_unique_index") or frappe.db.has_index(table, UNIQUE_INDEX_NAME):
+        return
+
+    duplicates = find_duplicate_pairs()
+    if not duplicates:
+        frappe.db.add_unique("Currency Exchange", CURRENCY_EXCHANGE_UNIQUE_FIELDS, constraint_name=UNIQUE_INDEX_NAME)
+        frappe.logger().info(f"Exchange Rate Sync: added unique index {UNIQUE_INDEX_NAME} on {table}")
+        return
+
+    sample = "\n".join(
+        f"{d.date} {d.from_currency}->{d.to_currency} (buying={d.for_buying}, selling={d.for_selling}): {d.count} rows"
+        for d in duplicates
+    )
+    msg = (
+        f"Could not add unique index {UNIQUE_INDEX_NAME} on {table}: existing duplicate "
+        f"(date, from_currency, to_currency, for_buying, for_selling) rows block it. "
+        f"Remove the duplicates and run bench migrate again.\nExamples:\n{sample}"
+    )
+    frappe.logger().warning(f"Exchange Rate Sync: {msg}")
+    frappe.log_error("Exchange Rate Sync: Currency Exchange index", msg)
@@ -0,0 +1,54 @@
+import frappe
+from frappe.utils import cint, flt
+
+from ..tasks.writer import previous_rates
+from .base import RateProvider
+from .fanout import FanoutProvider, RateCheck
+from .file import FileProvider
+from .frankfurter import FrankfurterProvider
+from .openexchangerates import OpenExchangeRatesProvider
+from .shared import SharedProvider, warm_shared_rates
+
+FALLBACK_PROVIDERS = {  # 'Fallback Provider' option -> provider class
+    "Frankfurter (ECB)": FrankfurterProvider,
+}
+STRATEGY_HEDGED = "Hedged"
+
+
+def get_provider(cfg=None, api_key: str | None = None, check_date: str | None = None) -> RateProvider:
+    """
+    Provider for the site: Open Exchange Rates with the configured API key, or the
+    offline FileProvider when "exchange_rate_sync_snapshot_path" is set in site config
+    (relative to the site folder).
+
+    With a 'Fallback Provider' configured, both are combined in a FanoutProvider.
+    check_date: sanity-check latest rates against the last stored rates before this date
+    (needs 'Max Rate Deviation').
+
+    With "exchange_rate_sync_shared_fetch_sec" set (in common_site_config for the whole
+    bench), latest rates are fetched once per that many seconds for all sites using the same
+    provider and account (SharedProvider); not for the offline FileProvider.
+    """
+    if cfg is None:
+        cfg = frappe.get_doc("Exchange Rate Config", "Exchange Rate Config")
+
+    snapshot_path = frappe.conf.get("exchange_rate_sync_snapshot_path")
+    if snapshot_path:
+        primary = FileProvider(frappe.get_site_path(snapshot_path))
+    else:
+        primary = OpenExchangeRatesProvider(api_key or cfg.api_key, cfg.get("plan_features"))
+
+    check = None
+    if check_date and flt(cfg.get("max_rate_deviation")) > 0:
+        check = RateCheck(previous_rates(check_date), flt(cfg.max_rate_deviation))
+
+    provider = primary
+    fallback = FALLBACK_PROVIDERS.get(cfg.get("fallback_provider"))
+    if fallback:
+        hedge_after_sec = cint(cfg.get("hedge_after_ms")) / 1000 if cfg.get("provider_strategy") == STRATEGY_HEDGED else None
+        provider = FanoutProvider([primary, fallback()], hedge_after_sec=hedge_after_sec, check=check)
+
+    shared_fetch_sec = cint(frappe.conf.get("exchange_rate_sync_shared_fetch_sec"))
+    if shared_fetch_sec > 0 and not snapshot_path:
+        provider = SharedProvider(provider, max_age=shared_fetch_sec, check=check)
+    return provider
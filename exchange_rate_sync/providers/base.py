@@ -0,0 +1,44 @@
+import json
+
+
+class RateProvider:
+    """
+    Source of exchange rates used by the sync, the backfill and the connection test.
+
+    Rate responses follow the Open Exchange Rates shape, which the rest of the app reads:
+        latest / historical -> ({"base": "USD", "timestamp": 1700000000, "rates": {"EUR": 0.92, ...}}, status)
+        time_series         -> ({"base": "USD", "rates": {"2025-01-01": {"EUR": 0.92, ...}, ...}}, status)
+        usage               -> ({"status": "active", "plan": {"name", "quota", "features"}, "usage": {...}}, status)
+    On failure the dict is None (or the provider's error body for usage) and status is
+    the HTTP status, or None for network errors.
+
+    `http` keyword arguments (session, limiter, on_error, stats) are those of
+    tasks.fetch._req_with_retry; providers that do no HTTP accept and ignore them,
+    except for filling `stats`. Methods may run on fetch worker threads and must
+    not call frappe.* there (see tasks.fetch.fetch_concurrently).
+    """
+
+    name = None
+    requires_api_key = True
+    retries = 2          # attempts per call for HTTP providers
+
+    def __init__(self, plan_features=None):
+        if isinstance(plan_features, str):
+            plan_features = json.loads(plan_features or "{}")
+        self.plan_features = plan_features or {}
+
+    def capabilities(self) -> dict:
+        """Plan features, e.g. {"base": True, "time-series": False}, as last reported by usage()."""
+        return dict(self.plan_features)
+
+    def latest(self, base: str = "USD", symbols: list | None = None, **http) -> tuple:
+        raise NotImplementedError
+
+    def historical(self, date: str, base: str = "USD", symbols: list | None = None, **http) -> tuple:
+        raise NotImplementedError
+
+    def time_series(self, start: str, end: str, base: str = "USD", symbols: list | None = None, **http) -> tuple:
+        raise NotImplementedError
+
+    def usage(self, **http) -> tuple:
+        raise NotImplementedError
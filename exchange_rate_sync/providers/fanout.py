@@ -0,0 +1,165 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import frappe
+
+from ..tasks import metrics
+from .base import RateProvider
+
+
+class RateCheck:
+    """
+    Plausibility check of a provider's rates against reference rates (usually the
+    last stored ones). Rejects the set when a rate is not positive, or when any
+    reference pair that can be derived from it moved by more than `max_deviation`
+    (relative, 0.2 = 20%).
+    """
+
+    def __init__(self, reference: dict, max_deviation: float):
+        self.reference = reference          # {(from_currency, to_currency): rate}
+        self.max_deviation = max_deviation
+
+    def __call__(self, base: str, rates: dict):
+        """Returns the reason for rejecting base->* `rates`, or None if they look fine."""
+        vector = {base: 1.0}
+        for to_currency, rate in rates.items():
+            if not rate or rate <= 0:
+                return f"{base}->{to_currency}: invalid rate {rate}"
+            vector[to_currency] = rate
+
+        for (from_currency, to_currency), old_rate in self.reference.items():
+            if from_currency not in vector or to_currency not in vector or not old_rate:
+                continue
+            rate = vector[to_currency] / vector[from_currency]
+            if abs(rate / old_rate - 1) > self.max_deviation:
+                return (
+                    f"{from_currency}->{to_currency}: {rate} differs from the stored {old_rate} "
+                    f"by more than {self.max_deviation:.0%}"
+                )
+        return None
+
+
+class FanoutProvider(RateProvider):
+    """
+    Several providers behind one, in priority order. A call is answered by the
+    first provider whose response is a non-empty rate set that passes `check`
+    (latest rates only).
+
+    hedge_after_sec=None: priority fallback, the next provider is asked only after
+                          the previous one failed or was rejected.
+    hedge_after_sec=n:    hedged, the next provider is also asked when the previous
+                          one has not answered within n seconds; the first accepted
+                          answer wins and slower requests are left to finish unobserved.
+
+    Every provider but the last gets a single attempt: moving on to the next
+    provider replaces retrying. If no answer is accepted, the first provider's
+    answer is returned (so a rejected but valid rate set is still used).
+    """
+
+    name = "Fan-out"
+
+    def __init__(self, providers: list, hedge_after_sec: float | None = None, check: RateCheck | None = None):
+        super().__init__(providers[0].plan_features)
+        self.providers = providers
+        self.hedge_after_sec = hedge_after_sec
+        self.check = check
+        self.requires_api_key = providers[0].requires_api_key
+        for provider in providers[:-1]:
+            provider.retries = 1
+
+    def capabilities(self):
+        return self.providers[0].capabilities()
+
+    def usage(self, **http):
+        return self.providers[0].usage(**http)
+
+    def latest(self, base="USD", symbols=None, **http):
+        return self._call("latest", (base, symbols), http, check_base=base)
+
+    def historical(self, date, base="USD", symbols=None, **http):
+        return self._call("historical", (date, base, symbols), http)
+
+    def time_series(self, start, end, base="USD", symbols=None, **http):
+        return self._call("time_series", (start, end, base, symbols), http)
+
+    def _rejection(self, data, status, check_base=None):
+        if status != 200:
+            return f"status {status or 'network error'}"
+        rates = (data or {}).get("rates")
+        if not rates:
+            return "no rates returned"
+        if check_base and self.check:
+            return self.check(check_base, rates)
+        return None
+
+    def _call(self, method: str, args: tuple, http: dict, check_base: str | None = None) -> tuple:
+        stats = http.pop("stats", None)
+        report = http.pop("on_error", None) or frappe.log_error   # set when called off the main thread
+        errors = []
+        started = time.perf_counter()
+
+        def ask(index):
+            provider_stats = {}
+            data, status = getattr(self.providers[index], method)(
+                *args, on_error=lambda **kw: errors.append(kw), stats=provider_stats, **http
+            )
+            return index, data, status, provider_stats
+
+        answers = {}
+        winner = None
+        if self.hedge_after_sec is None:
+            for index in range(len(self.providers)):
+                answers[index] = ask(index)
+                if self._accept(answers[index], check_base, errors):
+                    winner = index
+                    break
+        else:
+            winner = self._hedged(ask, answers, check_base, errors)
+
+        index = winner if winner is not None else min(answers)
+        _, data, status, _ = answers[index]
+        if winner is not None:
+            metrics.inc("provider_answers_total", provider=self.providers[winner].name)
+
+        for error in list(errors):
+            report(**error)
+        if stats is not None:
+            stats.update(
+                attempts=sum(s.get("attempts", 0) for _, _, _, s in answers.values()),
+                latency=time.perf_counter() - started,
+                provider=self.providers[index].name,
+            )
+        return data, status
+
+    def _accept(self, answer, check_base, errors) -> bool:
+        index, data, status, _ = answer
+        reason = self._rejection(data, status, check_base)
+        if reason and index < len(self.providers) - 1:
+            errors.append({
+                "title": "Exchange Rate Sync: provider answer rejected",
+                "message": f"{self.providers[index].name}: {reason}; asking {self.providers[index + 1].name}",
+            })
+        return not reason
+
+    def _hedged(self, ask, answers, check_base, errors):
+        pool = ThreadPoolExecutor(max_workers=len(self.providers), thread_name_prefix="exchange-rate-hedge",
+                                  initializer=metrics.bind_site, initargs=(metrics.current_site(),))
+        try:
+            pending = {pool.submit(ask, 0)}
+            next_index = 1
+            while pending:
+                hedge = next_index < len(self.providers)
+                done, pending = wait(pending, timeout=self.hedge_after_sec if hedge else None,
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    answer = future.result()
+                    answers[answer[0]] = answer
+                    if self._accept(answer, check_base, errors):
+                        return answer[0]
+                if hedge:
+                    # the previous provider is slow, failed or was rejected
+                    pending.add(pool.submit(ask, next_index))
+                    next_index += 1
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        return None
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import time
+
+from frappe.utils import add_days, date_diff, getdate
+
+from ..tasks.cross import rebase_rates
+from .base import RateProvider
+
+DEFAULT_USAGE = {
+    "status": "active",
+    "plan": {
+        "name": "Offline Snapshot",
+        "quota": "Unlimited",
+        "features": {"base": True, "symbols": True, "time-series": True},
+    },
+    "usage": {},
+}
+
+
+class FileProvider(RateProvider):
+    """
+    Replays Open Exchange Rates JSON snapshots from disk, for offline runs and load tests.
+
+    `path` is either a single USD-based snapshot file, served for every date, or a directory:
+        latest.json                 USD-based latest rates
+        historical/YYYY-MM-DD.json  USD-based rates per date (404 when missing)
+        usage.json                  optional, the "data" part of a usage.json response
+    Other base currencies are derived from the USD rates, so any base works.
+    """
+
+    name = "Offline Snapshot"
+    requires_api_key = False
+
+    def __init__(self, path: str, plan_features=None):
+        super().__init__(plan_features or DEFAULT_USAGE["plan"]["features"])
+        self.path = path
+        self._files = {}            # file path -> parsed JSON, read once per provider
+        self._lock = threading.Lock()
+
+    def _load(self, *parts):
+        if os.path.isfile(self.path):
+            file_path = self.path
+        else:
+            file_path = os.path.join(self.path, *parts)
+        with self._lock:
+            if file_path not in self._files:
+                try:
+                    with open(file_path) as f:
+                        self._files[file_path] = json.load(f)
+                except FileNotFoundError:
+                    self._files[file_path] = None
+            return self._files[file_path]
+
+    def _rates(self, snapshot, base, symbols, stats=None, started=None) -> tuple:
+        if stats is not None:
+            stats.update(attempts=1, latency=time.perf_counter() - started)
+        if not snapshot:
+            return None, 404
+
+        usd_rates = {**(snapshot.get("rates") or {}), "USD": 1.0}
+        if base not in usd_rates:
+            return None, 400
+        symbols = symbols or [c for c in usd_rates if c != base]
+        return {
+            "base": base,
+            "timestamp": snapshot.get("timestamp"),
+            "rates": rebase_rates(usd_rates, base, symbols),
+        }, 200
+
+    def latest(self, base="USD", symbols=None, stats=None, **http):
+        started = time.perf_counter()
+        return self._rates(self._load("latest.json"), base, symbols, stats, started)
+
+    def historical(self, date, base="USD", symbols=None, stats=None, **http):
+        started = time.perf_counter()
+        return self._rates(self._load("historical", f"{date}.json"), base, symbols, stats, started)
+
+    def time_series(self, start, end, base="USD", symbols=None, stats=None, **http):
+        started = time.perf_counter()
+        by_date = {}
+        for i in range(date_diff(end, start) + 1):
+            date_str = str(getdate(add_days(start, i)))
+            data, status = self._rates(self._load("historical", f"{date_str}.json"), base, symbols)
+            if status == 200:
+                by_date[date_str] = data["rates"]
+        if stats is not None:
+            stats.update(attempts=1, latency=time.perf_counter() - started)
+        if not by_date:
+            return None, 404
+        return {"base": base, "start_date": start, "end_date": end, "rates": by_date}, 200
+
+    def usage(self, **http):
+        usage = self._load("usage.json") if not os.path.isfile(self.path) else None
+        return usage or DEFAULT_USAGE, 200
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import frappe
+
+from ..tasks.fetch import DELAY_SEC, _req_with_retry, get_session
+from .base import RateProvider
+
+FRANKFURTER_API_URL = "https://api.frankfurter.app"
+CURRENCIES_TTL_SEC = 24 * 60 * 60   # how long the list of supported currencies is reused
+
+_currencies = {}                    # api_url -> (time.monotonic() fetched, set of currency codes)
+_currencies_lock = threading.Lock()
+
+USAGE = {
+    "status": "active",
+    "plan": {
+        "name": "Frankfurter (ECB)",
+        "quota": "Unlimited",
+        "features": {"base": True, "symbols": True, "time-series": True},
+    },
+    "usage": {},
+}
+
+
+class FrankfurterProvider(RateProvider):
+    """
+    frankfurter.app: European Central Bank reference rates, no API key.
+    Published once per working day for about 30 currencies; a request with an
+    unsupported currency fails as a whole, so unsupported symbols are dropped
+    before asking (see supported_currencies) and reported as missing.
+    """
+
+    name = "Frankfurter (ECB)"
+    requires_api_key = False
+
+    def __init__(self, api_url: str = FRANKFURTER_API_URL):
+        super().__init__(USAGE["plan"]["features"])
+        self.api_url = api_url.rstrip("/")
+
+    def supported_currencies(self, **http) -> set | None:
+        """Currency codes Frankfurter quotes (/currencies), fetched once a day per process; None if unknown."""
+        with _currencies_lock:
+            fetched_at, codes = _currencies.get(self.api_url, (None, None))
+        if fetched_at is not None and time.monotonic() - fetched_at < CURRENCIES_TTL_SEC:
+            return codes
+
+        data, status = _req_with_retry(f"{self.api_url}/currencies", params={}, retries=1, delay_sec=DELAY_SEC,
+                                       session=http.get("session") or get_session(), on_error=http.get("on_error"))
+        if status != 200 or not data:
+            return codes   # keep using a stale list rather than none
+        codes = set(data)
+        with _currencies_lock:
+            _currencies[self.api_url] = (time.monotonic(), codes)
+        return codes
+
+    def _get(self, path: str, base: str, symbols: list | None = None, **http) -> tuple:
+        """GET `path`; the answer lists symbols Frankfurter does not quote under "missing"."""
+        http.setdefault("session", get_session())
+        params = {"base": base}
+        missing = []
+        if symbols:
+            supported = self.supported_currencies(**http)
+            missing = [c for c in symbols if supported is not None and c not in supported]
+            if missing:
+                (http.get("on_error") or frappe.log_error)(
+                    title="Exchange Rate Sync: currencies not supported",
+                    message=f"{self.name} does not quote {', '.join(missing)}; asked for the other currencies only.",
+                )
+                symbols = [c for c in symbols if c not in missing]
+                if not symbols:
+                    return {"base": base, "rates": {}, "missing": missing}, 200
+            params["symbols"] = ",".join(symbols)
+        data, status = _req_with_retry(f"{self.api_url}/{path}", params=params, retries=self.retries,
+                                       delay_sec=DELAY_SEC, **http)
+        if missing and status == 200 and data:
+            data = {**data, "missing": missing}
+        return data, status
+
+    def latest(self, base="USD", symbols=None, **http):
+        return self._get("latest", base, symbols, **http)
+
+    def historical(self, date, base="USD", symbols=None, **http):
+        return self._get(str(date), base, symbols, **http)
+
+    def time_series(self, start, end, base="USD", symbols=None, **http):
+        return self._get(f"{start}..{end}", base, symbols, **http)
+
+    def usage(self, **http):
+        return USAGE, 200
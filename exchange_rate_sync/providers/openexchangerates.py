@@ -0,0 +1,58 @@
+import requests
+
+from ..tasks.fetch import DELAY_SEC, _req_with_retry, get_session
+from .base import RateProvider
+
+OXR_API_URL = "https://openexchangerates.org/api"
+USAGE_TIMEOUT_SEC = 8
+
+
+class OpenExchangeRatesProvider(RateProvider):
+    """openexchangerates.org; the base currency and time-series need a paid plan."""
+
+    name = "Open Exchange Rates"
+
+    def __init__(self, api_key: str, plan_features=None, api_url: str = OXR_API_URL):
+        super().__init__(plan_features)
+        self.api_key = (api_key or "").strip()
+        self.api_url = api_url.rstrip("/")
+
+    def _params(self, base: str | None = None, symbols: list | None = None, **params) -> dict:
+        params["app_id"] = self.api_key
+        if base and base != "USD":
+            params["base"] = base                  # note: non-USD base requires paid plan
+        if symbols:
+            params["symbols"] = ",".join(symbols)
+        return params
+
+    def _get(self, path: str, params: dict, **http) -> tuple:
+        http.setdefault("session", get_session())
+        return _req_with_retry(f"{self.api_url}/{path}", params=params, retries=self.retries,
+                              delay_sec=DELAY_SEC, **http)
+
+    def latest(self, base="USD", symbols=None, **http):
+        return self._get("latest.json", self._params(base, symbols), **http)
+
+    def historical(self, date, base="USD", symbols=None, **http):
+        return self._get(f"historical/{date}.json", self._params(base, symbols), **http)
+
+    def time_series(self, start, end, base="USD", symbols=None, **http):
+        return self._get("time-series.json", self._params(base, symbols, start=start, end=end), **http)
+
+    def usage(self, **http):
+        """Unlike the rate calls, no retries and the error body is returned (its "message" is the error code)."""
+        session = http.get("session") or get_session()
+        try:
+            resp = session.get(f"{self.api_url}/usage.json", params={"app_id": self.api_key},
+                               timeout=USAGE_TIMEOUT_SEC)
+        except requests.exceptions.RequestException as e:
+            return {"message": "network_error", "description": str(e)}, None
+
+        try:
+            body = resp.json()
+        except ValueError:
+            body = {}
+        if resp.status_code == 200:
+            self.plan_features = ((body.get("data") or {}).get("plan") or {}).get("features") or {}
+            return body.get("data") or {}, 200
+        return body, resp.status_code
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import threading
+import time
+
+import frappe
+
+from ..tasks.cross import rebase_rates
+from .base import RateProvider
+from .fanout import RateCheck
+
+# No site prefix: one entry for every site of the bench using the same provider and account
+SHARED_KEY_PREFIX = "exchange_rate_sync|shared"
+SHARED_WAIT_SEC = 30        # how long a site waits for another site's fetch before fetching itself
+SHARED_POLL_SEC = 0.5
+
+
+class SharedProvider(RateProvider):
+    """
+    Bench-wide cache of latest rates in front of another provider.
+
+    The first site that needs latest rates fetches the full USD answer (every
+    currency) and stores it in the shared Redis for `max_age` seconds; sites
+    fetching meanwhile wait for it instead of asking the provider too. Every site
+    derives its base->symbols rates from that answer locally, so more sites add
+    DB writes but no provider requests. Historical rates, time series and usage
+    go straight to the wrapped provider.
+
+    Only sites with the same provider, API URL, API key and plan share an answer
+    (see shared_key). An answer fetched by another site is checked with `check`
+    against this site's stored rates first; if it is rejected, this site fetches
+    its own.
+
+    Works on fetch worker threads: only raw Redis commands are used, and the
+    connection is taken on the thread that creates the provider.
+    """
+
+    name = "Shared"
+
+    def __init__(self, provider: RateProvider, max_age: int, check: RateCheck | None = None):
+        super().__init__(provider.plan_features)
+        self.provider = provider
+        self.max_age = max_age
+        self.check = check              # RateCheck for answers fetched by another site
+        self.requires_api_key = provider.requires_api_key
+        self.key = shared_key(provider)
+        self.redis = frappe.cache()
+        self._answer = None         # the USD answer used for this provider's lifetime (one run)
+        self._lock = threading.Lock()
+
+    def capabilities(self):
+        return self.provider.capabilities()
+
+    def usage(self, **http):
+        return self.provider.usage(**http)
+
+    def historical(self, date, base="USD", symbols=None, **http):
+        return self.provider.historical(date, base, symbols, **http)
+
+    def time_series(self, start, end, base="USD", symbols=None, **http):
+        return self.provider.time_series(start, end, base, symbols, **http)
+
+    def latest(self, base="USD", symbols=None, stats=None, **http):
+        started = time.perf_counter()
+        with self._lock:
+            if self._answer is None:
+                self._answer = self._checked_latest(stats, **http)
+            elif stats is not None:
+                stats.update(attempts=0, latency=time.perf_counter() - started)
+        data, status = self._answer
+        if status != 200:
+            return data, status
+
+        usd_rates = {**data["rates"], "USD": 1.0}
+        if base not in usd_rates:
+            return None, 400
+        symbols = symbols or [c for c in usd_rates if c != base]
+        return {**data, "base": base, "rates": rebase_rates(usd_rates, base, symbols)}, 200
+
+    def _checked_latest(self, stats=None, **http) -> tuple:
+        data, status, shared = self._shared_latest(stats, **http)
+        reason = self.check("USD", data["rates"]) if shared and self.check else None
+        if not reason:
+            return data, status
+
+        report = http.get("on_error") or frappe.log_error    # set when called off the main thread
+        report(
+            title="Exchange Rate Sync: shared rates rejected",
+            message=f"Rates fetched by another site were rejected ({reason}); fetching them for this site",
+        )
+        return self.provider.latest("USD", None, stats=stats, **http)
+
+    def _read(self):
+        cached = self.redis.get(f"{self.key}:latest")
+        if not cached:
+            return None
+        cached = json.loads(cached)
+        return cached["data"] if time.time() - cached["fetched_at"] < self.max_age else None
+
+    def _shared_latest(self, stats=None, **http) -> tuple:
+        """(data, status, shared): shared is True when the answer was fetched by another site."""
+        started = time.perf_counter()
+        give_up_at = time.monotonic() + SHARED_WAIT_SEC
+        while True:
+            data = self._read()
+            if data:
+                if stats is not None:
+                    stats.update(attempts=0, latency=time.perf_counter() - started)
+                return data, 200, True
+            if self.redis.set(f"{self.key}:fetching", 1, nx=True, ex=SHARED_WAIT_SEC):
+                break
+            if time.monotonic() >= give_up_at:
+                # the other fetch is stuck or failed: fetch without holding the lock
+                return *self.provider.latest("USD", None, stats=stats, **http), False
+            time.sleep(SHARED_POLL_SEC)
+
+        try:
+            data, status = self.provider.latest("USD", None, stats=stats, **http)
+            if status == 200 and (data or {}).get("rates"):
+                self.redis.set(
+                    f"{self.key}:latest",
+                    json.dumps({"fetched_at": time.time(), "data": data}),
+                    ex=max(int(self.max_age), 1),
+                )
+            return data, status, False
+        finally:
+            self.redis.delete(f"{self.key}:fetching")
+
+
+def shared_key(provider: RateProvider) -> str:
+    """
+    Redis key prefix naming who an answer came from: the provider(s) and API URL(s)
+    in clear, and a hash of the API key and plan features, so sites on different
+    accounts or plans never read each other's rates.
+    """
+    providers = getattr(provider, "providers", None) or [provider]   # a FanoutProvider's chain
+    names = "+".join(p.name or type(p).__name__ for p in providers)
+    urls = "+".join(getattr(p, "api_url", "") for p in providers)
+    account = json.dumps([[getattr(p, "api_key", ""), p.plan_features] for p in providers], sort_keys=True)
+    return f"{SHARED_KEY_PREFIX}:{names}:{urls}:{hashlib.sha256(account.encode()).hexdigest()[:16]}"
+
+
+def warm_shared_rates(provider: RateProvider) -> tuple:
+    """Make sure the bench-wide latest rates are fresh (fetching them if not). Returns (data, status)."""
+    if not isinstance(provider, SharedProvider):
+        return None, None
+    return provider.latest("USD")
@@ -0,0 +1,84 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from exchange_rate_sync.providers import RateProvider
+from exchange_rate_sync.providers.fanout import FanoutProvider, RateCheck
+
+GOOD_ANSWER = {"base": "USD", "rates": {"EUR": 0.5}}
+IMPLAUSIBLE_ANSWER = {"base": "USD", "rates": {"EUR": 5.0}}
+
+
+class StaticProvider(RateProvider):
+	"""Answers every latest() call with the same response."""
+
+	def __init__(self, name, data, status=200, usage=None):
+		super().__init__({"base": True})
+		self.name = name
+		self.data = data
+		self.status = status
+		self.usage_block = usage
+
+	def latest(self, base="USD", symbols=None, stats=None, **http):
+		if stats is not None:
+			stats.update(attempts=1, latency=0)
+		return self.data, self.status
+
+	def usage(self, **http):
+		return {"usage": self.usage_block}, 200
+
+
+class TestRateCheck(FrappeTestCase):
+	def setUp(self):
+		self.check = RateCheck({("USD", "EUR"): 0.5, ("EUR", "GBP"): 0.5}, max_deviation=0.2)
+
+	def test_plausible_rates_pass(self):
+		self.assertIsNone(self.check("USD", {"EUR": 0.55, "GBP": 0.26}))
+
+	def test_moved_pair_is_rejected(self):
+		self.assertIn("USD->EUR", self.check("USD", {"EUR": 0.8}))
+		# EUR->GBP is derived from the USD answer: 0.4 / 0.5
+		self.assertIn("EUR->GBP", self.check("USD", {"EUR": 0.5, "GBP": 0.4}))
+
+	def test_invalid_rate_is_rejected(self):
+		self.assertIn("invalid rate", self.check("USD", {"EUR": 0}))
+
+	def test_pairs_without_reference_are_not_checked(self):
+		self.assertIsNone(self.check("USD", {"PKR": 250.0}))
+
+
+class TestFanoutProvider(FrappeTestCase):
+	def latest(self, *providers, check=None):
+		reported, stats = [], {}
+		data, status = FanoutProvider(list(providers), check=check).latest(
+			"USD", ["EUR"], on_error=lambda **kw: reported.append(kw), stats=stats
+		)
+		return data, status, stats["provider"], reported
+
+	def test_first_accepted_answer_wins(self):
+		data, status, provider, reported = self.latest(
+			StaticProvider("First", GOOD_ANSWER), StaticProvider("Second", IMPLAUSIBLE_ANSWER)
+		)
+		self.assertEqual((data, status, provider, reported), (GOOD_ANSWER, 200, "First", []))
+
+	def test_failed_provider_falls_back(self):
+		data, status, provider, reported = self.latest(
+			StaticProvider("First", None, status=503), StaticProvider("Second", GOOD_ANSWER)
+		)
+		self.assertEqual((data, status, provider), (GOOD_ANSWER, 200, "Second"))
+		self.assertIn("status 503", reported[0]["message"])
+
+	def test_rejected_answer_falls_back(self):
+		check = RateCheck({("USD", "EUR"): 0.5}, max_deviation=0.2)
+		data, _, provider, _ = self.latest(
+			StaticProvider("First", IMPLAUSIBLE_ANSWER), StaticProvider("Second", GOOD_ANSWER), check=check
+		)
+		self.assertEqual((data, provider), (GOOD_ANSWER, "Second"))
+
+	def test_first_answer_is_used_when_none_is_accepted(self):
+		check = RateCheck({("USD", "EUR"): 0.05}, max_deviation=0.2)
+		data, status, provider, _ = self.latest(
+			StaticProvider("First", IMPLAUSIBLE_ANSWER), StaticProvider("Second", GOOD_ANSWER), check=check
+		)
+		self.assertEqual((data, status, provider), (IMPLAUSIBLE_ANSWER, 200, "First"))
@@ -0,0 +1,58 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from exchange_rate_sync.providers import frankfurter
+from exchange_rate_sync.providers.frankfurter import FrankfurterProvider
+
+API_URL = "https://frankfurter.test"
+QUOTED = {"USD": 1.0, "EUR": 0.5, "GBP": 0.25}
+
+
+class TestFrankfurterProvider(FrappeTestCase):
+	def setUp(self):
+		self.requests = []
+
+		def request(url, params, **kwargs):
+			self.requests.append((url, params))
+			if url.endswith("/currencies"):
+				return {code: code for code in QUOTED}, 200
+			symbols = params["symbols"].split(",")
+			if not set(symbols) <= set(QUOTED):
+				return {"message": "not found"}, 404
+			return {"base": params["base"], "rates": {c: QUOTED[c] for c in symbols}}, 200
+
+		for patcher in (
+			patch.object(frankfurter, "_req_with_retry", request),
+			patch.dict(frankfurter._currencies, clear=True),
+		):
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+		self.reported = []
+		self.provider = FrankfurterProvider(API_URL)
+
+	def latest(self, symbols):
+		return self.provider.latest("USD", symbols, session=object(), on_error=lambda **kw: self.reported.append(kw))
+
+	def test_unsupported_symbols_are_dropped_and_reported(self):
+		data, status = self.latest(["EUR", "PKR", "GBP"])
+		self.assertEqual(status, 200)
+		self.assertEqual(data["rates"], {"EUR": 0.5, "GBP": 0.25})
+		self.assertEqual(data["missing"], ["PKR"])
+		self.assertEqual(self.requests[-1][1]["symbols"], "EUR,GBP")
+		self.assertIn("PKR", self.reported[0]["message"])
+
+	def test_only_unsupported_symbols_ask_nothing(self):
+		data, status = self.latest(["PKR"])
+		self.assertEqual((data, status), ({"base": "USD", "rates": {}, "missing": ["PKR"]}, 200))
+		self.assertEqual([url for url, _ in self.requests], [f"{API_URL}/currencies"])
+
+	def test_supported_currencies_are_fetched_once(self):
+		self.latest(["EUR"])
+		self.latest(["GBP"])
+		self.assertEqual(sum(url.endswith("/currencies") for url, _ in self.requests), 1)
+		self.assertNotIn("missing", self.latest(["EUR"])[0])
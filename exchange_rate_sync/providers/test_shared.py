@@ -0,0 +1,66 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from exchange_rate_sync.providers.fanout import FanoutProvider, RateCheck
+from exchange_rate_sync.providers.shared import SharedProvider, shared_key
+from exchange_rate_sync.providers.test_fanout import GOOD_ANSWER, IMPLAUSIBLE_ANSWER, StaticProvider
+
+
+class TestSharedKey(FrappeTestCase):
+	def provider(self, name="Test", api_key="key-1", api_url="https://rates.test", **plan):
+		provider = StaticProvider(name, GOOD_ANSWER)
+		provider.api_key, provider.api_url = api_key, api_url
+		provider.plan_features.update(plan)
+		return provider
+
+	def test_same_account_shares(self):
+		self.assertEqual(shared_key(self.provider()), shared_key(self.provider()))
+
+	def test_accounts_and_plans_are_kept_apart(self):
+		key = shared_key(self.provider())
+		self.assertNotEqual(key, shared_key(self.provider(api_key="key-2")))
+		self.assertNotEqual(key, shared_key(self.provider(api_url="https://other.test")))
+		self.assertNotEqual(key, shared_key(self.provider(name="Other")))
+		self.assertNotEqual(key, shared_key(self.provider(**{"time-series": True})))
+		self.assertNotIn("key-1", key)
+
+	def test_fanout_chain_is_named_in_full(self):
+		chain = FanoutProvider([self.provider(), self.provider(name="Other")])
+		self.assertNotEqual(shared_key(chain), shared_key(self.provider()))
+
+
+class TestSharedProvider(FrappeTestCase):
+	def setUp(self):
+		# a provider name of its own keeps this test's answer away from real ones
+		self.name = f"Shared Test {frappe.generate_hash(length=8)}"
+		self.key = shared_key(StaticProvider(self.name, None))
+		self.addCleanup(frappe.cache().delete, f"{self.key}:latest")
+
+	def site(self, data, status=200, check=None):
+		return SharedProvider(StaticProvider(self.name, data, status), max_age=60, check=check)
+
+	def test_second_site_reuses_the_answer(self):
+		self.assertEqual(self.site(GOOD_ANSWER).latest("USD", ["EUR"])[1], 200)
+
+		stats = {}
+		data, status = self.site(None, status=503).latest("EUR", ["USD"], stats=stats)
+		self.assertEqual((status, data["base"], data["rates"]), (200, "EUR", {"USD": 2.0}))
+		self.assertEqual(stats["attempts"], 0)
+
+	def test_failed_fetch_is_not_shared(self):
+		self.assertEqual(self.site(None, status=503).latest("USD", ["EUR"]), (None, 503))
+		self.assertIsNone(frappe.cache().get(f"{self.key}:latest"))
+
+	def test_implausible_shared_answer_is_fetched_again(self):
+		self.site(IMPLAUSIBLE_ANSWER).latest("USD", ["EUR"])
+
+		reported = []
+		check = RateCheck({("USD", "EUR"): 0.5}, max_deviation=0.2)
+		data, status = self.site(GOOD_ANSWER, check=check).latest(
+			"USD", ["EUR"], on_error=lambda **kw: reported.append(kw)
+		)
+		self.assertEqual((data["rates"], status), ({"EUR": 0.5}, 200))
+		self.assertEqual(reported[0]["title"], "Exchange Rate Sync: shared rates rejected")
@@ -1,84 +1,95 @@
-
 import frappe
-import requests
-from .daily import get_currency_exchange
+from werkzeug.wrappers import Response
 
+from exchange_rate_sync.exchange_rate_sync.doctype.exchange_rate_config.exchange_rate_config import (
+    apply_usage,
+)
 
+from ..providers import get_provider
+from . import backfill, cache, convert, metrics, schedule
+from .daily import get_currency_exchange
 
 
 @frappe.whitelist()
 def get_api_usage_info(api_key):
     """Fetch live API usage details from the selected provider"""
-    url = "https://openexchangerates.org/api/usage.json"
-    
-    try:
-        resp = requests.get(url, params={"app_id": api_key}, timeout=8)
-        resp.raise_for_status()
-        data = resp.json()
-    except requests.exceptions.RequestException as e:
-        frappe.throw(f"Failed to fetch usage info: {str(e)}")
-
-    if data.get("status") != 200:
-        desc = data.get("description") or data.get("message") or "Unknown error."
+    data, status = get_provider(api_key=api_key).usage()
+
+    if status != 200:
+        desc = (data or {}).get("description") or (data or {}).get("message") or "Unknown error."
         frappe.throw(f"Failed to fetch usage info: {desc}")
 
-    usage = data.get("data", {}).get("usage", {})
+    usage = data.get("usage", {})
     return usage
 
 @frappe.whitelist()
 def get_currency_exchange_ui():
-    return get_currency_exchange()
+    """Enqueue a sync in the background; poll get_sync_status_ui for progress"""
+    result = schedule.enqueue_sync()
+    if result["enqueued"]:
+        result["message"] = "Exchange rate sync has been queued."
+    else:
+        result["message"] = "An exchange rate sync is already queued or running."
+    return result
 
 
+@frappe.whitelist()
+def get_sync_status_ui():
+    return schedule.get_sync_status()
+
 
-ERROR_EXPLANATIONS = {
-    "invalid_app_id": "Invalid App ID provided. Please check your API Key.",
-    "missing_app_id": "No App ID provided. Please provide an API Key.",
-    "not_allowed": "This App ID does not have access to the requested feature.",
-    "access_restricted": "Access restricted due to overuse or account limits.",
-    "invalid_base": "The requested base currency is not supported.",
-    "not_found": "The requested API route or resource does not exist."
-}
 @frappe.whitelist()
-def test_connection_ui():
-    doc = frappe.get_doc("Exchange Rate Config", "Exchange Rate Config")
+def enqueue_backfill_ui(from_date=None, to_date=None):
+    """Start (or, without dates, resume) a historical backfill in the background"""
+    job_id = backfill.enqueue_backfill(from_date, to_date)
+    return {"job_id": job_id, "message": "Backfill has been queued and will run in the background."}
 
-    url = f"https://openexchangerates.org/api/usage.json?app_id={doc.api_key}"
-    response = requests.get(url)
 
-    if response.status_code == 200:
-        data = response.json().get("data", {})
+@frappe.whitelist()
+def get_rate(from_currency, to_currency, date=None, max_age_days=None):
+    """Cached exchange rate from_currency -> to_currency on `date` (default today), or None"""
+    return cache.get_rate(from_currency, to_currency, date, max_age_days=max_age_days)
+
 
-        doc.connection_success = 1
-        doc.quota = data["plan"].get("quota", "N/A")
-        doc.plan = data["plan"].get("name", "N/A")
-        doc.api_status = data.get("status", "active")
+@frappe.whitelist(methods=["POST"])
+def convert_many(records, max_age_days=None):
+    """
+    Convert a batch of amounts in one call. `records` (JSON) is a list of
+    {"amount", "from_currency", "to_currency", "date"} or [amount, from, to, date].
+    Returns [{"rate", "amount"}, ...] in input order (None where no rate is known).
+    """
+    return convert.convert_many(frappe.parse_json(records), max_age_days=max_age_days)
 
-        # Set currency option and table permissions
-        if data["plan"]["features"].get("base", False):
-            doc.from_currency_option = "All Currencies"
-        else:
-            doc.from_currency_option = "USD Only"
 
+@frappe.whitelist(allow_guest=True)
+def metrics_endpoint():
+    """
+    Sync health metrics in Prometheus text format.
+    System Managers only, unless "exchange_rate_sync_metrics_allow_guest" is set in site config.
+    """
+    if not frappe.conf.get("exchange_rate_sync_metrics_allow_guest"):
+        frappe.only_for("System Manager")
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+
+@frappe.whitelist()
+def test_connection_ui():
+    doc = frappe.get_doc("Exchange Rate Config", "Exchange Rate Config")
+
+    success, error_code, explanation = apply_usage(doc)
+    doc.flags.connection_checked = True   # checked just now, validate() need not queue another check
+
+    if success:
         # Show usage info button
         doc.save()
 
         return {
             "status": "success",
             "message": "Connection successful. Fields have been updated.",
-            "base_enabled": data["plan"]["features"].get("base", False)
+            "base_enabled": doc.from_currency_option == "All Currencies"
         }
     else:
-        # Failed connection
-        error_json = response.json()
-        error_code = error_json.get("message", "Unknown Error")
-        explanation = ERROR_EXPLANATIONS.get(error_code, "Unknown error. Please try again or contact support.")
-
-        doc.connection_success = 0
-        doc.quota = "N/A"
-        doc.plan = "N/A"
-        doc.api_status = f"{explanation}"
-        doc.from_currency_option = "N/A"
         # Hide usage info button
         doc.save()
 
@@ -87,5 +98,3 @@ def test_connection_ui():
         "error_code": error_code,
         "message": f"Connection failed: {error_code} — {explanation}"
         }
-
-
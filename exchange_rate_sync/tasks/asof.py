@@ -0,0 +1,209 @@
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+import frappe
+from frappe.utils import cint, flt, getdate, today
+
+from .cache import drop_rate
+from .snapshots import RATE_SNAPSHOT, unpack_rates
+from .writer import CURRENCY_EXCHANGE
+
+HISTORY_VERSION_KEY = "exchange_rate_sync:history_version"
+VERSION_CHECK_SEC = 60            # how long a worker trusts its index before re-checking the version
+MAX_PAIRS = 1024                  # pair histories kept per worker and site (LRU)
+DEFAULT_MAX_RATE_AGE_DAYS = 7
+# ERPNext's `args` of get_exchange_rate: rates of one side only; otherwise any row counts
+SIDE_FILTERS = {
+    "for_buying": ["for_buying", "=", "1"],
+    "for_selling": ["for_selling", "=", "1"],
+}
+
+_sites = {}                       # site -> its index, see _site_state()
+_lock = threading.Lock()
+
+
+def invalidate_history():
+    """Make every worker reload all pair histories, e.g. after a sync, backfill or purge."""
+    frappe.cache().set_value(HISTORY_VERSION_KEY, frappe.generate_hash(length=10))
+
+
+def _pair_version_key(from_currency: str, to_currency: str) -> str:
+    return f"{HISTORY_VERSION_KEY}:{from_currency}:{to_currency}"
+
+
+def invalidate_pair(from_currency: str, to_currency: str):
+    """Make every worker reload one pair's histories (both sides), e.g. after its row was edited by hand."""
+    frappe.cache().set_value(_pair_version_key(from_currency, to_currency), frappe.generate_hash(length=10))
+    state = _site_state()
+    with _lock:
+        for key in [key for key in state["pairs"] if key[:2] == (from_currency, to_currency)]:
+            del state["pairs"][key]
+
+
+def on_currency_exchange_change(doc, method=None):
+    """
+    doc_events hook: a Currency Exchange row was saved or deleted, e.g. by hand.
+    Drops the cached rates of its pair and date (and of the values before the
+    edit, if they changed); the rest of the caches are kept.
+    """
+    if doc.flags.from_exchange_rate_sync:
+        return   # a sync run refreshes both caches once it has committed
+    rows = [doc]
+    if method == "on_update" and doc.get_doc_before_save():
+        rows.append(doc.get_doc_before_save())
+
+    for date_str, from_currency, to_currency in {
+        (str(getdate(row.date)), row.from_currency, row.to_currency) for row in rows
+    }:
+        invalidate_pair(from_currency, to_currency)
+        drop_rate(date_str, from_currency, to_currency)
+
+
+def _site_state() -> dict:
+    """The current site's index; a worker serves every site of the bench."""
+    site = frappe.local.site
+    with _lock:
+        state = _sites.get(site)
+        if state is None:
+            state = _sites[site] = {
+                # (from, to, side) -> {"history": (date ordinals, rates) sorted by date, "version", "checked_at"}
+                "pairs": OrderedDict(),
+                "snapshots": None,        # (date ordinals, USD vectors) of Exchange Rate Snapshot, or None until loaded
+                "version": None,
+                "checked_at": 0,
+            }
+    return state
+
+
+def _check_version(state: dict):
+    now = time.monotonic()
+    if now - state["checked_at"] < VERSION_CHECK_SEC:
+        return
+    version = frappe.cache().get_value(HISTORY_VERSION_KEY)
+    with _lock:
+        if version != state["version"]:
+            state["pairs"].clear()
+            state["snapshots"] = None
+        state.update(version=version, checked_at=now)
+
+
+def _load_snapshots(state: dict) -> tuple:
+    if state["snapshots"] is None:
+        rows = frappe.get_all(RATE_SNAPSHOT, fields=["date", "rates"], order_by="date asc")
+        state["snapshots"] = (
+            array("l", (getdate(r.date).toordinal() for r in rows)),
+            [unpack_rates(r.rates) for r in rows],
+        )
+    return state["snapshots"]
+
+
+def _load_pair(state: dict, from_currency: str, to_currency: str, side: str | None = None) -> tuple:
+    """
+    Sorted (date ordinals, rates) of a pair: its Currency Exchange rows (of `side`
+    only, if given), plus dates only a snapshot covers.
+    """
+    by_date = {}
+    snapshot_dates, vectors = _load_snapshots(state)
+    for ordinal, vector in zip(snapshot_dates, vectors, strict=True):
+        from_rate, to_rate = flt(vector.get(from_currency)), flt(vector.get(to_currency))
+        if from_rate > 0 and to_rate > 0:
+            by_date[ordinal] = to_rate / from_rate
+
+    # a stored row wins over the snapshot-derived rate of its date; of duplicates the first one
+    stored = set()
+    filters = [["from_currency", "=", from_currency], ["to_currency", "=", to_currency]]
+    if side in SIDE_FILTERS:
+        filters.append(SIDE_FILTERS[side])
+    for row in frappe.get_all(
+        CURRENCY_EXCHANGE,
+        filters=filters,
+        fields=["date", "exchange_rate"],
+        order_by="date asc, creation asc",
+    ):
+        ordinal = getdate(row.date).toordinal()
+        if ordinal not in stored and flt(row.exchange_rate) > 0:
+            stored.add(ordinal)
+            by_date[ordinal] = flt(row.exchange_rate)
+
+    dates = sorted(by_date)
+    return array("l", dates), array("d", (by_date[d] for d in dates))
+
+
+def _history(from_currency: str, to_currency: str, side: str | None = None) -> tuple:
+    state = _site_state()
+    _check_version(state)
+    pairs = state["pairs"]
+    side = side if side in SIDE_FILTERS else None
+    key = (from_currency, to_currency, side)
+    now = time.monotonic()
+    with _lock:
+        entry = pairs.get(key)
+        if entry is not None and now - entry["checked_at"] < VERSION_CHECK_SEC:
+            pairs.move_to_end(key)
+            return entry["history"]
+
+    # a pair's own version changes when one of its rows is edited by hand (invalidate_pair)
+    version = frappe.cache().get_value(_pair_version_key(from_currency, to_currency))
+    if entry is not None and entry["version"] == version:
+        history = entry["history"]
+    else:
+        history = _load_pair(state, from_currency, to_currency, side)
+    with _lock:
+        pairs[key] = {"history": history, "version": version, "checked_at": now}
+        pairs.move_to_end(key)
+        while len(pairs) > MAX_PAIRS:
+            pairs.popitem(last=False)
+    return history
+
+
+def rate_as_of(
+    from_currency: str,
+    to_currency: str,
+    date=None,
+    max_age_days: int = DEFAULT_MAX_RATE_AGE_DAYS,
+    side: str | None = None,
+):
+    """
+    Rate from_currency -> to_currency effective on `date` (default today): the rate
+    of that date, or of the nearest earlier date at most `max_age_days` before it.
+    None when there is no such rate. The pair's history is loaded once per worker
+    and searched by bisection.
+
+    side: "for_buying" or "for_selling" to use Buying or Selling rates only, as
+    ERPNext's `args`; buying and selling histories are kept apart.
+    """
+    from_currency = (from_currency or "").strip().upper()
+    to_currency = (to_currency or "").strip().upper()
+    if not from_currency or not to_currency:
+        return None
+    if from_currency == to_currency:
+        return 1.0
+
+    dates, rates = _history(from_currency, to_currency, side)
+    ordinal = getdate(date or today()).toordinal()
+    i = bisect_right(dates, ordinal)
+    if not i or ordinal - dates[i - 1] > max(cint(max_age_days), 0):
+        return None
+    return rates[i - 1]
+
+
+@frappe.whitelist()
+def get_exchange_rate(from_currency, to_currency, transaction_date=None, args=None):
+    """
+    Override of erpnext.setup.utils.get_exchange_rate (see hooks.py). Answers from
+    the as-of index when 'Resolve Rates As Of Date' is enabled, and falls back to
+    ERPNext's own lookup (stale rates, API, manual entry) otherwise or on a miss.
+    Like ERPNext, args="for_buying" / "for_selling" considers rates of that side only.
+    """
+    from erpnext.setup.utils import get_exchange_rate as erpnext_get_exchange_rate
+
+    if cint(frappe.db.get_single_value("Exchange Rate Config", "resolve_rates_as_of_date")):
+        max_age_days = frappe.db.get_single_value("Exchange Rate Config", "max_rate_age_days")
+        rate = rate_as_of(from_currency, to_currency, transaction_date, max_age_days, side=args)
+        if rate:
+            return rate
+
+    return erpnext_get_exchange_rate(from_currency, to_currency, transaction_date, args)
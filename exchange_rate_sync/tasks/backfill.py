@@ -0,0 +1,202 @@
+from functools import partial
+
+import frappe
+from frappe.query_builder.functions import Count
+from frappe.utils import add_days, date_diff, getdate, today
+
+from ..providers import RateProvider, get_provider
+from . import metrics
+from .asof import invalidate_history
+from .cross import cross_rate_rows, rebase_rates
+from .daily import fetch_all
+from .errors import ErrorCollector
+from .fetch import get_session
+from .snapshots import RATE_SNAPSHOT, is_compact, materialize, store_snapshot, usd_vector
+from .writer import RateWriter
+
+BACKFILL_JOB_ID = "exchange_rate_sync:backfill"
+BACKFILL_CHUNK_DAYS = 30   # dates fetched, written and committed together (one checkpoint per chunk)
+BACKFILL_TIMEOUT_SEC = 4 * 60 * 60
+
+
+def enqueue_backfill(from_date=None, to_date=None) -> str:
+    """
+    Enqueue a backfill of [from_date, to_date] on the long queue.
+    Without dates, resumes the last backfill from its checkpoint.
+    Returns the job id.
+    """
+    cfg = frappe.get_doc("Exchange Rate Config", "Exchange Rate Config")
+
+    if from_date or to_date:
+        from_date, to_date = getdate(from_date), getdate(to_date or today())
+        if from_date > to_date:
+            frappe.throw("Backfill From Date must be on or before the To Date.")
+        if to_date > getdate(today()):
+            frappe.throw("Cannot backfill exchange rates for future dates.")
+        same_range = (from_date, to_date) == (getdate(cfg.backfill_from_date), getdate(cfg.backfill_to_date))
+        finished = cfg.backfill_checkpoint and getdate(cfg.backfill_checkpoint) >= to_date
+        if not same_range or finished:
+            # a new range, or a finished one submitted again, starts from scratch (complete dates are skipped)
+            frappe.db.set_single_value("Exchange Rate Config", {
+                "backfill_from_date": from_date,
+                "backfill_to_date": to_date,
+                "backfill_checkpoint": None,
+            })
+    elif not (cfg.backfill_from_date and cfg.backfill_to_date):
+        frappe.throw("No backfill to resume. Please choose a date range.")
+
+    frappe.enqueue(
+        "exchange_rate_sync.tasks.backfill.run_backfill",
+        queue="long",
+        timeout=BACKFILL_TIMEOUT_SEC,
+        job_id=BACKFILL_JOB_ID,
+        deduplicate=True,
+    )
+    return BACKFILL_JOB_ID
+
+
+def get_complete_dates(from_date, to_date, base_currencies: list, compact: bool = False) -> set:
+    """Dates in range that already have rows for every configured base currency, or a rate snapshot (compact)."""
+    if compact:
+        snapshot_dates = frappe.get_all(RATE_SNAPSHOT, filters={"date": ("between", [from_date, to_date])}, pluck="date")
+        return {str(getdate(d)) for d in snapshot_dates}
+
+    ce = frappe.qb.DocType("Currency Exchange")
+    rows = (
+        frappe.qb.from_(ce)
+        .select(ce.date, Count(ce.from_currency).distinct().as_("bases"))
+        .where(ce.date.between(from_date, to_date))
+        .where(ce.from_currency.isin(base_currencies))
+        .groupby(ce.date)
+    ).run(as_dict=True)
+    return {str(getdate(r.date)) for r in rows if r.bases >= len(base_currencies)}
+
+
+def run_backfill():
+    """
+    Background job: write historical rates for the stored backfill range.
+
+    Dates that already have rows for every base are skipped. The remaining
+    dates are processed in chunks of BACKFILL_CHUNK_DAYS: USD rates are fetched
+    (time-series.json when the plan allows it, otherwise historical/{date}.json
+    concurrently), every base and cross rate is derived locally, the chunk is
+    written through the batched writer (compact storage: one rate snapshot per
+    date plus the materialized pairs, as in a sync) and committed together with the
+    checkpoint, so a failed or killed job resumes after the last chunk. The
+    checkpoint never moves past a date whose rates could not be fetched, so the
+    next run retries it.
+    """
+    cfg = frappe.get_doc("Exchange Rate Config", "Exchange Rate Config")
+    provider = get_provider(cfg)
+    if not cfg.enabled or (provider.requires_api_key and not (cfg.api_key or "").strip()):
+        frappe.log_error("Exchange Rate Sync: Backfill", "Sync disabled or API key missing")
+        return "Exchange rate sync is disabled or the API key is missing"
+
+    base_currencies = list(dict.fromkeys(
+        (row.from_currency or "").strip().upper() for row in cfg.from_currency_table if row.from_currency
+    ))
+    target_currencies = list(dict.fromkeys(
+        (row.to_currency or "").strip().upper() for row in cfg.to_currency_table if row.to_currency
+    ))
+    if not base_currencies or not target_currencies:
+        return "No currencies configured in Exchange Rate Config"
+
+    from_date, to_date = getdate(cfg.backfill_from_date), getdate(cfg.backfill_to_date)
+    if cfg.backfill_checkpoint and from_date <= getdate(cfg.backfill_checkpoint) < to_date:
+        from_date = add_days(cfg.backfill_checkpoint, 1)
+    elif cfg.backfill_checkpoint and getdate(cfg.backfill_checkpoint) >= to_date:
+        return "Backfill already complete"
+
+    compact = is_compact(cfg)
+    complete = get_complete_dates(from_date, to_date, base_currencies, compact)
+    dates = [
+        d for d in (str(getdate(add_days(from_date, i))) for i in range(date_diff(to_date, from_date) + 1))
+        if d not in complete
+    ]
+
+    symbols = list(dict.fromkeys(c for c in base_currencies + target_currencies if c != "USD"))
+    errors = ErrorCollector("Exchange Rate Sync: Backfill")
+    writer = RateWriter(bulk=bool(cfg.get("bulk_upsert")), tolerance=cfg.get("change_tolerance"), on_error=errors)
+    written_dates = 0
+    failed_dates = []
+
+    try:
+        for start in range(0, len(dates), BACKFILL_CHUNK_DAYS):
+            chunk = dates[start:start + BACKFILL_CHUNK_DAYS]
+            usd_by_date = _fetch_usd_rates(
+                provider, chunk, symbols,
+                max_workers=cfg.get("max_parallel_requests"),
+                requests_per_sec=cfg.get("requests_per_second"),
+                on_error=errors,
+            )
+
+            for date_str in chunk:
+                usd_rates = usd_by_date.get(date_str)
+                if not usd_rates:
+                    failed_dates.append(date_str)
+                    continue
+                usd_rates = usd_vector({"USD": usd_rates})
+                _queue_date(writer, date_str, usd_rates, base_currencies, target_currencies,
+                            bool(cfg.get("cross_rate_conversion")))
+                if compact:
+                    store_snapshot(date_str, usd_rates, source=provider.name)
+                written_dates += 1
+
+            if compact:
+                writer.rows = materialize(cfg, writer.rows)
+            writer.flush()
+            # the last date up to which every date is done
+            checkpoint = str(getdate(add_days(failed_dates[0], -1))) if failed_dates else chunk[-1]
+            frappe.db.set_single_value("Exchange Rate Config", "backfill_checkpoint", checkpoint)
+            frappe.db.commit()
+            invalidate_history()
+            metrics.flush()
+    except Exception:
+        frappe.db.rollback()
+        errors.flush()   # what was collected before the failure
+        frappe.db.commit()
+        raise
+
+    if not failed_dates:
+        frappe.db.set_single_value("Exchange Rate Config", "backfill_checkpoint", to_date)
+        frappe.db.commit()
+
+    msg = (
+        f"Backfill {cfg.backfill_from_date} to {cfg.backfill_to_date}: {written_dates} dates written, "
+        f"{len(complete)} already present, {len(failed_dates)} failed."
+    )
+    if failed_dates:
+        errors.add("Exchange Rate Sync: Backfill", f"{msg}\nFailed dates: {', '.join(failed_dates)}")
+    errors.flush()
+    frappe.logger().info(msg)
+    return msg
+
+
+def _fetch_usd_rates(provider: RateProvider, dates, symbols, max_workers=None, requests_per_sec=None,
+                     on_error=None) -> dict:
+    """{date: USD->* rates} for the given dates, using as few API calls as the plan allows."""
+    if provider.capabilities().get("time-series"):
+        # one call for the whole span (dates are ascending); falls back below if refused
+        data, status = provider.time_series(dates[0], dates[-1], "USD", symbols, session=get_session(),
+                                            on_error=on_error)
+        by_date = (data or {}).get("rates") or {}
+        if status == 200 and by_date:
+            return {d: by_date.get(d) for d in dates}
+
+    responses = fetch_all(
+        {d: partial(provider.historical, d, "USD", symbols) for d in dates},
+        max_workers=max_workers,
+        requests_per_sec=requests_per_sec,
+        on_error=on_error,
+    )
+    return {d: (data or {}).get("rates") for d, (data, status) in responses.items() if status == 200}
+
+
+def _queue_date(writer: RateWriter, date_str: str, usd_rates: dict, base_currencies: list,
+                target_currencies: list, cross: bool):
+    """Queue the rows a sync on `date_str` would have written, derived from USD rates."""
+    for base in base_currencies:
+        for to_currency, rate in rebase_rates(usd_rates, base, target_currencies).items():
+            writer.add_pair(date_str, base, to_currency, rate)
+    if cross:
+        writer.add_many(date_str, cross_rate_rows(target_currencies, usd_rates))
@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import OrderedDict
+
+import frappe
+from frappe.utils import add_days, cint, flt, getdate, today
+
+from . import metrics
+from .snapshots import resolve
+
+CACHE_PREFIX = "exchange_rate_sync:rates"
+SNAPSHOT_TTL_SEC = 26 * 60 * 60   # daily sync plus slack; a missed run falls back to the DB
+LOCAL_TTL_SEC = 60                # how long a worker trusts its copy before re-checking the version
+LOCAL_MAX_DATES = 32              # dates kept in the in-process LRU
+
+_local = OrderedDict()            # (site, date) -> {"version", "checked_at", "rates", "fallback"}
+_local_lock = threading.Lock()
+
+
+def _version_key(date_str: str) -> str:
+    return f"{CACHE_PREFIX}:{date_str}:version"
+
+
+def _snapshot_key(date_str: str, version: str) -> str:
+    return f"{CACHE_PREFIX}:{date_str}:{version}"
+
+
+def _pair_key(from_currency: str, to_currency: str) -> str:
+    return f"{from_currency}:{to_currency}"
+
+
+def _local_key(date_str: str) -> tuple:
+    """Key of `date_str` in the in-process LRU; workers serve several sites of a bench."""
+    return frappe.local.site, date_str
+
+
+def stage_snapshot(rows: dict, ttl: int = SNAPSHOT_TTL_SEC) -> dict:
+    """
+    Write the rates of a sync run to Redis as a pending version per date, not yet
+    visible to readers. `rows` is {(date, from_currency, to_currency): rate}, as
+    queued on a RateWriter. Returns {date: version} for activate_snapshot().
+    """
+    by_date = {}
+    for (date_str, from_currency, to_currency), rate in rows.items():
+        by_date.setdefault(str(date_str), {})[_pair_key(from_currency, to_currency)] = flt(rate)
+
+    cache = frappe.cache()
+    staged = {}
+    for date_str, rates in by_date.items():
+        staged[date_str] = frappe.generate_hash(length=10)
+        cache.set_value(_snapshot_key(date_str, staged[date_str]), rates, expires_in_sec=ttl)
+    return staged
+
+
+def activate_snapshot(staged: dict, ttl: int = SNAPSHOT_TTL_SEC):
+    """
+    Make staged versions current: a single SET of each date's version pointer, so
+    readers switch over atomically. The replaced versions are dropped.
+    """
+    cache = frappe.cache()
+    for date_str, version in staged.items():
+        old_version = cache.get_value(_version_key(date_str), expires=True)
+        cache.set_value(_version_key(date_str), version, expires_in_sec=ttl)
+        if old_version:
+            cache.delete_value(_snapshot_key(date_str, old_version))
+
+        with _local_lock:
+            _local.pop(_local_key(date_str), None)
+
+
+def discard_snapshot(staged: dict):
+    """Drop staged versions that will not be activated (the DB write failed)."""
+    cache = frappe.cache()
+    for date_str, version in staged.items():
+        cache.delete_value(_snapshot_key(date_str, version))
+
+
+def drop_rate(date_str: str, from_currency: str, to_currency: str, ttl: int = SNAPSHOT_TTL_SEC):
+    """
+    Remove one pair from the published snapshot of `date_str` (e.g. after its
+    Currency Exchange row was edited by hand), so readers fall back to the DB for
+    it. The snapshot is republished under a new version; other dates and pairs
+    stay cached.
+    """
+    cache = frappe.cache()
+    version = cache.get_value(_version_key(date_str), expires=True)
+    rates = version and cache.get_value(_snapshot_key(date_str, version), expires=True)
+    key = _pair_key(from_currency, to_currency)
+    if rates and key in rates:
+        rates = {k: rate for k, rate in rates.items() if k != key}
+        new_version = frappe.generate_hash(length=10)
+        cache.set_value(_snapshot_key(date_str, new_version), rates, expires_in_sec=ttl)
+        activate_snapshot({date_str: new_version}, ttl=ttl)
+    else:
+        with _local_lock:
+            _local.pop(_local_key(date_str), None)
+
+
+def _get_snapshot(date_str: str) -> dict:
+    """
+    In-process LRU in front of the Redis snapshot for `date_str`: an entry with the
+    published "rates" and the DB "fallback" answers get_rate() added to it.
+    """
+    now = time.monotonic()
+    local_key = _local_key(date_str)
+    with _local_lock:
+        entry = _local.get(local_key)
+        if entry and now - entry["checked_at"] < LOCAL_TTL_SEC:
+            _local.move_to_end(local_key)
+            return entry
+
+    cache = frappe.cache()
+    version = cache.get_value(_version_key(date_str), expires=True)
+    if entry and version and entry["version"] == version:
+        rates = entry["rates"]
+    else:
+        rates = dict((version and cache.get_value(_snapshot_key(date_str, version), expires=True)) or {})
+
+    # fallbacks start over on every check, so they are at most LOCAL_TTL_SEC old
+    entry = {"version": version, "checked_at": now, "rates": rates, "fallback": {}}
+    with _local_lock:
+        _local[local_key] = entry
+        _local.move_to_end(local_key)
+        while len(_local) > LOCAL_MAX_DATES:
+            _local.popitem(last=False)
+    return entry
+
+
+def get_rate(from_currency: str, to_currency: str, date=None, max_age_days: int | None = None):
+    """
+    Exchange rate from_currency -> to_currency effective on `date` (default today).
+    Served from the published snapshot; on a miss, falls back to the latest
+    Currency Exchange row or stored rate snapshot on or before `date`, whichever
+    is newer, but at most `max_age_days` (default: 'Max Rate Age (Days)') older,
+    and remembers the answer locally.
+    Returns None when no such rate is known.
+    """
+    from_currency = (from_currency or "").strip().upper()
+    to_currency = (to_currency or "").strip().upper()
+    if not from_currency or not to_currency:
+        return None
+    if from_currency == to_currency:
+        return 1.0
+
+    date_str = str(getdate(date or today()))
+    entry = _get_snapshot(date_str)
+    key = _pair_key(from_currency, to_currency)
+    hit = key in entry["rates"]
+    metrics.inc("cache_requests_total", result="hit" if hit else "miss")
+    metrics.flush(max_age=metrics.FLUSH_INTERVAL_SEC)
+    if hit:
+        return entry["rates"][key]
+
+    if max_age_days is None:
+        max_age_days = frappe.db.get_single_value("Exchange Rate Config", "max_rate_age_days")
+    oldest = getdate(add_days(date_str, -max(cint(max_age_days), 0)))
+    if key in entry["fallback"]:
+        rate_date, rate = entry["fallback"][key]
+        return rate if rate_date >= oldest else None
+
+    row = frappe.db.get_value(
+        "Currency Exchange",
+        {"from_currency": from_currency, "to_currency": to_currency, "date": ("between", [oldest, date_str])},
+        ["date", "exchange_rate"],
+        as_dict=True,
+        order_by="date desc",
+    )
+    rate_date, rate = (getdate(row.date), flt(row.exchange_rate)) if row and row.exchange_rate else (None, None)
+
+    # Compact storage: pairs without a (newer) row are derived from the rate snapshot
+    snapshot_date, snapshot_rate = resolve(from_currency, to_currency, date_str)
+    if snapshot_rate and getdate(snapshot_date) >= oldest and (not rate or getdate(snapshot_date) > rate_date):
+        rate_date, rate = getdate(snapshot_date), snapshot_rate
+    if rate:
+        # the newest rate on or before the date, valid for any age limit that covers it; misses are not kept
+        entry["fallback"][key] = (rate_date, rate)
+    return rate
@@ -0,0 +1,155 @@
+from bisect import bisect_right
+from datetime import date
+
+import frappe
+from frappe.utils import cint, flt, getdate, today
+
+from .asof import DEFAULT_MAX_RATE_AGE_DAYS
+from .snapshots import RATE_SNAPSHOT, unpack_rates
+from .writer import CURRENCY_EXCHANGE
+
+MAX_RECORDS = 200_000   # records per convert_many() call
+
+
+def _parse(record) -> tuple:
+    """(amount, from_currency, to_currency, date ordinal) from a dict or an [amount, from, to, date] list."""
+    if isinstance(record, dict):
+        amount, from_currency, to_currency, on_date = (
+            record.get("amount"), record.get("from_currency"), record.get("to_currency"), record.get("date")
+        )
+    else:
+        amount, from_currency, to_currency, *rest = record
+        on_date = rest[0] if rest else None
+    return (
+        flt(amount),
+        (from_currency or "").strip().upper(),
+        (to_currency or "").strip().upper(),
+        getdate(on_date or today()).toordinal(),
+    )
+
+
+class RateTable:
+    """
+    Rates of a set of currencies over a date range, read with two grouped queries
+    (Currency Exchange rows and rate snapshots) and resolved in memory.
+    """
+
+    def __init__(self, currencies: set, from_ordinal: int, to_ordinal: int, max_age_days: int):
+        self.max_age_days = max(cint(max_age_days), 0)
+        self.histories = {}       # (from, to) -> ([date ordinals], [rates]), sorted by date
+        self.resolved = {}        # (from, to, ordinal) -> rate or None
+        from_date = date.fromordinal(from_ordinal - self.max_age_days)
+        to_date = date.fromordinal(to_ordinal)
+        currencies = sorted(currencies | {"USD"})
+
+        seen = set()
+        for row in frappe.get_all(
+            CURRENCY_EXCHANGE,
+            filters={
+                "date": ("between", [from_date, to_date]),
+                "from_currency": ("in", currencies),
+                "to_currency": ("in", currencies),
+            },
+            fields=["date", "from_currency", "to_currency", "exchange_rate"],
+            order_by="date asc, creation asc",
+        ):
+            key = (row.from_currency, row.to_currency, getdate(row.date).toordinal())
+            if key in seen or flt(row.exchange_rate) <= 0:
+                continue   # of duplicate rows the first one counts, as in RateWriter
+            seen.add(key)
+            dates, rates = self.histories.setdefault(key[:2], ([], []))
+            dates.append(key[2])
+            rates.append(flt(row.exchange_rate))
+
+        self.snapshots = ([], [])  # compact storage: (date ordinals, USD vectors)
+        for row in frappe.get_all(
+            RATE_SNAPSHOT,
+            filters={"date": ("between", [from_date, to_date])},
+            fields=["date", "rates"],
+            order_by="date asc",
+        ):
+            self.snapshots[0].append(getdate(row.date).toordinal())
+            self.snapshots[1].append(unpack_rates(row.rates))
+
+    def _as_of(self, dates: list, ordinal: int):
+        """Index of the entry effective on `ordinal` within the age limit, or None."""
+        i = bisect_right(dates, ordinal)
+        if not i or ordinal - dates[i - 1] > self.max_age_days:
+            return None
+        return i - 1
+
+    def _stored(self, a: str, b: str, ordinal: int) -> tuple:
+        """(date, a->b) from the a->b row, or the inverse of the b->a row; (None, None) if neither."""
+        found = []
+        for pair, invert in (((a, b), False), ((b, a), True)):
+            dates, rates = self.histories.get(pair, ((), ()))
+            i = self._as_of(dates, ordinal)
+            if i is not None:
+                found.append((dates[i], 1 / rates[i] if invert else rates[i]))
+        return max(found, key=lambda f: f[0]) if found else (None, None)
+
+    def rate(self, from_currency: str, to_currency: str, ordinal: int):
+        """
+        from_currency -> to_currency effective on `ordinal`: the newest of the stored
+        pair (either direction), the pair derived through USD like
+        cross_pair_with_usd, i.e. (USD->to) / (USD->from), and the rate snapshot.
+        """
+        if from_currency == to_currency:
+            return 1.0
+        key = (from_currency, to_currency, ordinal)
+        if key in self.resolved:
+            return self.resolved[key]
+
+        candidates = []
+        stored_on, rate = self._stored(from_currency, to_currency, ordinal)
+        if rate:
+            candidates.append((stored_on, 2, rate))
+
+        usd_from = self._stored("USD", from_currency, ordinal) if from_currency != "USD" else (ordinal, 1.0)
+        usd_to = self._stored("USD", to_currency, ordinal) if to_currency != "USD" else (ordinal, 1.0)
+        if usd_from[1] and usd_to[1]:
+            candidates.append((min(usd_from[0], usd_to[0]), 1, usd_to[1] / usd_from[1]))
+
+        i = self._as_of(self.snapshots[0], ordinal)
+        if i is not None:
+            vector = self.snapshots[1][i]
+            from_rate, to_rate = flt(vector.get(from_currency)), flt(vector.get(to_currency))
+            if from_rate > 0 and to_rate > 0:
+                candidates.append((self.snapshots[0][i], 0, to_rate / from_rate))
+
+        # newest date wins; on the same date a stored pair beats a derived one
+        self.resolved[key] = max(candidates)[2] if candidates else None
+        return self.resolved[key]
+
+
+def convert_many(records: list, max_age_days: int | None = None) -> list:
+    """
+    Convert many amounts at once. `records` are dicts with amount, from_currency,
+    to_currency and date (default today), or [amount, from, to, date] lists.
+
+    All rates come from two queries over the records' currencies and date range;
+    each distinct (pair, date) is resolved once, using the rate of the nearest
+    earlier date within `max_age_days` (default: 'Max Rate Age (Days)').
+
+    Returns [{"rate": r, "amount": converted}, ...] in input order; both are None
+    when no rate is known for a record.
+    """
+    if len(records) > MAX_RECORDS:
+        frappe.throw(f"At most {MAX_RECORDS} records can be converted per call.")
+    if not records:
+        return []
+    if max_age_days is None:
+        max_age_days = frappe.db.get_single_value("Exchange Rate Config", "max_rate_age_days")
+        if max_age_days is None:
+            max_age_days = DEFAULT_MAX_RATE_AGE_DAYS
+
+    parsed = [_parse(record) for record in records]
+    currencies = {c for _, from_currency, to_currency, _ in parsed for c in (from_currency, to_currency) if c}
+    ordinals = [ordinal for *_, ordinal in parsed]
+    table = RateTable(currencies, min(ordinals), max(ordinals), max_age_days)
+
+    results = []
+    for amount, from_currency, to_currency, ordinal in parsed:
+        rate = table.rate(from_currency, to_currency, ordinal) if from_currency and to_currency else None
+        results.append({"rate": rate, "amount": amount * rate if rate else None})
+    return results
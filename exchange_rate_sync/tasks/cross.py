@@ -0,0 +1,68 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the pure-Python path gives the same rows
+    np = None
+
+
+def _usd_vector(currencies: list, usd_rates: dict) -> list:
+    """USD->currency rate for each currency; None where the rate is missing, zero or invalid."""
+    vector = []
+    for c in currencies:
+        try:
+            r = float(usd_rates.get(c) or 0)
+        except (TypeError, ValueError):
+            r = 0
+        vector.append(r if r > 0 and math.isfinite(r) else None)
+    return vector
+
+
+def rebase_rates(usd_rates: dict, base: str, symbols: list) -> dict:
+    """
+    Derive base->symbol rates from one USD->* response:
+      rate(base->s) = (USD->s) / (USD->base)
+    Symbols without a valid USD rate are left out; empty if `base` itself has none.
+    """
+    symbols = [s for s in dict.fromkeys(symbols) if s != base]
+    base_rate, *vector = _usd_vector([base, *symbols], usd_rates)
+    if base_rate is None:
+        return {}
+    return {s: r / base_rate for s, r in zip(symbols, vector, strict=True) if r is not None}
+
+
+def cross_rate_rows(currencies: list, usd_rates: dict) -> list:
+    """
+    Full cross-rate matrix among `currencies` using USD as the bridge:
+      rate(a->b) = (USD->b) / (USD->a)
+    computed in one outer division over the USD vector.
+
+    Returns [(a, b, rate), ...] for every ordered pair a != b where both USD
+    rates are valid, i.e. both directions of each pair, ready for RateWriter.add_many().
+    Currencies with a missing or zero USD rate are masked out.
+    """
+    currencies = list(dict.fromkeys(currencies))
+    vector = _usd_vector(currencies, usd_rates)
+
+    if np is not None:
+        return _cross_rate_rows_numpy(currencies, vector)
+
+    valid = [(c, r) for c, r in zip(currencies, vector, strict=True) if r is not None]
+    return [(a, b, rb / ra) for a, ra in valid for b, rb in valid if a != b]
+
+
+def _cross_rate_rows_numpy(currencies: list, vector: list) -> list:
+    usd = np.array([r if r is not None else np.nan for r in vector], dtype=float)
+    valid = ~np.isnan(usd)
+
+    # matrix[i, j] = usd[j] / usd[i]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        matrix = usd[np.newaxis, :] / usd[:, np.newaxis]
+        mask = valid[:, np.newaxis] & valid[np.newaxis, :] & np.isfinite(matrix) & (matrix > 0)
+    np.fill_diagonal(mask, False)
+
+    rows, cols = np.nonzero(mask)
+    return [
+        (currencies[i], currencies[j], rate)
+        for i, j, rate in zip(rows.tolist(), cols.tolist(), matrix[rows, cols].tolist(), strict=True)
+    ]
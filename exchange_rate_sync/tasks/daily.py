@@ -1,46 +1,85 @@
 import time
-import requests
-import frappe
-from frappe.utils import today
-
-OXR_LATEST_URL = "https://openexchangerates.org/api/latest.json"
-DELAY_SEC = 1  # fixed delay between API requests/retries (change in code later if needed)
+from functools import partial
 
-def _req_with_retry(url: str, params: dict, retries: int = 3, delay_sec: int = DELAY_SEC):
+import frappe
+from frappe.utils import cint, now, now_datetime, today
+
+from ..providers import RateProvider, get_provider
+from . import metrics
+from .asof import invalidate_history
+from .cache import activate_snapshot, discard_snapshot, stage_snapshot
+from .cross import cross_rate_rows, rebase_rates
+from .errors import ErrorCollector
+from .fetch import DEFAULT_REQUESTS_PER_SEC, ResponseCache, TokenBucket, fetch_concurrently, get_session
+from .instrumentation import SyncRunLog
+from .planner import FETCH_PER_BASE, FETCH_SINGLE_USD, plan_run, record_spent
+from .schedule import (
+    DEFAULT_LOCK_TIMEOUT_SEC,
+    enqueue_sync,
+    get_sync_progress,
+    is_sync_due,
+    set_sync_progress,
+    sync_interval,
+    sync_lock,
+)
+from .snapshots import is_compact, materialize, store_snapshot, usd_vector
+from .writer import RateWriter, upsert_rate
+
+LOCK_SLACK_SEC = 5 * 60          # lock outlives the run deadline by this much
+SNAPSHOT_SLACK_SEC = 2 * 60 * 60  # cached rates outlive the sync interval by this much
+
+PROVIDER_STATE_KEY = "exchange_rate_sync:provider_state"
+PROVIDER_STATE_TTL_SEC = 26 * 60 * 60
+
+
+def fetch_all(calls_by_key: dict, max_workers: int | None = None, requests_per_sec: float | None = None,
+              timeout: float | None = None, on_result=None, response_cache: ResponseCache | None = None,
+              on_error=None) -> dict:
     """
-    Do a GET with minimal retry on network errors or non-200 responses.
-    Returns (json_dict, status_code). On total failure returns (None, status_code_or_None).
+    Run every {key: call} concurrently on a bounded pool over the shared session,
+    rate limited by a token bucket. `call` is a provider method with its arguments
+    bound, e.g. partial(provider.latest, "EUR", ["USD", "GBP"]); it is called with
+    the session, limiter, on_error, stats and response_cache keyword arguments of _req_with_retry.
+    Returns {key: (json_dict, status_code)}; errors are reported here, on the calling thread,
+    to `on_error` (e.g. an ErrorCollector) or frappe.log_error.
+    Keys whose request had not finished after `timeout` seconds are left out.
+    on_result(key, json_dict, status_code, stats) is called on the calling thread as each
+    request finishes; stats holds the attempts and latency of that request.
     """
-    last_status = None
-    for attempt in range(1, retries + 1):
-        try:
-            resp = requests.get(url, params=params, timeout=15)
-            last_status = resp.status_code
-            if resp.status_code == 200:
-                return resp.json(), 200
-            else:
-                frappe.log_error(
-                    title="Exchange Rate Sync: API non-200",
-                    message=f"Attempt={attempt}\nParams={params}\nStatus={resp.status_code}\nBody={resp.text[:2000]}"
-                )
-        except requests.exceptions.RequestException as e:
-            frappe.log_error(
-                title="Exchange Rate Sync: RequestException",
-                message=f"Attempt={attempt}\nParams={params}\nError={e}"
-            )
-            last_status = None
-
-        if attempt < retries:
-            time.sleep(delay_sec)
-
-    return None, last_status
-
-
-def cross_pair_with_usd(date_str: str, a: str, b: str, usd_rates: dict) -> int:
+    session = get_session()
+    limiter = TokenBucket(requests_per_sec or DEFAULT_REQUESTS_PER_SEC)
+
+    def fetch(call):
+        errors = []
+        stats = {}
+        data, status = call(
+            session=session, limiter=limiter,
+            on_error=lambda **kw: errors.append(kw),
+            stats=stats,
+            response_cache=response_cache,
+        )
+        return data, status, errors, stats
+
+    def finished(key, result):
+        data, status, errors, stats = result
+        for err in errors:
+            (on_error or frappe.log_error)(**err)
+        if on_result:
+            on_result(key, data, status, stats)
+
+    return {
+        key: (data, status)
+        for key, (data, status, errors, stats) in fetch_concurrently(
+            calls_by_key, fetch, max_workers, timeout, on_result=finished
+        ).items()
+    }
+
+
+def cross_pair_with_usd(date_str: str, a: str, b: str, usd_rates: dict, writer: RateWriter = None) -> int:
     """
     Using USD-based rates:
       rate(a->b) = (USD->b) / (USD->a)
-    Upserts a->b and b->a for given date.
+    Upserts a->b and b->a for given date (queued on `writer` when given).
     Returns 1 if forward (a->b) was updated/inserted; 0 if skipped.
     """
     ra = usd_rates.get(a)
@@ -52,51 +91,68 @@ def cross_pair_with_usd(date_str: str, a: str, b: str, usd_rates: dict) -> int:
     if rate_ab <= 0:
         return 0
 
+    if writer is not None:
+        return 1 if writer.add_pair(date_str, a, b, rate_ab) else 0
+
     # a -> b
-    name = frappe.db.get_value(
-        "Currency Exchange",
-        {"date": date_str, "from_currency": a, "to_currency": b},
-        "name",
-    )
-    if name:
-        frappe.db.set_value("Currency Exchange", name, "exchange_rate", rate_ab)
-    else:
-        frappe.get_doc({
-            "doctype": "Currency Exchange",
-            "date": date_str,
-            "from_currency": a,
-            "to_currency": b,
-            "exchange_rate": rate_ab
-        }).insert(ignore_permissions=True)
+    upsert_rate(date_str, a, b, rate_ab)
 
     # b -> a (inverse)
-    rate_ba = 1 / rate_ab
-    rev_name = frappe.db.get_value(
-        "Currency Exchange",
-        {"date": date_str, "from_currency": b, "to_currency": a},
-        "name",
-    )
-    if rev_name:
-        frappe.db.set_value("Currency Exchange", rev_name, "exchange_rate", rate_ba)
-    else:
-        frappe.get_doc({
-            "doctype": "Currency Exchange",
-            "date": date_str,
-            "from_currency": b,
-            "to_currency": a,
-            "exchange_rate": rate_ba
-        }).insert(ignore_permissions=True)
+    upsert_rate(date_str, b, a, 1 / rate_ab)
 
     return 1
 
 
-def get_currency_exchange():
+def run_scheduled_sync():
+    """
+    Scheduler entry (cron, every 5 minutes): enqueues get_currency_exchange as a
+    background job when it is due per 'Sync Frequency', with the configured run deadline.
+    """
+    cfg = frappe.get_doc("Exchange Rate Config", "Exchange Rate Config")
+    if cfg.enabled == 0:
+        return
+
+    if not is_sync_due(cfg.get("sync_frequency"), cfg.get("last_sync_at"), cfg.get("trading_days_only")):
+        return
+
+    # With 'Respect API Quota', scheduled runs are spaced out so the quota lasts until it resets
+    base_currencies, target_currencies = configured_currencies(cfg)
+    plan = plan_run(cfg, get_provider(cfg), base_currencies, target_currencies, sync_interval(cfg.get("sync_frequency")))
+    if plan["skip"] or not is_sync_due(cfg.get("sync_frequency"), cfg.get("last_sync_at"),
+                                       cfg.get("trading_days_only"), min_interval_sec=plan["min_interval"]):
+        return
+
+    return enqueue_sync(deadline_sec=cfg.get("run_deadline_sec"))
+
+
+def configured_currencies(cfg) -> tuple:
+    """(base_currencies, target_currencies) from the config's child tables, normalized."""
+    base_currencies = [
+        (row.from_currency or "").strip().upper()
+        for row in (cfg.get("from_currency_table") or [])
+        if (row.from_currency or "").strip()
+    ]
+    target_currencies = [
+        (row.to_currency or "").strip().upper()
+        for row in (cfg.get("to_currency_table") or [])
+        if (row.to_currency or "").strip()
+    ]
+    return base_currencies, target_currencies
+
+
+def get_currency_exchange(deadline_sec: int | None = None):
     """
-    Fetch rates from Open Exchange Rates for:
+    Fetch rates from the rate provider (Open Exchange Rates, see providers.get_provider) for:
       - each base currency in 'from_currency_table'
       - target currencies in 'to_currency_table'
     API key is read from 'Exchange Rate Config.api_key'.
 
+    deadline_sec: time budget for the run. When it runs out, pending fetches are
+    abandoned, what has been fetched so far is written and committed, and the
+    unfinished bases are reported.
+
+    Only one run at a time: a run that finds another one in progress returns at once.
+
     Returns a human-readable string describing the outcome.
     """
     # Load config single
@@ -104,163 +160,238 @@ def get_currency_exchange():
         cfg = frappe.get_doc("Exchange Rate Config", "Exchange Rate Config")
     except Exception as e:
         frappe.log_error("Exchange Rate Sync: Failed to load config", str(e))
-        return "Failed to load Exchange Rate Config"
+        return _finish_early("Failed to load Exchange Rate Config")
     try:
         cfg = frappe.get_doc("Exchange Rate Config", "Exchange Rate Config")
     except Exception as e:
         frappe.log_error("Exchange Rate Sync: Failed to load config", str(e))
-        return "Failed to load Exchange Rate Config"
+        return _finish_early("Failed to load Exchange Rate Config")
 
     # Run only if enabled
     if cfg.enabled == 0:
         frappe.log_error("Exchange Rate Sync", "sync not enabled")
-        return "Exchange rate sync is disabled in Exchange Rate Config"
+        return _finish_early("Exchange rate sync is disabled in Exchange Rate Config")
     
-    api_key = (cfg.api_key or "").strip()
-    if not api_key:
+    provider = get_provider(cfg, check_date=today())
+    if provider.requires_api_key and not (cfg.api_key or "").strip():
         frappe.log_error("Exchange Rate Sync", "Missing API key in Exchange Rate Config")
-        return "Missing API key in Exchange Rate Config"
+        return _finish_early("Missing API key in Exchange Rate Config")
 
-    # Collect base and target currencies from child tables
-    base_currencies = [
-        (row.from_currency or "").strip().upper()
-        for row in (cfg.get("from_currency_table") or [])
-        if (row.from_currency or "").strip()
-    ]
-    target_currencies = [
-        (row.to_currency or "").strip().upper()
-        for row in (cfg.get("to_currency_table") or [])
-        if (row.to_currency or "").strip()
-    ]
+    base_currencies, target_currencies = configured_currencies(cfg)
 
     if not base_currencies:
         frappe.log_error("Exchange Rate Sync", "No base currencies configured")
-        return "No base currencies configured in From Currency Table"
+        return _finish_early("No base currencies configured in From Currency Table")
     if not target_currencies:
         frappe.log_error("Exchange Rate Sync", "No target currencies configured")
-        return "No target currencies configured in To Currency Table"
+        return _finish_early("No target currencies configured in To Currency Table")
+
+    plan = plan_run(cfg, provider, base_currencies, target_currencies, sync_interval(cfg.get("sync_frequency")))
+    if plan["skip"]:
+        frappe.log_error("Exchange Rate Sync", plan["reason"])
+        return _finish_early(plan["reason"])
+    cfg.fetch_strategy = plan["strategy"]   # this run only, not saved
+
+    deadline_sec = cint(deadline_sec)
+    deadline_at = time.monotonic() + deadline_sec if deadline_sec > 0 else None
+    lock_timeout = deadline_sec + LOCK_SLACK_SEC if deadline_sec > 0 else DEFAULT_LOCK_TIMEOUT_SEC
+
+    with sync_lock(lock_timeout) as acquired:
+        if not acquired:
+            message = "Another exchange rate sync is already running. Please try again later."
+            if get_sync_progress().get("status") != "running":
+                # a job queued while another run held the lock; the running run reports its own progress
+                _finish_early(message)
+            return message
+
+        frappe.db.set_single_value("Exchange Rate Config", "last_sync_at", now_datetime())
+        frappe.db.commit()
+        set_sync_progress(status="running", stage="fetching", done=0, total=len(base_currencies),
+                          bases={}, message=None, started_at=now())
+        run = SyncRunLog.start(fetch_strategy=cfg.get("fetch_strategy") or FETCH_PER_BASE)
+        # one deduplicated Error Log per run instead of one per failed attempt or row
+        errors = ErrorCollector("Exchange Rate Sync")
+        try:
+            message = _sync_rates(cfg, provider, base_currencies, target_currencies, deadline_at, run, errors)
+        except Exception:
+            frappe.db.rollback()
+            errors.flush()   # what was collected before the failure; finish() commits it
+            set_sync_progress(status="failed", stage=None, message="Exchange rate sync failed (check logs).")
+            run.finish("Failed", frappe.get_traceback())
+            raise
+        finally:
+            record_spent(run.api_requests)
+        if plan["reason"]:
+            message = f"{plan['reason']}\n{message}"
+        set_sync_progress(status="finished", stage=None, message=message, finished_at=now())
+        return message
+
+
+def _finish_early(message: str) -> str:
+    """Report a run that ended before syncing as finished, so the progress does not stay queued."""
+    set_sync_progress(status="finished", stage=None, message=message, finished_at=now())
+    return message
+
+
+def _past(deadline_at) -> bool:
+    return bool(deadline_at) and time.monotonic() >= deadline_at
+
 
+def _provider_state(cfg, date_str: str, base_currencies: list, target_currencies: list, timestamps: dict):
+    """
+    What a run's rates depend on: the date, the currency setup and the provider
+    timestamp per base. None if a timestamp is missing (nothing to compare).
+    """
+    if not timestamps or not all(timestamps.values()):
+        return None
+    return {
+        "date": date_str,
+        "setup": [base_currencies, target_currencies, cint(cfg.get("cross_rate_conversion")),
+                  cfg.get("fetch_strategy") or FETCH_PER_BASE, cfg.get("storage_mode"),
+                  cint(cfg.get("materialize_company_pairs"))],
+        "timestamps": timestamps,
+    }
+
+
+def _sync_rates(cfg, provider: RateProvider, base_currencies: list, target_currencies: list, deadline_at=None,
+                run: SyncRunLog = None, errors: ErrorCollector | None = None) -> str:
+    """
+    Fetch, derive and write one run's rates. Called with the sync lock held.
+    `errors` collects the run's errors and is flushed to the Error Log at the end;
+    if the run raises, the caller flushes it.
+    """
+    run = run or SyncRunLog()
     results = []
     success_count = 0
     fail_count = 0
+    succeeded_bases = []
+    timestamps = {}   # base -> provider timestamp of the rates used
+    rates_by_base = {}
     today_str = today()
+    if errors is None:
+        errors = ErrorCollector("Exchange Rate Sync")
+    writer = RateWriter(bulk=bool(cfg.get("bulk_upsert")), tolerance=cfg.get("change_tolerance"), on_error=errors)
+
+    # conditional requests: a 304 answer reuses the body of the previous run's response
+    response_cache = ResponseCache.load()
 
     # NEW: capture USD-based rates from the USD iteration (for cross conversions after the loop)
     usd_rates_for_cross = None
 
-    for i, base in enumerate(base_currencies, start=1):
-        # exclude base from targets for this request
+    # "Single USD Fetch": pull USD->all once and derive every base->target rate locally
+    triangulate = (cfg.get("fetch_strategy") or "") == FETCH_SINGLE_USD
+    if triangulate:
+        usd_symbols = list(dict.fromkeys(c for c in base_currencies + target_currencies if c != "USD"))
+        usd_stats = {}
+        with run.timed("fetch"):
+            usd_data, usd_status = provider.latest("USD", usd_symbols, session=get_session(), stats=usd_stats,
+                                                   response_cache=response_cache, on_error=errors)
+        run.record_request("USD", usd_status, usd_stats["latency"], usd_stats["attempts"])
+        usd_rates = (usd_data or {}).get("rates") or {}
+        if usd_status == 200 and usd_rates:
+            usd_rates_for_cross = {**usd_rates, "USD": 1.0}
+
+    # exclude base from targets for each request
+    symbols_by_base = {}
+    for base in base_currencies:
         symbols = [c for c in target_currencies if c and c != base]
-        if not symbols:
+        if symbols:
+            symbols_by_base[base] = symbols
+
+    # "Per Base": fetch all bases concurrently; DB writes stay on this thread below
+    responses = {}
+    if not triangulate:
+        fetched = {}
+        # Compact storage packs USD rates: every base also asks for its USD rate (see usd_vector)
+        request_symbols = {
+            base: [*symbols, "USD"] if is_compact(cfg) and "USD" not in (base, *symbols) else symbols
+            for base, symbols in symbols_by_base.items()
+        }
+
+        def on_fetched(base, data, status, stats):
+            run.record_request(base, status, stats["latency"], stats["attempts"])
+            fetched[base] = "fetched" if status == 200 else f"failed ({status or 'network error'})"
+            set_sync_progress(done=len(fetched), bases=fetched)
+
+        with run.timed("fetch"):
+            responses = fetch_all(
+                {base: partial(provider.latest, base, symbols) for base, symbols in request_symbols.items()},
+                max_workers=cfg.get("max_parallel_requests"),
+                requests_per_sec=cfg.get("requests_per_second"),
+                timeout=max(deadline_at - time.monotonic(), 0) if deadline_at else None,
+                on_result=on_fetched,
+                response_cache=response_cache,
+                on_error=errors,
+            )
+    response_cache.save()
+
+    unfinished = []
+    for i, base in enumerate(base_currencies, start=1):
+        if base not in symbols_by_base:
             results.append(f"Skipped {base}: no target currencies after excluding base.")
             continue
 
-        params = {
-            "app_id": api_key,
-            "base": base,                      # note: non-USD base requires paid plan
-            "symbols": ",".join(symbols),
-        }
+        if not triangulate and base not in responses:
+            # fetch abandoned at the deadline
+            unfinished.append(base)
+            continue
 
-        data, status = _req_with_retry(OXR_LATEST_URL, params=params, retries=2, delay_sec=DELAY_SEC)
+        symbols = symbols_by_base[base]
+        if triangulate:
+            data, status = usd_data, usd_status
+            if usd_rates_for_cross:
+                data = {**usd_data, "base": base, "rates": rebase_rates(usd_rates_for_cross, base, symbols)}
+        else:
+            data, status = responses[base]
 
         if status is None:
             msg = f"Network error while fetching rates for base {base}"
-            frappe.log_error("Exchange Rate Sync", msg)
+            errors.add("Exchange Rate Sync", msg)
             results.append(msg)
             fail_count += 1
-            time.sleep(DELAY_SEC)
             continue
 
         if status != 200:
             msg = f"API request failed for base {base} with status code {status}"
             # Common cause: Free plan only supports USD base; non-USD will return 400/403
-            frappe.log_error("Exchange Rate Sync", f"{msg}\nParams={params}")
+            errors.add("Exchange Rate Sync", f"{msg}\nSymbols={','.join(symbols)}")
             results.append(msg)
             fail_count += 1
-            time.sleep(DELAY_SEC)
             continue
 
         rates = (data or {}).get("rates") or {}
         if not rates:
             msg = f"No rates returned for base {base}"
-            frappe.log_error("Exchange Rate Sync", f"{msg}\nBody={data}")
+            errors.add("Exchange Rate Sync", f"{msg}\nBody={data}")
             results.append(msg)
             fail_count += 1
-            time.sleep(DELAY_SEC)
             continue
 
         # NEW: if this is the USD iteration, keep its USD->X rates to do cross conversions later
-        if base == "USD":
+        if base == "USD" and not triangulate:
             usd_rates_for_cross = rates.copy()
             usd_rates_for_cross.setdefault("USD", 1.0)
-        # Upsert both directions for today's date
+        # Queue both directions for today's date
         updated_pairs = 0
         for to_currency, rate in rates.items():
-            try:
-                if not rate:
-                    continue
-
-                # BASE -> OTHER
-                existing = frappe.db.get_value(
-                    "Currency Exchange",
-                    {
-                        "date": today_str,
-                        "from_currency": base,
-                        "to_currency": to_currency
-                    },
-                    "name"
-                )
-                if existing:
-                    frappe.db.set_value("Currency Exchange", existing, "exchange_rate", rate)
-                else:
-                    frappe.get_doc({
-                        "doctype": "Currency Exchange",
-                        "date": today_str,
-                        "from_currency": base,
-                        "to_currency": to_currency,
-                        "exchange_rate": rate
-                    }).insert(ignore_permissions=True)
-
-                # OTHER -> BASE (inverse)
-                reverse_rate = 1 / rate
-                reverse_name = frappe.db.get_value(
-                    "Currency Exchange",
-                    {
-                        "date": today_str,
-                        "from_currency": to_currency,
-                        "to_currency": base
-                    },
-                    "name"
-                )
-                if reverse_name:
-                    frappe.db.set_value("Currency Exchange", reverse_name, "exchange_rate", reverse_rate)
-                else:
-                    frappe.get_doc({
-                        "doctype": "Currency Exchange",
-                        "date": today_str,
-                        "from_currency": to_currency,
-                        "to_currency": base,
-                        "exchange_rate": reverse_rate
-                    }).insert(ignore_permissions=True)
-
+            if to_currency not in symbols:
+                continue   # asked for the compact USD vector only
+            if writer.add_pair(today_str, base, to_currency, rate):
                 updated_pairs += 1
 
-            except Exception as e:
-                frappe.log_error(
-                    title="Exchange Rate Sync: Upsert error",
-                    message=f"Base={base} To={to_currency}\nError={e}"
-                )
-
-        frappe.db.commit()
         success_count += 1
+        succeeded_bases.append(base)
+        rates_by_base[base] = rates
+        timestamps[base] = (data or {}).get("timestamp")
         results.append(f"Updated {updated_pairs} pairs for base {base}.")
-        time.sleep(DELAY_SEC)
 
     # NEW: After the loop, if cross_rate_conversion enabled, compute cross rates among to_currency_table via USD
     try:
         if getattr(cfg, "cross_rate_conversion", 0):
-            if not usd_rates_for_cross:
-                frappe.log_error(
+            if _past(deadline_at):
+                unfinished.append("cross conversion")
+            elif not usd_rates_for_cross:
+                errors.add(
                     "Exchange Rate Sync",
                     "Cross conversion enabled but USD rates are unavailable (no successful USD iteration). Skipping cross conversions."
                 )
@@ -269,29 +400,109 @@ def get_currency_exchange():
                 # Work with unique targets list
                 t = list(dict.fromkeys(c.strip().upper() for c in target_currencies if c))
 
-                cross_updated = 0
-                for x in range(len(t)):
-                    for y in range(x + 1, len(t)):
-                        a, b = t[x], t[y]
-                        try:
-                            cross_updated += cross_pair_with_usd(today_str, a, b, usd_rates_for_cross)
-                        except Exception as e:
-                            fail_count += 1
-                            frappe.log_error(
-                                title="Exchange Rate Sync: Cross upsert error",
-                                message=f"A={a} B={b}\nError={e}"
-                            )
+                # Whole NxN matrix in one pass; rows hold both directions of each pair
+                with run.timed("cross"):
+                    cross_rows = cross_rate_rows(t, usd_rates_for_cross)
+                    cross_updated = writer.add_many(today_str, cross_rows) // 2
 
-                frappe.db.commit()
                 results.append(f"Cross conversion: updated {cross_updated} forward pairs among target currencies.")
     except Exception as e:
         fail_count += 1
-        frappe.log_error("Exchange Rate Sync", f"Cross conversion block failed: {e}")
+        errors.add("Exchange Rate Sync", f"Cross conversion block failed: {e}")
         results.append("Cross conversion failed due to an internal error (check logs).")
 
+    if unfinished:
+        msg = f"Run deadline reached before finishing: {', '.join(unfinished)}. Rates fetched so far are saved."
+        errors.add("Exchange Rate Sync", msg)
+        results.append(msg)
+        fail_count += 1
+
+    # Nothing new since the last complete write today (same provider timestamps): skip the write stage
+    provider_state = _provider_state(cfg, today_str, base_currencies, target_currencies, timestamps)
+    unchanged = bool(
+        provider_state and not fail_count
+        and provider_state == frappe.cache().get_value(PROVIDER_STATE_KEY, expires=True)
+    )
+    stats = {}
+    if unchanged:
+        writer.rows.clear()
+        metrics.inc("writes_skipped_total")
+        for base in succeeded_bases:
+            metrics.set_gauge("last_success_timestamp_seconds", time.time(), base=base)
+        results.append("Provider data unchanged since the last run; nothing written.")
+    else:
+        # Stage everything queued by the base loop and the cross conversion, then publish it at once
+        set_sync_progress(stage="writing", done=len(base_currencies))
+        cache_ttl = sync_interval(cfg.get("sync_frequency")) + SNAPSHOT_SLACK_SEC
+        staged_cache = {}
+        try:
+            with run.timed("write"):
+                vector = None
+                if is_compact(cfg):
+                    # One packed USD vector for the day; Currency Exchange gets only the pairs ERPNext reads
+                    if usd_rates_for_cross:
+                        rates_by_base["USD"] = usd_rates_for_cross
+                    vector = usd_vector(rates_by_base)
+                    if len(vector) <= 1:
+                        fail_count += 1
+                        errors.add("Exchange Rate Sync", "Compact storage: no USD rates could be derived; no rate snapshot stored.")
+                        results.append("Rate snapshot skipped: no USD rates.")
+
+                # Stage: reads only, so readers and the writer do not contend yet
+                all_rows = dict(writer.rows)
+                if vector is not None:
+                    writer.rows = materialize(cfg, writer.rows)
+                staged = writer.stage()
+                try:
+                    staged_cache = stage_snapshot(all_rows, ttl=cache_ttl)
+                except Exception as e:
+                    errors.add("Exchange Rate Sync", f"Staging the rate cache failed: {e}")
+                frappe.db.commit()
+
+                # Publish: one short transaction
+                if vector and len(vector) > 1:
+                    result = store_snapshot(today_str, vector, source=provider.name)
+                    results.append(f"Rate snapshot for {today_str}: {result}.")
+                stats = staged.apply()
+                frappe.db.commit()
+
+            # Readers of get_rate() switch to this run's rates right after they are committed
+            if staged_cache:
+                try:
+                    with run.timed("publish"):
+                        activate_snapshot(staged_cache, ttl=cache_ttl)
+                except Exception as e:
+                    errors.add("Exchange Rate Sync", f"Publishing the rate cache failed: {e}")
+            invalidate_history()
+            for base in succeeded_bases:
+                metrics.set_gauge("last_success_timestamp_seconds", time.time(), base=base)
+            results.append(
+                f"Wrote rates: {stats['inserted']} inserted, {stats['updated']} updated, "
+                f"{stats['unchanged']} unchanged, {stats['failed']} failed."
+            )
+            if stats["failed"]:
+                fail_count += 1
+        except Exception as e:
+            frappe.db.rollback()
+            fail_count += 1
+            errors.add("Exchange Rate Sync", f"Writing Currency Exchange rows failed: {e}")
+            results.append("Writing exchange rates failed due to an internal error (check logs).")
+            if staged_cache:
+                discard_snapshot(staged_cache)
+        if provider_state and not fail_count:
+            frappe.cache().set_value(PROVIDER_STATE_KEY, provider_state, expires_in_sec=PROVIDER_STATE_TTL_SEC)
+
     if fail_count and not success_count:
-        return "Exchange rate sync failed for all bases:\n" + "\n".join(results)
+        status, message = "Failed", "Exchange rate sync failed for all bases:\n" + "\n".join(results)
     elif fail_count:
-        return f"Exchange rate sync completed with issues ({success_count} succeeded, {fail_count} failed):\n" + "\n".join(results)
+        status = "Partial"
+        message = f"Exchange rate sync completed with issues ({success_count} succeeded, {fail_count} failed):\n" + "\n".join(results)
+    elif unchanged:
+        status, message = "Success", "Exchange rate sync completed: provider data unchanged since the last run, nothing written."
     else:
-        return "Exchange rate sync completed successfully."
+        status, message = "Success", "Exchange rate sync completed successfully."
+
+    if errors:
+        message += f"\n{len(errors)} errors" + (" (see Error Log)." if errors.flush() else ".")
+    run.finish(status, message, stats, deadline_reached=int(bool(unfinished)))
+    return message
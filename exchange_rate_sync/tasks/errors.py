@@ -0,0 +1,94 @@
+import re
+import threading
+import time
+
+import frappe
+
+from . import metrics
+
+MAX_SIGNATURES = 50            # distinct errors kept per run; further ones are only counted
+MAX_SAMPLES = 3                # sample messages kept per distinct error
+SAMPLE_CHARS = 1000
+MAX_LOGS_PER_HOUR = 20         # Error Logs written by collectors per site and hour, across all runs
+LOG_BUDGET_KEY = "exchange_rate_sync:error_logs"
+
+_VARYING = re.compile(r"\d+")
+
+
+def _signature(title: str, message: str) -> tuple:
+    """What makes two errors the same: the title and the message with numbers masked."""
+    return title, _VARYING.sub("#", (message or "")[:200])
+
+
+def _take_log_slot() -> bool:
+    """Count one Error Log against this hour's budget; False once it is used up."""
+    cache = frappe.cache()
+    key = cache.make_key(f"{LOG_BUDGET_KEY}:{int(time.time() // 3600)}")
+    used = cache.incr(key)
+    if used == 1:
+        cache.expire(key, 2 * 3600)
+    return used <= MAX_LOGS_PER_HOUR
+
+
+class ErrorCollector:
+    """
+    Collects the errors of one run instead of inserting an Error Log for each:
+    errors are deduplicated by signature and counted, and flush() writes a single
+    summary with a few sample messages per error. Thread-safe and callable as
+    on_error(title=..., message=...), so it can be handed to _req_with_retry.
+    """
+
+    def __init__(self, title: str = "Exchange Rate Sync"):
+        self.title = title
+        self.errors = {}        # signature -> {"title", "count", "samples"}
+        self.total = 0
+        self.dropped = 0        # errors beyond MAX_SIGNATURES distinct ones
+        self._lock = threading.Lock()
+
+    def __call__(self, title: str | None = None, message: str | None = None, **kwargs):
+        self.add(title or self.title, message)
+
+    def __len__(self):
+        return self.total
+
+    def add(self, title: str, message: str | None = None):
+        message = str(message or "")
+        signature = _signature(title, message)
+        metrics.inc("errors_total")
+        with self._lock:
+            self.total += 1
+            entry = self.errors.get(signature)
+            if entry:
+                entry["count"] += 1
+                if len(entry["samples"]) < MAX_SAMPLES:
+                    entry["samples"].append(message[:SAMPLE_CHARS])
+            elif len(self.errors) < MAX_SIGNATURES:
+                self.errors[signature] = {"title": title, "count": 1, "samples": [message[:SAMPLE_CHARS]]}
+            else:
+                self.dropped += 1
+
+    def summary(self) -> str:
+        lines = [f"{self.total} errors, {len(self.errors)} distinct."]
+        for entry in sorted(self.errors.values(), key=lambda e: -e["count"]):
+            lines.append(f"\n{entry['count']} x {entry['title']}")
+            lines.extend("  " + sample.replace("\n", "\n    ") for sample in entry["samples"])
+        if self.dropped:
+            lines.append(f"\n{self.dropped} more errors of other kinds not listed.")
+        return "\n".join(lines)
+
+    def flush(self) -> bool:
+        """
+        Write one Error Log summarizing the collected errors and start over.
+        Returns False when nothing was written: no errors, or the hourly cap was reached.
+        """
+        if not self.total:
+            return False
+        summary, total = self.summary(), self.total
+        with self._lock:
+            self.errors, self.total, self.dropped = {}, 0, 0
+
+        if not _take_log_slot():
+            metrics.inc("error_logs_suppressed_total")
+            return False
+        frappe.log_error(title=f"{self.title}: {total} errors", message=summary)
+        return True
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+import frappe
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+
+DELAY_SEC = 1  # fixed delay between API requests/retries (change in code later if needed)
+HTTP_CACHE_KEY = "exchange_rate_sync:http_cache"
+HTTP_CACHE_TTL_SEC = 2 * 24 * 60 * 60  # entries not refreshed for this long are dropped
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_REQUESTS_PER_SEC = 5.0
+POOL_MAXSIZE = 16  # keep-alive connections per host kept by the shared session
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Process-wide requests.Session with a pooled adapter, so provider calls
+    (also from worker threads) reuse keep-alive connections.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills `rate` tokens per second up to `capacity`.
+    acquire() blocks only as long as needed to stay under the rate, instead of a fixed sleep.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = max(float(rate or DEFAULT_REQUESTS_PER_SEC), 0.01)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_sec = (1 - self.tokens) / self.rate
+            time.sleep(wait_sec)
+
+
+class ResponseCache:
+    """
+    Bodies and validators (ETag / Last-Modified) of provider responses keyed by
+    URL plus params, so repeated calls can be conditional and a 304 reuses the body.
+
+    load() and save() use Redis and belong on the calling thread; lookups and
+    updates are thread-safe for fetch workers.
+    """
+
+    def __init__(self, entries: dict | None = None):
+        self.entries = dict(entries or {})
+        self.lock = threading.Lock()
+        self.changed = False
+
+    @classmethod
+    def load(cls) -> "ResponseCache":
+        return cls(frappe.cache().get_value(HTTP_CACHE_KEY, expires=True))
+
+    def save(self):
+        if not self.changed:
+            return
+        cutoff = time.time() - HTTP_CACHE_TTL_SEC
+        with self.lock:
+            entries = {k: e for k, e in self.entries.items() if e["stored_at"] >= cutoff}
+            self.changed = False
+        frappe.cache().set_value(HTTP_CACHE_KEY, entries, expires_in_sec=HTTP_CACHE_TTL_SEC)
+
+    @staticmethod
+    def key(url: str, params: dict | None = None) -> str:
+        # params include the API key: keep only a digest
+        return hashlib.sha1(f"{url}?{json.dumps(params or {}, sort_keys=True)}".encode()).hexdigest()
+
+    def headers(self, key: str) -> dict:
+        """Conditional request headers for a cached response, if any."""
+        with self.lock:
+            entry = self.entries.get(key)
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                entry["stored_at"] = time.time()
+                self.changed = True
+        return entry and entry["body"]
+
+    def put(self, key: str, response_headers, body):
+        etag, last_modified = response_headers.get("ETag"), response_headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        with self.lock:
+            self.entries[key] = {"etag": etag, "last_modified": last_modified, "body": body, "stored_at": time.time()}
+            self.changed = True
+
+
+def fetch_concurrently(jobs: dict, fetch, max_workers: int = DEFAULT_MAX_WORKERS, timeout: float | None = None,
+                       on_result=None) -> dict:
+    """
+    Run fetch(args) for every {key: args} on a bounded thread pool and
+    return {key: result} in the order of `jobs`.
+
+    With `timeout` (seconds), jobs not finished by then are dropped from the
+    result: queued ones are cancelled, running ones are left to finish unobserved.
+    on_result(key, result) is called on the calling thread as each job finishes.
+
+    Worker threads have no Frappe site context: `fetch` must not call frappe.*
+    (log errors, DB access); hand anything like that back in the result.
+    """
+    if not jobs:
+        return {}
+
+    results = {}
+    workers = max(1, min(int(max_workers or DEFAULT_MAX_WORKERS), len(jobs)))
+    if workers == 1 and timeout is None:
+        for key, args in jobs.items():
+            results[key] = fetch(args)
+            if on_result:
+                on_result(key, results[key])
+        return results
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="exchange-rate-fetch",
+                              initializer=metrics.bind_site, initargs=(metrics.current_site(),))
+    try:
+        futures = {pool.submit(fetch, args): key for key, args in jobs.items()}
+        try:
+            for future in as_completed(futures, timeout=timeout):
+                key = futures[future]
+                results[key] = future.result()
+                if on_result:
+                    on_result(key, results[key])
+        except FuturesTimeout:
+            pass
+    finally:
+        pool.shutdown(wait=timeout is None, cancel_futures=True)
+
+    return {key: results[key] for key in jobs if key in results}
+
+
+def _record_attempt(stats: dict, started: float, status):
+    """Latency of one HTTP attempt into the request's stats and the metrics buffer (thread-safe)."""
+    elapsed = time.perf_counter() - started
+    stats["latency"] += elapsed
+    metrics.observe("api_request_duration_seconds", elapsed, metrics.LATENCY_BUCKETS)
+    metrics.inc("api_requests_total", status=status or "error")
+
+
+def _req_with_retry(
+    url: str,
+    params: dict,
+    retries: int = 3,
+    delay_sec: int = DELAY_SEC,
+    session: requests.Session = None,
+    limiter: TokenBucket = None,
+    on_error=None,
+    stats: dict | None = None,
+    response_cache: ResponseCache = None,
+):
+    """
+    Do a GET with minimal retry on network errors or non-200 responses.
+    Returns (json_dict, status_code). On total failure returns (None, status_code_or_None).
+
+    session:  reuse a pooled requests.Session (keep-alive) instead of a fresh connection.
+    limiter:  TokenBucket acquired before every attempt.
+    on_error: called as on_error(title=..., message=...) per failed attempt;
+              defaults to frappe.log_error (pass a collector when running off the main thread).
+    stats:    if given, filled with "attempts" and "latency" (seconds spent in HTTP calls);
+              "not_modified" is set when the body came from `response_cache`.
+    response_cache: send conditional requests (If-None-Match / If-Modified-Since) and
+              answer a 304 with the cached body.
+    """
+    on_error = on_error or frappe.log_error
+    stats = stats if stats is not None else {}
+    stats.update(attempts=0, latency=0.0)
+    http = session or requests
+    cache_key = response_cache.key(url, params) if response_cache else None
+    last_status = None
+    for attempt in range(1, retries + 1):
+        if limiter:
+            limiter.acquire()
+        stats["attempts"] = attempt
+        started = time.perf_counter()
+        try:
+            headers = response_cache.headers(cache_key) if response_cache else None
+            resp = http.get(url, params=params, headers=headers, timeout=15)
+            _record_attempt(stats, started, resp.status_code)
+            last_status = resp.status_code
+            cached = response_cache.get(cache_key) if response_cache and resp.status_code == 304 else None
+            if cached is not None:
+                stats["not_modified"] = True
+                return cached, 200
+            if resp.status_code == 200:
+                data = resp.json()
+                if response_cache:
+                    response_cache.put(cache_key, resp.headers, data)
+                return data, 200
+            else:
+                on_error(
+                    title="Exchange Rate Sync: API non-200",
+                    message=f"Attempt={attempt}\nParams={params}\nStatus={resp.status_code}\nBody={resp.text[:2000]}"
+                )
+        except requests.exceptions.RequestException as e:
+            _record_attempt(stats, started, None)
+            on_error(
+                title="Exchange Rate Sync: RequestException",
+                message=f"Attempt={attempt}\nParams={params}\nError={e}"
+            )
+            last_status = None
+
+        if attempt < retries:
+            metrics.inc("api_retries_total", status=last_status or "error")
+            time.sleep(delay_sec)
+
+    return None, last_status
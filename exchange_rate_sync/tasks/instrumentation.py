@@ -0,0 +1,111 @@
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import flt, now_datetime
+
+from . import metrics
+
+SYNC_RUN = "Exchange Rate Sync Run"
+
+
+class SyncRunLog:
+    """
+    Timings and counters of one sync run, stored as an Exchange Rate Sync Run record.
+
+        run = SyncRunLog.start(fetch_strategy="Per Base")
+        with run.timed("fetch"):
+            ...
+        run.record_request("EUR", status=200, latency=0.21, attempts=1)
+        run.finish("Success", message, write_stats)
+
+    Storing the log never fails the sync: errors are only logged.
+    """
+
+    def __init__(self, **fields):
+        self.fields = fields
+        self.stage_times = {}
+        self.requests = {}
+        self.started = time.perf_counter()
+        self.started_at = now_datetime()
+        self.name = None
+
+    @classmethod
+    def start(cls, **fields) -> "SyncRunLog":
+        """Create the run record (status Running) right away so stuck runs are visible."""
+        run = cls(**fields)
+        try:
+            doc = frappe.get_doc({
+                "doctype": SYNC_RUN,
+                "status": "Running",
+                "started_at": run.started_at,
+                **fields,
+            }).insert(ignore_permissions=True)
+            frappe.db.commit()
+            run.name = doc.name
+        except Exception as e:
+            frappe.log_error("Exchange Rate Sync", f"Could not create {SYNC_RUN}: {e}")
+        return run
+
+    @property
+    def api_requests(self) -> int:
+        """HTTP attempts made so far."""
+        return sum(r["attempts"] for r in self.requests.values())
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Add the wall time of the block to `stage` (seconds)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_times[stage] = self.stage_times.get(stage, 0) + time.perf_counter() - start
+
+    def record_request(self, key: str, status, latency: float, attempts: int):
+        """One provider call (all its attempts) for a base currency or other key."""
+        self.requests[key] = {"status": status, "latency": flt(latency), "attempts": attempts or 0}
+
+    def finish(self, status: str, message: str | None = None, write_stats: dict | None = None, **fields):
+        write_stats = write_stats or {}
+        values = {
+            "status": status,
+            "started_at": self.started_at,
+            "ended_at": now_datetime(),
+            "duration": flt(time.perf_counter() - self.started, 3),
+            "api_requests": self.api_requests,
+            "retries": sum(max(r["attempts"] - 1, 0) for r in self.requests.values()),
+            "bases_succeeded": sum(1 for r in self.requests.values() if r["status"] == 200),
+            "bases_failed": sum(1 for r in self.requests.values() if r["status"] != 200),
+            "fetch_time": flt(self.stage_times.get("fetch"), 3),
+            "cross_time": flt(self.stage_times.get("cross"), 3),
+            "write_time": flt(self.stage_times.get("write"), 3),
+            "publish_time": flt(self.stage_times.get("publish"), 3),
+            "rows_inserted": write_stats.get("inserted", 0),
+            "rows_updated": write_stats.get("updated", 0),
+            "rows_unchanged": write_stats.get("unchanged", 0),
+            "rows_failed": write_stats.get("failed", 0),
+            "message": message,
+            **self.fields,
+            **fields,
+        }
+        try:
+            doc = frappe.get_doc(SYNC_RUN, self.name) if self.name else frappe.new_doc(SYNC_RUN)
+            doc.update(values)
+            doc.set("provider_requests", [
+                {
+                    "request_key": key,
+                    "http_status": r["status"] or 0,
+                    "latency_ms": flt(r["latency"] * 1000, 1),
+                    "attempts": r["attempts"],
+                }
+                for key, r in self.requests.items()
+            ])
+            doc.save(ignore_permissions=True)
+            frappe.db.commit()
+        except Exception as e:
+            frappe.log_error("Exchange Rate Sync", f"Could not save {SYNC_RUN}: {e}")
+
+        metrics.observe("run_duration_seconds", values["duration"], metrics.DURATION_BUCKETS)
+        metrics.observe("run_rows_written", values["rows_inserted"] + values["rows_updated"], metrics.ROWS_BUCKETS)
+        metrics.inc("runs_total", status=status)
+        metrics.flush()
@@ -0,0 +1,143 @@
+import threading
+import time
+
+import frappe
+
+METRICS_KEY = "exchange_rate_sync:metrics"
+METRIC_PREFIX = "exchange_rate_sync_"
+FLUSH_INTERVAL_SEC = 10   # web workers push their buffered counters at most this often
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15)
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800)
+ROWS_BUCKETS = (0, 10, 100, 500, 1000, 5000, 10000, 50000)
+
+METRICS = {  # name: (type, help)
+    "api_request_duration_seconds": ("histogram", "Latency of provider HTTP requests (per attempt)."),
+    "api_requests_total": ("counter", "Provider HTTP requests by response status (per attempt)."),
+    "api_retries_total": ("counter", "Provider HTTP attempts that failed and were retried, by status."),
+    "provider_answers_total": ("counter", "Accepted answers per rate provider when several are configured."),
+    "rows_written_total": ("counter", "Currency Exchange rows by write result."),
+    "run_rows_written": ("histogram", "Rows inserted or updated per sync run."),
+    "run_duration_seconds": ("histogram", "Wall time of sync runs."),
+    "runs_total": ("counter", "Sync runs by final status."),
+    "writes_skipped_total": ("counter", "Sync runs that wrote nothing because the provider data was unchanged."),
+    "last_success_timestamp_seconds": ("gauge", "Unix time rates for a base currency were last written."),
+    "cache_requests_total": ("counter", "get_rate lookups by snapshot cache result."),
+    "cache_hit_ratio": ("gauge", "Share of get_rate lookups served from the snapshot cache."),
+    "errors_total": ("counter", "Errors collected during sync and backfill runs."),
+    "error_logs_suppressed_total": ("counter", "Error summaries not written because the hourly Error Log cap was reached."),
+}
+
+# Buffered in-process per site and pushed to Redis by flush(); safe to call from fetch worker threads
+_pending = {}     # site -> {series: increment}
+_gauges = {}      # site -> {series: value}
+_last_flush = {}  # site -> time.monotonic() of its last flush
+_pending_lock = threading.Lock()
+_thread = threading.local()
+
+
+def bind_site(site: str):
+    """Record the calling thread's metrics for `site`. Initializer of worker thread pools, which have no frappe.local."""
+    _thread.site = site
+
+
+def current_site() -> str:
+    return getattr(_thread, "site", None) or getattr(frappe.local, "site", None)
+
+
+def _series(name: str, labels: dict | None = None) -> str:
+    if not labels:
+        return METRIC_PREFIX + name
+    label_str = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return f"{METRIC_PREFIX}{name}{{{label_str}}}"
+
+
+def inc(name: str, value: float = 1, **labels):
+    series = _series(name, labels)
+    with _pending_lock:
+        pending = _pending.setdefault(current_site(), {})
+        pending[series] = pending.get(series, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    with _pending_lock:
+        _gauges.setdefault(current_site(), {})[_series(name, labels)] = value
+
+
+def observe(name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+    """Histogram observation: cumulative le buckets plus _sum and _count."""
+    with _pending_lock:
+        pending = _pending.setdefault(current_site(), {})
+        for le in (*buckets, "+Inf"):
+            if le == "+Inf" or value <= le:
+                series = _series(name + "_bucket", {**labels, "le": le})
+                pending[series] = pending.get(series, 0) + 1
+        for suffix, inc_by in (("_sum", value), ("_count", 1)):
+            series = _series(name + suffix, labels)
+            pending[series] = pending.get(series, 0) + inc_by
+
+
+def flush(max_age: float | None = None):
+    """
+    Push the current site's buffered metrics to Redis (one pipeline).
+    With max_age, only flush if the site's last flush is older than that many seconds.
+    """
+    site = frappe.local.site
+    now = time.monotonic()
+    with _pending_lock:
+        if max_age is not None and now - _last_flush.setdefault(site, now) < max_age:
+            return
+        pending = _pending.pop(site, {})
+        gauges = _gauges.pop(site, {})
+        _last_flush[site] = now
+    if not pending and not gauges:
+        return
+
+    cache = frappe.cache()
+    key = cache.make_key(METRICS_KEY)
+    try:
+        pipe = cache.pipeline()
+        for series, value in pending.items():
+            pipe.hincrbyfloat(key, series, value)
+        for series, value in gauges.items():
+            pipe.hset(key, series, value)
+        pipe.execute()
+    except Exception as e:
+        frappe.log_error("Exchange Rate Sync: metrics", f"Could not store metrics: {e}")
+
+
+def _base_name(series: str) -> str:
+    name = series.split("{", 1)[0][len(METRIC_PREFIX):]
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and METRICS.get(name[:-len(suffix)], ("",))[0] == "histogram":
+            return name[:-len(suffix)]
+    return name
+
+
+def _format(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render() -> str:
+    """All stored metrics in the Prometheus text exposition format (version 0.0.4)."""
+    flush()
+    cache = frappe.cache()
+    stored = cache.pipeline().hgetall(cache.make_key(METRICS_KEY)).execute()[0] or {}
+    values = {k.decode(): float(v) for k, v in stored.items()}
+
+    hits = values.get(_series("cache_requests_total", {"result": "hit"}), 0)
+    misses = values.get(_series("cache_requests_total", {"result": "miss"}), 0)
+    if hits + misses:
+        values[_series("cache_hit_ratio")] = hits / (hits + misses)
+
+    by_name = {}
+    for series in sorted(values):
+        by_name.setdefault(_base_name(series), []).append(series)
+
+    lines = []
+    for name, series_list in by_name.items():
+        metric_type, help_text = METRICS.get(name, ("untyped", ""))
+        lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} {metric_type}")
+        lines.extend(f"{series} {_format(values[series])}" for series in series_list)
+    return "\n".join(lines) + "\n"
@@ -1,26 +1,117 @@
-
+import time
 
 import frappe
-from frappe.utils import nowdate, add_days
+from frappe.utils import add_days, cint, get_last_day, getdate, nowdate
 
-def delete_currency_exchange_monthly():
-    if frappe.get_doc("Exchange Rate Config", "Exchange Rate Config").enabled == 0:
-        frappe.log_error("Exchange Rate Sync", "sync not enabled")
-        return "Exchange rate sync is disabled in Exchange Rate Config"
+from .asof import invalidate_history
+from .snapshots import purge_snapshots
+
+DEFAULT_RETENTION_DAYS = 1        # keep today and yesterday, as the original monthly cleanup did
+DEFAULT_PURGE_BATCH_SIZE = 5000   # rows deleted (and committed) per statement
+
+KEEP_MONTH_END = "Month End"
+KEEP_YEAR_END = "Year End"
+
+
+def _is_period_end(date, keep: str) -> bool:
+    date = getdate(date)
+    if keep == KEEP_MONTH_END:
+        return date == get_last_day(date)
+    if keep == KEEP_YEAR_END:
+        return date.month == 12 and date.day == 31
+    return False
 
-    try:
-        # Calculate the date before yesterday
-        yesterday = add_days(nowdate(), -1)
 
-        # Delete all records with a date less than yesterday (i.e., before yesterday)
-        frappe.db.delete(
+def purge_currency_exchange(retention_days: int | None = None, batch_size: int | None = None, keep_period_end: str | None = None,
+                            filters: list | None = None) -> dict:
+    """
+    Delete Currency Exchange rows dated before today - retention_days.
+
+    Rows are walked in primary-key order and deleted in batches of `batch_size`
+    with a commit after every batch, so no single statement locks the table or
+    grows the undo log unboundedly. With keep_period_end set to "Month End" or
+    "Year End", rates on those dates are kept for revaluation. `filters`
+    ([[field, operator, value], ...]) narrows the rows considered.
+
+    Returns {"purged": n, "kept": n, "cutoff": date, "seconds": elapsed}.
+    """
+    retention_days = max(cint(retention_days) if retention_days is not None else DEFAULT_RETENTION_DAYS, 0)
+    batch_size = cint(batch_size) or DEFAULT_PURGE_BATCH_SIZE
+    cutoff = add_days(nowdate(), -retention_days)
+
+    started = time.monotonic()
+    purged = kept = 0
+    last_name = ""
+
+    while True:
+        rows = frappe.get_all(
             "Currency Exchange",
-            filters={
-                "date": ("<", yesterday)
-            }
+            filters=[["date", "<", cutoff], ["name", ">", last_name], *(filters or [])],
+            fields=["name", "date"],
+            order_by="name asc",
+            limit=batch_size,
         )
-        frappe.db.commit()
-        frappe.logger().info("Deleted Currency Exchange records older than yesterday.")
+        if not rows:
+            break
+
+        last_name = rows[-1].name
+        names = [r.name for r in rows if not _is_period_end(r.date, keep_period_end)]
+        kept += len(rows) - len(names)
+
+        if names:
+            frappe.db.delete("Currency Exchange", filters={"name": ("in", names)})
+            frappe.db.commit()
+            purged += len(names)
+
+    return {"purged": purged, "kept": kept, "cutoff": cutoff, "seconds": round(time.monotonic() - started, 3)}
 
-    except Exception as e:
+
+def _run_purge(cfg) -> str:
+    try:
+        result = purge_currency_exchange(
+            retention_days=cfg.get("retention_days"),
+            batch_size=cfg.get("purge_batch_size"),
+            keep_period_end=cfg.get("keep_period_end_rates"),
+        )
+    except Exception:
+        frappe.db.rollback()
         frappe.log_error(frappe.get_traceback(), "Exchange Rate Cleanup Failed")
+        return "Exchange rate cleanup failed (check logs)"
+
+    try:
+        keep = cfg.get("keep_period_end_rates")
+        snapshots = purge_snapshots(result["cutoff"], keep=lambda date: _is_period_end(date, keep))
+        frappe.db.commit()
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Exchange Rate Snapshot Cleanup Failed")
+        snapshots = 0
+    invalidate_history()
+
+    msg = (
+        f"Deleted {result['purged']} Currency Exchange records older than {result['cutoff']} "
+        f"in {result['seconds']}s ({result['kept']} period-end records kept) and {snapshots} rate snapshots."
+    )
+    frappe.logger().info(msg)
+    return msg
+
+
+def delete_currency_exchange_monthly():
+    cfg = frappe.get_doc("Exchange Rate Config", "Exchange Rate Config")
+    if cfg.enabled == 0:
+        frappe.log_error("Exchange Rate Sync", "sync not enabled")
+        return "Exchange rate sync is disabled in Exchange Rate Config"
+
+    if cfg.get("purge_daily"):
+        # already purged by the daily job
+        return "Exchange rate cleanup runs daily"
+
+    return _run_purge(cfg)
+
+
+def delete_currency_exchange_daily():
+    cfg = frappe.get_doc("Exchange Rate Config", "Exchange Rate Config")
+    if cfg.enabled == 0 or not cfg.get("purge_daily"):
+        return
+
+    return _run_purge(cfg)
@@ -0,0 +1,103 @@
+import math
+import time
+
+import frappe
+from frappe.utils import cint
+
+FETCH_PER_BASE = "Per Base"
+FETCH_SINGLE_USD = "Single USD Fetch"
+
+USAGE_CACHE_KEY = "exchange_rate_sync:usage"
+USAGE_TTL_SEC = 60 * 60   # usage.json is re-read at most this often; runs in between count locally
+DAY_SEC = 24 * 60 * 60
+
+
+def get_usage(provider, refresh: bool = False):
+    """
+    The provider's usage block (requests, requests_quota, requests_remaining,
+    days_elapsed, days_remaining, ...), cached in Redis for USAGE_TTL_SEC.
+    None when the provider does not report usage or the call failed.
+    """
+    cache = frappe.cache()
+    usage = None if refresh else cache.get_value(USAGE_CACHE_KEY, expires=True)
+    if usage and time.time() - usage.get("fetched_at", 0) < USAGE_TTL_SEC:
+        return usage
+
+    data, status = provider.usage()
+    usage = (data or {}).get("usage") if status == 200 else None
+    if not usage:
+        return None
+    usage = {**usage, "fetched_at": time.time()}
+    cache.set_value(USAGE_CACHE_KEY, usage, expires_in_sec=2 * USAGE_TTL_SEC)
+    return usage
+
+
+def record_spent(requests: int):
+    """Count a run's requests against the cached usage until usage.json is read again."""
+    cache = frappe.cache()
+    usage = cache.get_value(USAGE_CACHE_KEY, expires=True)
+    if not usage or not requests or usage.get("requests_remaining") is None:
+        return
+    usage["requests"] = cint(usage.get("requests")) + requests
+    usage["requests_remaining"] = max(cint(usage["requests_remaining"]) - requests, 0)
+    cache.set_value(USAGE_CACHE_KEY, usage, expires_in_sec=2 * USAGE_TTL_SEC)
+
+
+def remaining_quota(usage) -> tuple:
+    """(requests_remaining, days_until_reset), or (None, None) when unknown or unlimited."""
+    if not usage or cint(usage.get("requests_quota", -1)) < 0 or usage.get("requests_remaining") is None:
+        return None, None
+    return cint(usage["requests_remaining"]), max(cint(usage.get("days_remaining")), 1)
+
+
+def run_costs(base_currencies: list, target_currencies: list) -> dict:
+    """API requests one sync run needs per fetch strategy."""
+    return {
+        FETCH_PER_BASE: sum(1 for b in base_currencies if any(t != b for t in target_currencies)),
+        FETCH_SINGLE_USD: 1,
+    }
+
+
+def plan_run(cfg, provider, base_currencies: list, target_currencies: list, interval_sec: int) -> dict:
+    """
+    Pick the cheapest way to run a sync that keeps the monthly quota alive until it resets.
+
+    The remaining requests are spread evenly over the days left; when the configured
+    strategy would spend more per day at the configured frequency than that budget,
+    "Single USD Fetch" (one request per run) is used instead. `min_interval` is the
+    shortest spacing of scheduled runs the budget allows, and `skip` is set when
+    the quota cannot pay for even one more run.
+
+    Returns {"strategy", "cost", "skip", "min_interval", "remaining", "reason"}.
+    """
+    strategy = cfg.get("fetch_strategy") or FETCH_PER_BASE
+    costs = run_costs(base_currencies, target_currencies)
+    plan = {"strategy": strategy, "cost": costs[strategy], "skip": False, "min_interval": 0,
+            "remaining": None, "reason": None}
+    if not cfg.get("respect_quota"):
+        return plan
+
+    remaining, days_left = remaining_quota(get_usage(provider))
+    if remaining is None:
+        return plan
+
+    plan["remaining"] = remaining
+    daily_budget = remaining / days_left
+    runs_per_day = DAY_SEC / max(cint(interval_sec), 1)
+
+    if strategy == FETCH_PER_BASE and costs[FETCH_PER_BASE] > 1 \
+            and costs[FETCH_PER_BASE] * runs_per_day > daily_budget:
+        plan.update(
+            strategy=FETCH_SINGLE_USD,
+            cost=costs[FETCH_SINGLE_USD],
+            reason=(
+                f"{remaining} API requests left for {days_left} days: using Single USD Fetch "
+                f"instead of {costs[FETCH_PER_BASE]} requests per run."
+            ),
+        )
+
+    if remaining < plan["cost"]:
+        plan.update(skip=True, reason=f"API quota used up ({remaining} requests left); skipping the sync.")
+    elif daily_budget < plan["cost"] * runs_per_day:
+        plan["min_interval"] = math.ceil(DAY_SEC * plan["cost"] / daily_budget)
+    return plan
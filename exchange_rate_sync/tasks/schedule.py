@@ -0,0 +1,118 @@
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import cint, get_datetime, getdate, now, now_datetime
+from frappe.utils.background_jobs import get_job_status, is_job_enqueued
+
+SYNC_INTERVALS = {  # seconds between scheduled syncs per 'Sync Frequency'
+    "Daily": 24 * 60 * 60,
+    "Hourly": 60 * 60,
+    "Every 30 Minutes": 30 * 60,
+    "Every 15 Minutes": 15 * 60,
+    "Every 5 Minutes": 5 * 60,
+}
+DEFAULT_FREQUENCY = "Daily"
+SCHEDULER_GRACE_SEC = 60          # cron ticks and run time drift; don't skip a tick for a few seconds
+
+SYNC_LOCK_KEY = "exchange_rate_sync:sync_lock"
+DEFAULT_LOCK_TIMEOUT_SEC = 60 * 60  # a crashed run can't hold the lock longer than this
+
+SYNC_JOB_ID = "exchange_rate_sync:sync"
+SYNC_PROGRESS_KEY = "exchange_rate_sync:sync_progress"
+DEFAULT_SYNC_QUEUE = "long"         # override with "exchange_rate_sync_queue" in site config
+DEFAULT_JOB_TIMEOUT_SEC = 30 * 60
+
+
+def sync_interval(frequency: str | None = None) -> int:
+    return SYNC_INTERVALS.get(frequency or DEFAULT_FREQUENCY, SYNC_INTERVALS[DEFAULT_FREQUENCY])
+
+
+def is_sync_due(frequency: str, last_sync_at=None, trading_days_only: bool = False, at=None,
+                min_interval_sec: int = 0) -> bool:
+    """
+    Whether a scheduled sync should run now.
+    Daily runs once per calendar day; shorter frequencies run once their interval has passed.
+    With trading_days_only, nothing runs on Saturdays and Sundays.
+    min_interval_sec spaces runs out further than the frequency (quota throttling).
+    """
+    at = get_datetime(at) if at else now_datetime()
+    if trading_days_only and at.weekday() >= 5:
+        return False
+    if not last_sync_at:
+        return True
+
+    last_sync_at = get_datetime(last_sync_at)
+    if min_interval_sec and (at - last_sync_at).total_seconds() < min_interval_sec - SCHEDULER_GRACE_SEC:
+        return False
+    if (frequency or DEFAULT_FREQUENCY) == "Daily":
+        return getdate(last_sync_at) < getdate(at)
+    return (at - last_sync_at).total_seconds() >= sync_interval(frequency) - SCHEDULER_GRACE_SEC
+
+
+@contextmanager
+def sync_lock(timeout: int = DEFAULT_LOCK_TIMEOUT_SEC):
+    """
+    Site-wide Redis lock so sync runs never overlap (scheduler ticks, button clicks).
+    Yields True if the lock was acquired; the lock expires after `timeout` seconds
+    even if the holder dies.
+    """
+    cache = frappe.cache()
+    key = cache.make_key(SYNC_LOCK_KEY)
+    token = frappe.generate_hash(length=12)
+    acquired = bool(cache.set(key, token, nx=True, ex=max(cint(timeout), 1)))
+    try:
+        yield acquired
+    finally:
+        if acquired and (cache.get(key) or b"").decode() == token:
+            cache.delete(key)
+
+
+def sync_queue() -> str:
+    """Queue the sync runs on; a dedicated worker queue can be set in site config."""
+    return frappe.conf.get("exchange_rate_sync_queue") or DEFAULT_SYNC_QUEUE
+
+
+def enqueue_sync(deadline_sec: int | None = None) -> dict:
+    """
+    Enqueue get_currency_exchange as a background job and return at once.
+    Deduplicated by job id: while a sync is queued or running no second one is added.
+    Returns {"job_id": ..., "enqueued": bool}.
+    """
+    if is_job_enqueued(SYNC_JOB_ID):
+        return {"job_id": SYNC_JOB_ID, "enqueued": False}
+
+    deadline_sec = cint(deadline_sec)
+    set_sync_progress(status="queued", stage=None, done=0, total=0, bases={}, message=None, queued_at=now())
+    frappe.enqueue(
+        "exchange_rate_sync.tasks.daily.get_currency_exchange",
+        queue=sync_queue(),
+        timeout=deadline_sec + 5 * 60 if deadline_sec > 0 else DEFAULT_JOB_TIMEOUT_SEC,
+        job_id=SYNC_JOB_ID,
+        deduplicate=True,
+        deadline_sec=deadline_sec or None,
+    )
+    return {"job_id": SYNC_JOB_ID, "enqueued": True}
+
+
+def set_sync_progress(**fields):
+    """Merge `fields` into the progress record of the current/last sync run."""
+    cache = frappe.cache()
+    progress = cache.get_value(SYNC_PROGRESS_KEY, expires=True) or {}
+    progress.update(fields)
+    cache.set_value(SYNC_PROGRESS_KEY, progress, expires_in_sec=24 * 60 * 60)
+
+
+def get_sync_progress() -> dict:
+    """Progress record of the current/last sync run."""
+    return frappe.cache().get_value(SYNC_PROGRESS_KEY, expires=True) or {}
+
+
+def get_sync_status() -> dict:
+    """Progress of the current/last sync run plus the background job's state."""
+    progress = get_sync_progress()
+    try:
+        job_status = get_job_status(SYNC_JOB_ID)
+    except Exception:
+        job_status = None
+    job_status = getattr(job_status, "value", job_status)   # rq JobStatus enum -> "queued", "failed", ...
+    return {**progress, "job_id": SYNC_JOB_ID, "job_status": str(job_status) if job_status else None}
@@ -0,0 +1,139 @@
+import json
+import math
+
+import frappe
+from frappe.utils import cint, flt, getdate
+
+from .writer import RATE_PRECISION
+
+RATE_SNAPSHOT = "Exchange Rate Snapshot"
+STORAGE_ROWS = "Currency Exchange Rows"
+STORAGE_COMPACT = "Compact Snapshot"
+
+
+def pack_rates(usd_rates: dict) -> str:
+    """Serialize a USD->currency vector: valid rates only, fixed precision, sorted keys."""
+    rates = {}
+    for currency, rate in usd_rates.items():
+        rate = flt(rate)
+        if currency != "USD" and rate > 0 and math.isfinite(rate):
+            rates[currency] = flt(rate, RATE_PRECISION)
+    return json.dumps(rates, sort_keys=True, separators=(",", ":"))
+
+
+def unpack_rates(packed: str) -> dict:
+    """USD->currency vector of a stored snapshot, including USD itself."""
+    return {**json.loads(packed or "{}"), "USD": 1.0}
+
+
+def usd_vector(rates_by_base: dict) -> dict:
+    """
+    Merge base->* answers ({base: {currency: rate}}) into one USD->currency vector.
+    A USD answer is used as is; any other base contributes when it quotes USD:
+      USD->c = (base->c) / (base->USD)
+    """
+    vector = dict(rates_by_base.get("USD") or {})
+    for base, rates in rates_by_base.items():
+        base_usd = flt(rates.get("USD"))
+        if base == "USD" or base_usd <= 0:
+            continue
+        vector.setdefault(base, 1 / base_usd)
+        for currency, rate in rates.items():
+            vector.setdefault(currency, flt(rate) / base_usd)
+    vector["USD"] = 1.0
+    return vector
+
+
+def store_snapshot(date_str: str, usd_rates: dict, source: str | None = None) -> str:
+    """
+    Insert or update the snapshot row of `date_str`. Currencies missing from `usd_rates`
+    keep the rate stored earlier that day. Does not commit.
+    Returns "inserted", "updated" or "unchanged".
+    """
+    existing = frappe.db.get_value(RATE_SNAPSHOT, {"date": date_str}, ["name", "rates"], as_dict=True)
+    rates = {**unpack_rates(existing.rates), **usd_rates} if existing else usd_rates
+    packed = pack_rates(rates)
+    values = {"rates": packed, "currency_count": len(json.loads(packed)), "source": source}
+
+    if existing and existing.rates == packed:
+        return "unchanged"
+    if existing:
+        frappe.db.set_value(RATE_SNAPSHOT, existing.name, values)
+        return "updated"
+    frappe.get_doc({"doctype": RATE_SNAPSHOT, "date": date_str, "base": "USD", **values}).insert(
+        ignore_permissions=True
+    )
+    return "inserted"
+
+
+def load_snapshot(date=None) -> tuple:
+    """(snapshot date, USD->currency vector) of the latest snapshot on or before `date`; (None, {}) if none."""
+    row = frappe.db.get_value(
+        RATE_SNAPSHOT,
+        {"date": ("<=", str(getdate(date)))},
+        ["date", "rates"],
+        as_dict=True,
+        order_by="date desc",
+    )
+    if not row:
+        return None, {}
+    return row.date, unpack_rates(row.rates)
+
+
+def resolve(from_currency: str, to_currency: str, date=None) -> tuple:
+    """
+    (snapshot date, rate) for from_currency -> to_currency from the latest snapshot
+    on or before `date`:  rate = (USD->to) / (USD->from).  The rate is None when
+    either currency is missing from that snapshot.
+    """
+    snapshot_date, rates = load_snapshot(date)
+    from_rate, to_rate = flt(rates.get(from_currency)), flt(rates.get(to_currency))
+    if from_rate <= 0 or to_rate <= 0:
+        return snapshot_date, None
+    return snapshot_date, to_rate / from_rate
+
+
+def company_currencies() -> list:
+    return [c for c in frappe.get_all("Company", pluck="default_currency", distinct=True) if c]
+
+
+def materialized_pairs(currencies: list) -> set:
+    """
+    Pairs ERPNext looks up as Currency Exchange rows in compact mode: every
+    currency to and from a company's default currency.
+    """
+    pairs = set()
+    for company_currency in company_currencies():
+        for currency in currencies:
+            if currency != company_currency:
+                pairs.add((currency, company_currency))
+                pairs.add((company_currency, currency))
+    return pairs
+
+
+def is_compact(cfg) -> bool:
+    return cfg.get("storage_mode") == STORAGE_COMPACT
+
+
+def materialize(cfg, rows: dict) -> dict:
+    """
+    The subset of {(date, from, to): rate} rows to write as Currency Exchange records
+    in compact mode: the company currency pairs, or none at all.
+    """
+    if not cint(cfg.get("materialize_company_pairs")):
+        return {}
+    currencies = {c for _, from_currency, to_currency in rows for c in (from_currency, to_currency)}
+    pairs = materialized_pairs(list(currencies))
+    return {key: rate for key, rate in rows.items() if (key[1], key[2]) in pairs}
+
+
+def purge_snapshots(cutoff, keep=None) -> int:
+    """Delete snapshots dated before `cutoff`; `keep(date)` returning True spares a snapshot. Does not commit."""
+    names = [
+        row.name
+        for row in frappe.get_all(RATE_SNAPSHOT, filters={"date": ("<", cutoff)}, fields=["name", "date"])
+        if not (keep and keep(row.date))
+    ]
+    if names:
+        frappe.db.delete(RATE_SNAPSHOT, filters={"name": ("in", names)})
+    return len(names)
@@ -0,0 +1,92 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import getdate
+
+from exchange_rate_sync.tasks import asof, cache
+from exchange_rate_sync.tasks.test_writer import make_rate
+from exchange_rate_sync.tasks.writer import CURRENCY_EXCHANGE
+
+
+def make_history():
+	"""Rates in January 2001, well before any real ones on a test site."""
+	make_rate("2001-01-01", "USD", "EUR", 0.5)
+	make_rate("2001-01-01", "USD", "GBP", 0.25)
+	make_rate("2001-01-03", "EUR", "GBP", 0.6)
+
+
+def ordinal(date):
+	return getdate(date).toordinal()
+
+
+class TestRateAsOf(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		make_history()
+
+	def setUp(self):
+		asof._sites.pop(frappe.local.site, None)   # drop an index loaded before the rows existed
+
+	def test_rate_of_the_nearest_earlier_date(self):
+		self.assertAlmostEqual(asof.rate_as_of("USD", "EUR", "2001-01-01"), 0.5)
+		self.assertAlmostEqual(asof.rate_as_of(" usd", "eur ", "2001-01-05"), 0.5)
+		self.assertAlmostEqual(asof.rate_as_of("EUR", "GBP", "2001-01-05"), 0.6)
+
+	def test_no_rate_before_the_first_date(self):
+		self.assertIsNone(asof.rate_as_of("USD", "EUR", "2000-12-31"))
+
+	def test_max_age(self):
+		self.assertIsNone(asof.rate_as_of("USD", "EUR", "2001-01-09"))
+		self.assertAlmostEqual(asof.rate_as_of("USD", "EUR", "2001-01-09", max_age_days=10), 0.5)
+
+	def test_same_currency(self):
+		self.assertEqual(asof.rate_as_of("EUR", "EUR", "2001-01-09"), 1.0)
+
+
+class TestRateSides(FrappeTestCase):
+	"""Buying and Selling rows of February 2001, and hand edits to them."""
+
+	def setUp(self):
+		asof._sites.pop(frappe.local.site, None)
+		self.buying = make_rate("2001-02-01", "USD", "EUR", 0.5, for_buying=1, for_selling=0)
+		self.selling = make_rate("2001-02-01", "USD", "EUR", 0.6, for_buying=0, for_selling=1)
+		self.gbp = make_rate("2001-02-01", "USD", "GBP", 0.25)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_buying_and_selling_are_kept_apart(self):
+		self.assertAlmostEqual(asof.rate_as_of("USD", "EUR", "2001-02-02", side="for_buying"), 0.5)
+		self.assertAlmostEqual(asof.rate_as_of("USD", "EUR", "2001-02-02", side="for_selling"), 0.6)
+		# no side: the first row of the date, as before
+		self.assertAlmostEqual(asof.rate_as_of("USD", "EUR", "2001-02-02"), 0.5)
+		# a row valid for both sides counts for either
+		self.assertAlmostEqual(asof.rate_as_of("USD", "GBP", "2001-02-02", side="for_selling"), 0.25)
+
+	def test_edited_row_invalidates_its_pair_only(self):
+		self.assertAlmostEqual(asof.rate_as_of("USD", "EUR", "2001-02-02", side="for_selling"), 0.6)
+		asof.rate_as_of("USD", "GBP", "2001-02-02")
+
+		doc = frappe.get_doc(CURRENCY_EXCHANGE, self.selling)
+		doc.exchange_rate = 0.7
+		doc.save(ignore_permissions=True)   # on_update: on_currency_exchange_change
+
+		pairs = asof._site_state()["pairs"]
+		self.assertNotIn(("USD", "EUR", "for_selling"), pairs)
+		self.assertIn(("USD", "GBP", None), pairs)
+		self.assertAlmostEqual(asof.rate_as_of("USD", "EUR", "2001-02-02", side="for_selling"), 0.7)
+
+	def test_edited_row_is_dropped_from_the_published_rates(self):
+		date = "2001-02-01"
+		self.addCleanup(frappe.cache().delete_value, cache._version_key(date))
+		cache.activate_snapshot(cache.stage_snapshot({(date, "USD", "GBP"): 0.25, (date, "USD", "INR"): 80.0}))
+		self.assertEqual(cache.get_rate("USD", "GBP", date), 0.25)
+
+		doc = frappe.get_doc(CURRENCY_EXCHANGE, self.gbp)
+		doc.exchange_rate = 0.3
+		doc.save(ignore_permissions=True)
+		self.assertEqual(cache.get_rate("USD", "GBP", date), 0.3)
+		self.assertEqual(cache.get_rate("USD", "INR", date), 80.0)
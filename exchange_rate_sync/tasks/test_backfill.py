@@ -0,0 +1,80 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from exchange_rate_sync.providers import RateProvider
+from exchange_rate_sync.tasks import backfill
+from exchange_rate_sync.tasks.test_writer import get_rate
+
+
+class FlakyProvider(RateProvider):
+	"""Historical USD rates for any date, except those in `failing` (answered with a 500)."""
+
+	name = "Flaky"
+	requires_api_key = False
+
+	def __init__(self, failing=()):
+		super().__init__({"time-series": False})
+		self.failing = set(failing)
+
+	def historical(self, date, base="USD", symbols=None, **http):
+		if date in self.failing:
+			return None, 500
+		return {"base": "USD", "rates": {"EUR": 0.5, "GBP": 0.25}}, 200
+
+
+class TestRunBackfill(FrappeTestCase):
+	"""Backfills January 2004, well before any real rates on a test site."""
+
+	def setUp(self):
+		cfg = frappe.get_doc("Exchange Rate Config")
+		cfg.update({
+			"enabled": 1,
+			"storage_mode": "Currency Exchange Rows",
+			"cross_rate_conversion": 0,
+			"from_currency_table": [{"from_currency": "USD"}, {"from_currency": "EUR"}],
+			"to_currency_table": [{"to_currency": "EUR"}, {"to_currency": "GBP"}],
+			"backfill_from_date": "2004-01-01",
+			"backfill_to_date": "2004-01-05",
+			"backfill_checkpoint": None,
+		})
+		cfg.flags.ignore_validate = True
+		cfg.save(ignore_permissions=True)
+
+		for patcher in (
+			patch.object(backfill, "BACKFILL_CHUNK_DAYS", 2),
+			patch.object(frappe.local.db, "commit"),   # keep everything in the test transaction
+		):
+			patcher.start()
+			self.addCleanup(patcher.stop)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def run_with(self, provider):
+		with patch.object(backfill, "get_provider", return_value=provider):
+			return backfill.run_backfill()
+
+	def checkpoint(self):
+		return str(frappe.db.get_single_value("Exchange Rate Config", "backfill_checkpoint"))
+
+	def test_checkpoint_stops_before_a_failed_date(self):
+		msg = self.run_with(FlakyProvider(failing={"2004-01-03"}))
+		self.assertIn("4 dates written", msg)
+		self.assertIn("1 failed", msg)
+		self.assertEqual(self.checkpoint(), "2004-01-02")
+		self.assertIsNone(get_rate("2004-01-03", "USD", "EUR"))
+		self.assertEqual(get_rate("2004-01-04", "EUR", "GBP"), 0.5)
+
+	def test_resume_retries_the_failed_date(self):
+		self.run_with(FlakyProvider(failing={"2004-01-03"}))
+		msg = self.run_with(FlakyProvider())
+		self.assertIn("1 dates written", msg)
+		self.assertIn("2 already present", msg)
+		self.assertEqual(self.checkpoint(), "2004-01-05")
+		self.assertEqual(get_rate("2004-01-03", "USD", "GBP"), 0.25)
+		self.assertEqual(self.run_with(FlakyProvider()), "Backfill already complete")
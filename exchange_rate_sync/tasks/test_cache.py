@@ -0,0 +1,84 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from exchange_rate_sync.tasks import cache
+from exchange_rate_sync.tasks.test_writer import make_rate
+
+DATE = "2003-01-10"   # well before any real rates on a test site
+
+
+def publish(rows: dict):
+	cache.activate_snapshot(cache.stage_snapshot(rows))
+
+
+class TestGetRate(FrappeTestCase):
+	def setUp(self):
+		cache._local.clear()
+		frappe.cache().delete_value(cache._version_key(DATE))
+		self.addCleanup(frappe.cache().delete_value, cache._version_key(DATE))
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_published_rate_is_served(self):
+		publish({(DATE, "USD", "EUR"): 0.5})
+		self.assertEqual(cache.get_rate(" usd", "eur ", DATE), 0.5)
+		self.assertEqual(cache.get_rate("EUR", "EUR", DATE), 1.0)
+
+	def test_db_fallback_within_max_age(self):
+		make_rate("2003-01-05", "USD", "EUR", 0.5)
+		self.assertEqual(cache.get_rate("USD", "EUR", DATE, max_age_days=7), 0.5)
+		# the remembered fallback is still checked against each caller's limit
+		self.assertIsNone(cache.get_rate("USD", "EUR", DATE, max_age_days=3))
+
+	def test_stale_rate_is_not_served(self):
+		make_rate("2002-12-01", "USD", "EUR", 0.5)
+		self.assertIsNone(cache.get_rate("USD", "EUR", DATE, max_age_days=7))
+
+	def test_miss_is_not_remembered(self):
+		self.assertIsNone(cache.get_rate("USD", "GBP", DATE, max_age_days=7))
+		make_rate("2003-01-09", "USD", "GBP", 0.25)
+		self.assertEqual(cache.get_rate("USD", "GBP", DATE, max_age_days=7), 0.25)
+
+
+class TestStagedSnapshot(FrappeTestCase):
+	"""Rates of 2003-02-10 that exist in Redis only."""
+
+	date = "2003-02-10"
+
+	def setUp(self):
+		cache._local.clear()
+		frappe.cache().delete_value(cache._version_key(self.date))
+		self.addCleanup(frappe.cache().delete_value, cache._version_key(self.date))
+
+	def get_rate(self):
+		return cache.get_rate("USD", "EUR", self.date, max_age_days=0)
+
+	def stage(self, rate):
+		staged = cache.stage_snapshot({(self.date, "USD", "EUR"): rate})
+		self.addCleanup(cache.discard_snapshot, staged)
+		return staged
+
+	def test_staged_rates_are_invisible_until_activated(self):
+		staged = self.stage(0.5)
+		self.assertIsNone(self.get_rate())
+		cache.activate_snapshot(staged)
+		self.assertEqual(self.get_rate(), 0.5)
+
+	def test_activate_replaces_the_previous_version(self):
+		first = self.stage(0.5)
+		cache.activate_snapshot(first)
+		self.assertEqual(self.get_rate(), 0.5)
+
+		cache.activate_snapshot(self.stage(0.6))
+		self.assertEqual(self.get_rate(), 0.6)
+		self.assertIsNone(frappe.cache().get_value(cache._snapshot_key(self.date, first[self.date])))
+
+	def test_discard_drops_the_staged_version(self):
+		staged = self.stage(0.5)
+		cache.discard_snapshot(staged)
+		self.assertIsNone(frappe.cache().get_value(cache._snapshot_key(self.date, staged[self.date])))
+		self.assertIsNone(self.get_rate())
@@ -0,0 +1,53 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from exchange_rate_sync.tasks.convert import RateTable, convert_many
+from exchange_rate_sync.tasks.test_asof import make_history, ordinal
+
+
+class TestRateTable(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		make_history()
+
+	def setUp(self):
+		self.table = RateTable({"EUR", "GBP", "INR"}, ordinal("2001-01-01"), ordinal("2001-01-20"), 7)
+
+	def rate(self, from_currency, to_currency, date):
+		return self.table.rate(from_currency, to_currency, ordinal(date))
+
+	def test_stored_pair_and_inverse(self):
+		self.assertAlmostEqual(self.rate("USD", "EUR", "2001-01-02"), 0.5)
+		self.assertAlmostEqual(self.rate("EUR", "USD", "2001-01-02"), 2.0)
+		self.assertEqual(self.rate("EUR", "EUR", "2001-01-02"), 1.0)
+
+	def test_derived_through_usd(self):
+		self.assertAlmostEqual(self.rate("EUR", "GBP", "2001-01-02"), 0.5)
+
+	def test_newer_stored_pair_beats_derived_rate(self):
+		self.assertAlmostEqual(self.rate("EUR", "GBP", "2001-01-05"), 0.6)
+		self.assertAlmostEqual(self.rate("GBP", "EUR", "2001-01-05"), 1 / 0.6)
+
+	def test_age_limit(self):
+		self.assertAlmostEqual(self.rate("EUR", "GBP", "2001-01-09"), 0.6)
+		self.assertIsNone(self.rate("USD", "EUR", "2001-01-09"))
+		self.assertIsNone(self.rate("USD", "INR", "2001-01-02"))
+
+	def test_convert_many(self):
+		results = convert_many(
+			[
+				{"amount": 10, "from_currency": "usd", "to_currency": "EUR", "date": "2001-01-02"},
+				[10, "EUR", "EUR", "2001-01-02"],
+				[5, "USD", "INR", "2001-01-02"],
+			],
+			max_age_days=7,
+		)
+		self.assertEqual(results[1:], [{"rate": 1.0, "amount": 10.0}, {"rate": None, "amount": None}])
+		self.assertAlmostEqual(results[0]["rate"], 0.5)
+		self.assertAlmostEqual(results[0]["amount"], 5.0)
+
+	def test_convert_nothing(self):
+		self.assertEqual(convert_many([]), [])
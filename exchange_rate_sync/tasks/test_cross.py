@@ -0,0 +1,42 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from exchange_rate_sync.tasks import cross
+
+USD_RATES = {"USD": 1.0, "EUR": 0.5, "GBP": 0.25, "JPY": 150.0, "XAU": 0, "BAD": "n/a"}
+
+
+class TestCrossRates(FrappeTestCase):
+	def test_cross_rate_rows(self):
+		rows = {(a, b): rate for a, b, rate in cross.cross_rate_rows(["USD", "EUR", "GBP"], USD_RATES)}
+		self.assertEqual(len(rows), 6)
+		self.assertAlmostEqual(rows["EUR", "GBP"], 0.5)
+		self.assertAlmostEqual(rows["GBP", "EUR"], 2.0)
+		self.assertAlmostEqual(rows["USD", "EUR"], 0.5)
+
+	def test_invalid_usd_rates_are_masked(self):
+		rows = cross.cross_rate_rows(["EUR", "XAU", "BAD", "MISSING", "GBP"], USD_RATES)
+		self.assertEqual({(a, b) for a, b, _ in rows}, {("EUR", "GBP"), ("GBP", "EUR")})
+
+	def test_numpy_and_fallback_give_the_same_rows(self):
+		if cross.np is None:
+			self.skipTest("numpy is not installed")
+		currencies = ["USD", "EUR", "GBP", "JPY", "XAU", "BAD", "EUR"]
+		with_numpy = sorted(cross.cross_rate_rows(currencies, USD_RATES))
+		np, cross.np = cross.np, None
+		try:
+			fallback = sorted(cross.cross_rate_rows(currencies, USD_RATES))
+		finally:
+			cross.np = np
+		self.assertEqual([row[:2] for row in with_numpy], [row[:2] for row in fallback])
+		for (_, _, a), (_, _, b) in zip(with_numpy, fallback, strict=True):
+			self.assertAlmostEqual(a, b)
+
+	def test_rebase_rates(self):
+		rates = cross.rebase_rates(USD_RATES, "EUR", ["USD", "GBP", "EUR", "XAU", "GBP"])
+		self.assertEqual(set(rates), {"USD", "GBP"})
+		self.assertAlmostEqual(rates["USD"], 2.0)
+		self.assertAlmostEqual(rates["GBP"], 0.5)
+		self.assertEqual(cross.rebase_rates(USD_RATES, "XAU", ["USD"]), {})
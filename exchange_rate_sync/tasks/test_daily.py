@@ -0,0 +1,87 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+import json
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import today
+
+from exchange_rate_sync.providers import FileProvider
+from exchange_rate_sync.tasks import cache
+from exchange_rate_sync.tasks.daily import _sync_rates
+from exchange_rate_sync.tasks.instrumentation import SyncRunLog
+from exchange_rate_sync.tasks.snapshots import STORAGE_COMPACT, load_snapshot
+from exchange_rate_sync.tasks.test_writer import get_rate
+
+# no timestamp: the run never compares provider state, so a rerun always writes
+LATEST = {"base": "USD", "rates": {"EUR": 0.5, "GBP": 0.25, "JPY": 150.0}}
+
+
+class TestSyncRates(FrappeTestCase):
+	"""A whole sync run (fetch, cross rates, staged write, cache publish) replayed from disk."""
+
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.path)
+		with open(os.path.join(self.path, "latest.json"), "w") as f:
+			json.dump(LATEST, f)
+
+		self.cfg = frappe._dict(
+			bulk_upsert=1,
+			cross_rate_conversion=1,
+			fetch_strategy="Per Base",
+			max_parallel_requests=2,
+			requests_per_second=100,
+		)
+		patcher = patch.object(frappe.local.db, "commit")   # keep everything in the test transaction
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+		# today's published rates are this run's test rates: drop them afterwards
+		cache._local.clear()
+		self.addCleanup(cache._local.clear)
+		self.addCleanup(frappe.cache().delete_value, cache._version_key(today()))
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def sync(self, base_currencies=("USD", "EUR"), target_currencies=("EUR", "GBP"), **cfg):
+		self.cfg.update(cfg)
+		return _sync_rates(
+			self.cfg, FileProvider(self.path), list(base_currencies), list(target_currencies), run=SyncRunLog()
+		)
+
+	def test_rates_are_written_and_published(self):
+		message = self.sync()
+		self.assertTrue(message.startswith("Exchange rate sync completed successfully."), message)
+
+		self.assertEqual(get_rate(today(), "USD", "EUR"), 0.5)
+		self.assertEqual(get_rate(today(), "EUR", "USD"), 2.0)
+		self.assertEqual(get_rate(today(), "EUR", "GBP"), 0.5)   # direct and cross rate agree
+		self.assertEqual(get_rate(today(), "GBP", "EUR"), 2.0)
+		self.assertIsNone(get_rate(today(), "USD", "JPY"))       # not configured
+		self.assertEqual(cache.get_rate("GBP", "USD"), 4.0)
+
+	def test_missing_rates_fail_the_run(self):
+		os.remove(os.path.join(self.path, "latest.json"))
+		message = self.sync()
+		self.assertTrue(message.startswith("Exchange rate sync failed for all bases"), message)
+		self.assertIn("API request failed for base USD with status code 404", message)
+
+	def test_compact_mode_packs_usd_rates_without_a_usd_base(self):
+		# EUR is the only base: its answer must still carry the USD rate the snapshot is built on
+		message = self.sync(
+			base_currencies=["EUR"], target_currencies=["GBP"],
+			storage_mode=STORAGE_COMPACT, materialize_company_pairs=0, cross_rate_conversion=0,
+		)
+		self.assertTrue(message.startswith("Exchange rate sync completed successfully."), message)
+
+		snapshot_date, rates = load_snapshot(today())
+		self.assertEqual(str(snapshot_date), today())
+		self.assertAlmostEqual(rates["EUR"], 0.5)
+		self.assertAlmostEqual(rates["GBP"], 0.25)
@@ -0,0 +1,53 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+import time
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from exchange_rate_sync.tasks import errors
+
+
+class TestErrorCollector(FrappeTestCase):
+	def setUp(self):
+		budget_key = f"{errors.LOG_BUDGET_KEY}:{int(time.time() // 3600)}"
+		frappe.cache().delete_value(budget_key)
+		self.addCleanup(frappe.cache().delete_value, budget_key)
+
+	def test_errors_differing_in_numbers_are_one_entry(self):
+		collector = errors.ErrorCollector()
+		for attempt in range(1, 6):
+			collector(title="API non-200", message=f"Attempt={attempt}\nStatus=503")
+		self.assertEqual(len(collector), 5)
+		(entry,) = collector.errors.values()
+		self.assertEqual(entry["count"], 5)
+		self.assertEqual(len(entry["samples"]), errors.MAX_SAMPLES)
+
+	def test_distinct_errors_are_capped(self):
+		collector = errors.ErrorCollector()
+		for i in range(errors.MAX_SIGNATURES + 5):
+			collector.add("Failure", f"kind {chr(65 + i % 26)}{chr(65 + i // 26)}")
+		self.assertEqual(len(collector.errors), errors.MAX_SIGNATURES)
+		self.assertEqual(collector.dropped, 5)
+		self.assertIn("5 more errors of other kinds", collector.summary())
+
+	def test_flush_writes_one_summary(self):
+		title = f"Exchange Rate Sync Test {frappe.generate_hash(length=6)}"
+		collector = errors.ErrorCollector(title)
+		self.assertFalse(collector.flush())
+
+		collector.add(title, "first")
+		collector.add(title, "second")
+		self.assertTrue(collector.flush())
+		self.assertEqual(len(collector), 0)
+		self.assertEqual(frappe.db.count("Error Log", {"method": f"{title}: 2 errors"}), 1)
+
+	def test_hourly_cap_suppresses_the_log(self):
+		for _ in range(errors.MAX_LOGS_PER_HOUR):
+			self.assertTrue(errors._take_log_slot())
+
+		collector = errors.ErrorCollector()
+		collector.add("Failure", "one too many")
+		self.assertFalse(collector.flush())
+		self.assertEqual(len(collector), 0)
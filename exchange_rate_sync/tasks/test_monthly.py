@@ -0,0 +1,66 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from exchange_rate_sync.tasks.monthly import (
+	KEEP_MONTH_END,
+	KEEP_YEAR_END,
+	_is_period_end,
+	purge_currency_exchange,
+)
+from exchange_rate_sync.tasks.test_writer import get_rate, make_rate
+
+DATES = ("2005-01-30", "2005-01-31", "2005-06-15", "2005-12-31")
+ONLY_2005 = [["date", "between", ["2005-01-01", "2005-12-31"]]]
+
+
+class TestPurgeCurrencyExchange(FrappeTestCase):
+	"""Purges rows dated 2005 only, one row per batch so every batch boundary is crossed."""
+
+	def setUp(self):
+		for date in DATES:
+			make_rate(date, "USD", "EUR", 0.5)
+		patcher = patch.object(frappe.local.db, "commit")   # keep everything in the test transaction
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def purge(self, keep=None):
+		return purge_currency_exchange(retention_days=0, batch_size=1, keep_period_end=keep, filters=ONLY_2005)
+
+	def remaining(self):
+		return [date for date in DATES if get_rate(date, "USD", "EUR")]
+
+	def test_purge_everything(self):
+		result = self.purge()
+		self.assertEqual((result["purged"], result["kept"]), (4, 0))
+		self.assertEqual(self.remaining(), [])
+
+	def test_keep_month_end(self):
+		result = self.purge(KEEP_MONTH_END)
+		self.assertEqual((result["purged"], result["kept"]), (2, 2))
+		self.assertEqual(self.remaining(), ["2005-01-31", "2005-12-31"])
+
+	def test_keep_year_end(self):
+		result = self.purge(KEEP_YEAR_END)
+		self.assertEqual((result["purged"], result["kept"]), (3, 1))
+		self.assertEqual(self.remaining(), ["2005-12-31"])
+
+	def test_batches_of_kept_rows_still_advance(self):
+		self.purge(KEEP_MONTH_END)
+		# only kept rows are left: every batch deletes nothing and the walk must still end
+		result = self.purge(KEEP_MONTH_END)
+		self.assertEqual((result["purged"], result["kept"]), (0, 2))
+
+	def test_is_period_end(self):
+		self.assertTrue(_is_period_end("2004-02-29", KEEP_MONTH_END))
+		self.assertFalse(_is_period_end("2005-01-30", KEEP_MONTH_END))
+		self.assertTrue(_is_period_end("2005-12-31", KEEP_YEAR_END))
+		self.assertFalse(_is_period_end("2005-01-31", KEEP_YEAR_END))
+		self.assertFalse(_is_period_end("2005-12-31", None))
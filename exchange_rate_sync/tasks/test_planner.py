@@ -0,0 +1,59 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from exchange_rate_sync.providers.test_fanout import StaticProvider
+from exchange_rate_sync.tasks.planner import (
+	FETCH_PER_BASE,
+	FETCH_SINGLE_USD,
+	USAGE_CACHE_KEY,
+	plan_run,
+	run_costs,
+)
+
+
+class TestPlanRun(FrappeTestCase):
+	def setUp(self):
+		frappe.cache().delete_value(USAGE_CACHE_KEY)
+		self.addCleanup(frappe.cache().delete_value, USAGE_CACHE_KEY)
+
+	def plan(self, remaining, days_remaining=10, interval_sec=24 * 60 * 60, quota=1000, respect_quota=1):
+		provider = StaticProvider("Quota", None, usage={
+			"requests_quota": quota, "requests_remaining": remaining, "days_remaining": days_remaining,
+		})
+		cfg = frappe._dict(fetch_strategy=FETCH_PER_BASE, respect_quota=respect_quota)
+		return plan_run(cfg, provider, ["USD", "EUR", "GBP"], ["INR", "PKR"], interval_sec)
+
+	def test_run_costs(self):
+		self.assertEqual(run_costs(["USD", "EUR"], ["EUR"]), {FETCH_PER_BASE: 1, FETCH_SINGLE_USD: 1})
+
+	def test_quota_ignored_unless_respected(self):
+		plan = self.plan(remaining=0, respect_quota=0)
+		self.assertEqual((plan["strategy"], plan["cost"], plan["skip"]), (FETCH_PER_BASE, 3, False))
+
+	def test_unlimited_plan_keeps_strategy(self):
+		plan = self.plan(remaining=0, quota=-1)
+		self.assertEqual(plan["strategy"], FETCH_PER_BASE)
+		self.assertIsNone(plan["remaining"])
+
+	def test_enough_quota_keeps_strategy(self):
+		plan = self.plan(remaining=300)
+		self.assertEqual((plan["strategy"], plan["skip"], plan["min_interval"]), (FETCH_PER_BASE, False, 0))
+		self.assertEqual(plan["remaining"], 300)
+
+	def test_tight_quota_switches_to_single_usd_fetch(self):
+		plan = self.plan(remaining=20)
+		self.assertEqual((plan["strategy"], plan["cost"], plan["min_interval"]), (FETCH_SINGLE_USD, 1, 0))
+		self.assertIn("Single USD Fetch", plan["reason"])
+
+	def test_frequency_beyond_budget_is_spaced_out(self):
+		plan = self.plan(remaining=100, interval_sec=60 * 60)
+		self.assertEqual(plan["strategy"], FETCH_SINGLE_USD)
+		self.assertEqual(plan["min_interval"], 8640)   # 10 requests per day for a 1-request run
+
+	def test_used_up_quota_skips(self):
+		plan = self.plan(remaining=0)
+		self.assertTrue(plan["skip"])
+		self.assertIn("used up", plan["reason"])
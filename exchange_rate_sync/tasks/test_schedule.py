@@ -0,0 +1,33 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from exchange_rate_sync.tasks.schedule import is_sync_due, sync_interval
+
+
+class TestIsSyncDue(FrappeTestCase):
+	def test_first_run_is_due(self):
+		self.assertTrue(is_sync_due("Hourly", None, at="2025-01-06 10:00:00"))
+
+	def test_daily_runs_once_per_day(self):
+		self.assertFalse(is_sync_due("Daily", "2025-01-06 00:05:00", at="2025-01-06 23:55:00"))
+		self.assertTrue(is_sync_due("Daily", "2025-01-05 23:55:00", at="2025-01-06 00:05:00"))
+
+	def test_interval_with_grace(self):
+		self.assertFalse(is_sync_due("Hourly", "2025-01-06 09:10:00", at="2025-01-06 10:00:00"))
+		self.assertTrue(is_sync_due("Hourly", "2025-01-06 09:00:30", at="2025-01-06 10:00:00"))
+
+	def test_trading_days_only(self):
+		# 2025-01-04 is a Saturday
+		self.assertFalse(is_sync_due("Hourly", None, trading_days_only=True, at="2025-01-04 10:00:00"))
+		self.assertTrue(is_sync_due("Hourly", None, trading_days_only=True, at="2025-01-06 10:00:00"))
+
+	def test_min_interval_spaces_runs_out(self):
+		args = ("Hourly", "2025-01-06 08:00:00")
+		self.assertFalse(is_sync_due(*args, at="2025-01-06 10:00:00", min_interval_sec=3 * 60 * 60))
+		self.assertTrue(is_sync_due(*args, at="2025-01-06 11:00:00", min_interval_sec=3 * 60 * 60))
+
+	def test_unknown_frequency_is_daily(self):
+		self.assertEqual(sync_interval(None), sync_interval("Daily"))
+		self.assertEqual(sync_interval("Fortnightly"), sync_interval("Daily"))
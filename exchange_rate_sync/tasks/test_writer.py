@@ -0,0 +1,136 @@
+# Copyright (c) 2026, DeliveryDevs  and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import get_datetime, now
+
+from exchange_rate_sync.tasks import writer
+from exchange_rate_sync.tasks.writer import (
+	CURRENCY_EXCHANGE,
+	RateWriter,
+	_bulk_apply,
+	_bulk_stage,
+	_bulk_update_rates,
+	currency_exchange_name,
+	is_unchanged,
+)
+
+
+def make_rate(date, from_currency, to_currency, rate, **fields):
+	"""Insert a Currency Exchange row the way a user would. Returns its name."""
+	return frappe.get_doc({
+		"doctype": CURRENCY_EXCHANGE,
+		"date": date,
+		"from_currency": from_currency,
+		"to_currency": to_currency,
+		"exchange_rate": rate,
+		**fields,
+	}).insert(ignore_permissions=True).name
+
+
+def get_rate(date, from_currency, to_currency):
+	return frappe.db.get_value(
+		CURRENCY_EXCHANGE,
+		{"date": date, "from_currency": from_currency, "to_currency": to_currency},
+		"exchange_rate",
+	)
+
+
+class TestRateWriter(FrappeTestCase):
+	"""Rows dated January 2002, well before any real ones on a test site."""
+
+	def setUp(self):
+		self.eur = make_rate("2002-01-01", "USD", "EUR", 0.5)
+		self.gbp = make_rate("2002-01-01", "USD", "GBP", 0.25)
+		self.rows = {
+			("2002-01-01", "USD", "EUR"): 0.5,     # unchanged
+			("2002-01-01", "USD", "GBP"): 0.3,     # update
+			("2002-01-01", "USD", "INR"): 80.0,    # insert
+		}
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_bulk_stage_splits_rows(self):
+		inserts, updates, unchanged = _bulk_stage(self.rows)
+		self.assertEqual(unchanged, 1)
+		self.assertEqual(updates, [(self.gbp, 0.3)])
+		self.assertEqual(
+			inserts, [(currency_exchange_name("2002-01-01", "USD", "INR"), "2002-01-01", "USD", "INR", 80.0)]
+		)
+
+	def test_bulk_stage_skips_changes_within_tolerance(self):
+		inserts, updates, unchanged = _bulk_stage(self.rows, tolerance=0.25)
+		self.assertEqual((len(inserts), updates, unchanged), (1, [], 2))
+
+	def test_bulk_stage_only_reads(self):
+		_bulk_stage(self.rows)
+		self.assertIsNone(get_rate("2002-01-01", "USD", "INR"))
+		self.assertEqual(get_rate("2002-01-01", "USD", "GBP"), 0.25)
+
+	def test_bulk_apply_writes_staged_rows(self):
+		stats = _bulk_apply(*_bulk_stage(self.rows))
+		self.assertEqual(stats, {"inserted": 1, "updated": 1, "unchanged": 1, "failed": 0})
+		self.assertEqual(get_rate("2002-01-01", "USD", "GBP"), 0.3)
+
+		inserted = frappe.get_doc(CURRENCY_EXCHANGE, currency_exchange_name("2002-01-01", "USD", "INR"))
+		self.assertEqual(inserted.exchange_rate, 80.0)
+		self.assertEqual((inserted.for_buying, inserted.for_selling), (1, 1))
+		self.assertEqual(inserted.owner, frappe.session.user)
+
+	def test_bulk_update_rates_sets_each_rate(self):
+		jpy = make_rate("2002-01-01", "USD", "JPY", 110.0)
+		timestamp = now()
+		with patch.object(writer, "BULK_CHUNK_SIZE", 1):   # one CASE statement per row
+			_bulk_update_rates([(self.eur, 0.55), (jpy, 120.0)], timestamp, "Administrator")
+
+		self.assertEqual(get_rate("2002-01-01", "USD", "EUR"), 0.55)
+		self.assertEqual(get_rate("2002-01-01", "USD", "JPY"), 120.0)
+		self.assertEqual(get_rate("2002-01-01", "USD", "GBP"), 0.25)
+		self.assertEqual(frappe.db.get_value(CURRENCY_EXCHANGE, jpy, "modified"), get_datetime(timestamp))
+
+	def test_stage_writes_nothing_until_apply(self):
+		rate_writer = RateWriter()
+		rate_writer.rows = dict(self.rows)
+		staged = rate_writer.stage()
+		self.assertEqual(len(rate_writer), 0)
+		self.assertIsNone(get_rate("2002-01-01", "USD", "INR"))
+		self.assertEqual(get_rate("2002-01-01", "USD", "GBP"), 0.25)
+
+		self.assertEqual(staged.apply(), {"inserted": 1, "updated": 1, "unchanged": 1, "failed": 0})
+		self.assertEqual(get_rate("2002-01-01", "USD", "INR"), 80.0)
+
+	def test_row_mode_matches_bulk_mode(self):
+		rate_writer = RateWriter(bulk=False)
+		for (date_str, from_currency, to_currency), rate in self.rows.items():
+			rate_writer.add(date_str, from_currency, to_currency, rate)
+		stats = rate_writer.flush()
+		self.assertEqual(stats, {"inserted": 1, "updated": 1, "unchanged": 1, "failed": 0})
+		self.assertEqual(get_rate("2002-01-01", "USD", "INR"), 80.0)
+		self.assertEqual(len(rate_writer), 0)
+
+	def test_add_pair_queues_the_inverse(self):
+		rate_writer = RateWriter()
+		self.assertTrue(rate_writer.add_pair("2002-01-02", "USD", "EUR", 0.5))
+		self.assertFalse(rate_writer.add_pair("2002-01-02", "USD", "GBP", 0))
+		self.assertFalse(rate_writer.add("2002-01-02", "EUR", "EUR", 1.0))
+		self.assertEqual(
+			rate_writer.rows, {("2002-01-02", "USD", "EUR"): 0.5, ("2002-01-02", "EUR", "USD"): 2.0}
+		)
+
+
+class TestIsUnchanged(FrappeTestCase):
+	def test_no_stored_rate(self):
+		self.assertFalse(is_unchanged(None, 1.0))
+
+	def test_equal_at_stored_precision(self):
+		self.assertTrue(is_unchanged(1.2345678901, 1.2345678904))
+		self.assertFalse(is_unchanged(1.0, 1.00001))
+
+	def test_tolerance_is_relative_to_stored_rate(self):
+		self.assertTrue(is_unchanged(200.0, 200.01, tolerance=0.0001))
+		self.assertFalse(is_unchanged(200.0, 200.03, tolerance=0.0001))
+		self.assertTrue(is_unchanged("2.0", 1.9999, tolerance=0.0001))
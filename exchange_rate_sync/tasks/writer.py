@@ -0,0 +1,265 @@
+import frappe
+from frappe.query_builder import Case
+from frappe.query_builder.functions import Max
+from frappe.utils import flt, getdate, now
+
+from . import metrics
+
+CURRENCY_EXCHANGE = "Currency Exchange"
+BULK_CHUNK_SIZE = 500  # rows per multi-row INSERT / CASE UPDATE statement
+RATE_PRECISION = 9     # decimals Currency Exchange stores for exchange_rate
+
+INSERT_FIELDS = (
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "date", "from_currency", "to_currency", "exchange_rate", "for_buying", "for_selling",
+)
+
+
+def currency_exchange_name(date_str: str, from_currency: str, to_currency: str) -> str:
+    """
+    Same naming as ERPNext's CurrencyExchange.autoname for a row that is
+    valid for both buying and selling (the default for rows we create).
+    """
+    return f"{getdate(date_str).strftime('%Y-%m-%d')}-{from_currency}-{to_currency}-Selling-Buying"
+
+
+def is_unchanged(old_rate, new_rate, tolerance: float = 0) -> bool:
+    """
+    True if new_rate is the stored rate: equal at the stored precision, or
+    within `tolerance` relative to the stored rate (0.0001 = 0.01%).
+    """
+    if old_rate is None:
+        return False
+    old_rate, new_rate = flt(old_rate), flt(new_rate)
+    if flt(old_rate, RATE_PRECISION) == flt(new_rate, RATE_PRECISION):
+        return True
+    return abs(new_rate - old_rate) <= flt(tolerance) * abs(old_rate)
+
+
+def upsert_rate(date_str: str, from_currency: str, to_currency: str, rate: float, tolerance: float = 0) -> str:
+    """
+    Per-row upsert of one Currency Exchange record (the original write path).
+    Returns "updated", "inserted" or "unchanged" (rate within `tolerance`, nothing written).
+    """
+    existing = frappe.db.get_value(
+        CURRENCY_EXCHANGE,
+        {"date": date_str, "from_currency": from_currency, "to_currency": to_currency},
+        ["name", "exchange_rate"],
+        as_dict=True,
+    )
+    if existing:
+        if is_unchanged(existing.exchange_rate, rate, tolerance):
+            return "unchanged"
+        frappe.db.set_value(CURRENCY_EXCHANGE, existing.name, "exchange_rate", rate)
+        return "updated"
+
+    doc = frappe.get_doc({
+        "doctype": CURRENCY_EXCHANGE,
+        "date": date_str,
+        "from_currency": from_currency,
+        "to_currency": to_currency,
+        "exchange_rate": rate
+    })
+    doc.flags.from_exchange_rate_sync = True   # the sync refreshes the rate caches itself, see asof.on_currency_exchange_change
+    doc.insert(ignore_permissions=True)
+    return "inserted"
+
+
+class RateWriter:
+    """
+    Collects (date, from_currency, to_currency, rate) rows for a sync run and
+    writes them to Currency Exchange in one pass on flush(), or stage() (reads)
+    and StagedWrite.apply() (writes) to keep the write transaction short.
+
+    bulk=True:  one query per date to prefetch existing names, then multi-row
+                INSERTs for new rows and CASE-based UPDATEs for existing ones.
+    bulk=False: every row goes through upsert_rate() (get_value + set_value/insert).
+
+    Rows whose stored rate is within `tolerance` (relative) of the new one are
+    not written at all. Adding the same (date, from, to) twice keeps the last rate.
+    Failed rows are reported to `on_error` (e.g. an ErrorCollector), default frappe.log_error.
+    """
+
+    def __init__(self, bulk: bool = True, tolerance: float = 0, on_error=None):
+        self.bulk = bulk
+        self.tolerance = flt(tolerance)
+        self.on_error = on_error
+        self.rows = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, date_str: str, from_currency: str, to_currency: str, rate) -> bool:
+        """Queue a single direction. Returns False if the row is not writable."""
+        if not rate or rate <= 0 or from_currency == to_currency:
+            return False
+        self.rows[(date_str, from_currency, to_currency)] = rate
+        return True
+
+    def add_pair(self, date_str: str, a: str, b: str, rate) -> bool:
+        """Queue a->b with the given rate and b->a with its inverse."""
+        if not self.add(date_str, a, b, rate):
+            return False
+        self.add(date_str, b, a, 1 / rate)
+        return True
+
+    def add_many(self, date_str: str, rows) -> int:
+        """Queue (from_currency, to_currency, rate) rows for one date. Returns how many were queued."""
+        queued = 0
+        for from_currency, to_currency, rate in rows:
+            if self.add(date_str, from_currency, to_currency, rate):
+                queued += 1
+        return queued
+
+    def stage(self) -> "StagedWrite":
+        """
+        Compare the queued rows with the stored ones and clear the buffer. Only reads:
+        the writes, and the row locks they take, are left to StagedWrite.apply().
+        """
+        rows, self.rows = self.rows, {}
+        return StagedWrite(rows, self.tolerance, self.bulk, self.on_error)
+
+    def flush(self) -> dict:
+        """
+        Write all queued rows and clear the buffer. Does not commit.
+        Returns counts: {"inserted": n, "updated": n, "unchanged": n, "failed": n}.
+        """
+        return self.stage().apply()
+
+
+class StagedWrite:
+    """
+    Queued rows split into inserts, updates and unchanged rows (bulk mode), ready
+    to be written in one short transaction. Row mode only keeps the rows; its
+    lookups happen on apply().
+
+    apply() still runs the INSERTs and UPDATEs themselves: they are what readers
+    must see at once, so they belong to the publish transaction. Staging leaves
+    it blind writes by primary key (no reads, no comparisons); moving the rows
+    from a staging table would take the same row locks and index writes there.
+    """
+
+    def __init__(self, rows: dict, tolerance: float = 0, bulk: bool = True, on_error=None):
+        self.rows = rows
+        self.tolerance = tolerance
+        self.bulk = bulk
+        self.on_error = on_error
+        self.inserts, self.updates, self.unchanged = _bulk_stage(rows, tolerance) if bulk and rows else ([], [], 0)
+
+    def apply(self) -> dict:
+        """Write the staged rows. Does not commit. Returns counts as RateWriter.flush()."""
+        if self.bulk:
+            stats = _bulk_apply(self.inserts, self.updates, self.unchanged)
+        else:
+            stats = _row_write(self.rows, self.tolerance, self.on_error)
+        for result, count in stats.items():
+            if count:
+                metrics.inc("rows_written_total", count, result=result)
+        return stats
+
+
+def _row_write(rows: dict, tolerance: float = 0, on_error=None) -> dict:
+    on_error = on_error or frappe.log_error
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "failed": 0}
+    for (date_str, from_currency, to_currency), rate in rows.items():
+        try:
+            stats[upsert_rate(date_str, from_currency, to_currency, rate, tolerance)] += 1
+        except Exception as e:
+            stats["failed"] += 1
+            on_error(
+                title="Exchange Rate Sync: Upsert error",
+                message=f"Date={date_str} From={from_currency} To={to_currency}\nError={e}"
+            )
+    return stats
+
+
+def prefetch_existing(date_str: str) -> dict:
+    """Return {(from_currency, to_currency): (name, exchange_rate)} for every row on the given date."""
+    existing = {}
+    for row in frappe.get_all(
+        CURRENCY_EXCHANGE,
+        filters={"date": date_str},
+        fields=["name", "from_currency", "to_currency", "exchange_rate"],
+        order_by="creation asc",
+    ):
+        # keep the first match, like frappe.db.get_value does in upsert_rate()
+        existing.setdefault((row.from_currency, row.to_currency), (row.name, row.exchange_rate))
+    return existing
+
+
+def previous_rates(before_date: str) -> dict:
+    """{(from_currency, to_currency): exchange_rate} of the latest date before `before_date` that has rows."""
+    ce = frappe.qb.DocType(CURRENCY_EXCHANGE)
+    last_date = frappe.qb.from_(ce).select(Max(ce.date)).where(ce.date < before_date).run()[0][0]
+    if not last_date:
+        return {}
+    return {
+        (row.from_currency, row.to_currency): flt(row.exchange_rate)
+        for row in frappe.get_all(
+            CURRENCY_EXCHANGE,
+            filters={"date": last_date},
+            fields=["from_currency", "to_currency", "exchange_rate"],
+        )
+    }
+
+
+def _bulk_stage(rows: dict, tolerance: float = 0) -> tuple:
+    """((name, date, from, to, rate) inserts, (name, rate) updates, unchanged count) for `rows`."""
+    by_date = {}
+    for (date_str, from_currency, to_currency), rate in rows.items():
+        by_date.setdefault(date_str, []).append((from_currency, to_currency, rate))
+
+    inserts = []
+    updates = []
+    unchanged = 0
+
+    for date_str, date_rows in by_date.items():
+        existing = prefetch_existing(date_str)
+        for from_currency, to_currency, rate in date_rows:
+            name, old_rate = existing.get((from_currency, to_currency), (None, None))
+            if name and is_unchanged(old_rate, rate, tolerance):
+                unchanged += 1
+            elif name:
+                updates.append((name, rate))
+            else:
+                name = currency_exchange_name(date_str, from_currency, to_currency)
+                inserts.append((name, date_str, from_currency, to_currency, rate))
+    return inserts, updates, unchanged
+
+
+def _bulk_apply(inserts: list, updates: list, unchanged: int = 0) -> dict:
+    stats = {"inserted": 0, "updated": 0, "unchanged": unchanged, "failed": 0}
+    timestamp = now()
+    user = frappe.session.user
+
+    if inserts:
+        values = [
+            (name, timestamp, timestamp, user, user, 0, date_str, from_currency, to_currency, rate, 1, 1)
+            for name, date_str, from_currency, to_currency, rate in inserts
+        ]
+        frappe.db.bulk_insert(CURRENCY_EXCHANGE, INSERT_FIELDS, values, chunk_size=BULK_CHUNK_SIZE)
+        stats["inserted"] = len(inserts)
+
+    if updates:
+        _bulk_update_rates(updates, timestamp, user)
+        stats["updated"] = len(updates)
+
+    return stats
+
+
+def _bulk_update_rates(updates: list, timestamp: str, user: str):
+    """UPDATE ... SET exchange_rate = CASE name WHEN ... END for each chunk of (name, rate)."""
+    ce = frappe.qb.DocType(CURRENCY_EXCHANGE)
+    for start in range(0, len(updates), BULK_CHUNK_SIZE):
+        chunk = updates[start:start + BULK_CHUNK_SIZE]
+        rate_case = Case()
+        for name, rate in chunk:
+            rate_case = rate_case.when(ce.name == name, rate)
+
+        (
+            frappe.qb.update(ce)
+            .set(ce.exchange_rate, rate_case)
+            .set(ce.modified, timestamp)
+            .set(ce.modified_by, user)
+            .where(ce.name.isin([name for name, _ in chunk]))
+        ).run()